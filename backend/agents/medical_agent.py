@@ -80,13 +80,23 @@ def run_medical_agent(state: ClaimState) -> dict:
         # Prepare historical context string
         past_pattern = state.get("past_pattern_context")
         hist_context_str = "None available."
-        if past_pattern:
+        if past_pattern and past_pattern.get("found"):
             hist_context_str = f"""
             Similar denials have been resolved successfully!
             Occurrence Count: {past_pattern.get('occurrence_count')}
             Suggested Resolution: {past_pattern.get('suggested_solution')}
             Commonly Missing Docs: {past_pattern.get('common_missing_docs')}
             """
+        similar = (past_pattern or {}).get("similar_cases") or []
+        if similar:
+            lines = [
+                f"- {case['insurance']} / {case['denial_code']} / {case['procedure']} "
+                f"(similarity {case['similarity']}, seen {case['occurrence_count']}x): "
+                f"resolved by {case['resolved_by']}, missing docs {case['missing_docs']}"
+                for case in similar
+            ]
+            prefix = "" if hist_context_str == "None available." else hist_context_str
+            hist_context_str = prefix + "\n            Similar past denials:\n" + "\n".join(lines)
         
         result = chain.invoke({
             "documentation": str(docs),
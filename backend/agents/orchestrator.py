@@ -13,7 +13,9 @@ from agents.negotiator_agent import run_negotiator_agent
 from agents.auditor_agent import run_auditor_agent
 from agents.simulator_agent import run_simulator_agent
 from database import SessionLocal
-from utils.memory_graph import record_denial_pattern, get_pattern_suggestions
+from utils.memory_graph import get_pattern_suggestions
+from utils.pattern_writer import pattern_writer
+from utils.similar_cases import find_similar_cases
 
 logger = logging.getLogger(__name__)
 
@@ -96,6 +98,7 @@ def run_appeal_workflow(ocr_data: dict, insurance_rules: dict, db_session: Sessi
         denial_code = denial_doc.get("denial_code")
         procedure = denial_doc.get("procedure") or bill_doc.get("procedure_name")
         cpt_code = bill_doc.get("cpt_code")
+        denial_reason = denial_doc.get("denial_reason")
         
         if insurance and denial_code:
             suggestion = get_pattern_suggestions(db_session, insurance, denial_code, procedure)
@@ -104,6 +107,18 @@ def run_appeal_workflow(ocr_data: dict, insurance_rules: dict, db_session: Sessi
                 past_pattern = suggestion
             else:
                 print("🧠 MEMORY: No matching past patterns found.")
+
+        # Nearest past denials by reason/procedure, useful even for new combinations
+        if denial_reason or procedure:
+            matched = (past_pattern or {}).get("matched_pattern") or {}
+            neighbours = find_similar_cases(
+                db_session, denial_reason, procedure, denial_code,
+                exclude=(matched.get("insurance"), matched.get("denial_code"), matched.get("procedure"))
+            )
+            if neighbours:
+                print(f"🧠 MEMORY: {len(neighbours)} similar past denials (best similarity {neighbours[0]['similarity']})")
+                past_pattern = past_pattern or {"found": False}
+                past_pattern["similar_cases"] = neighbours
     except Exception as e:
         print(f"⚠️ Memory Retrieval Failed: {e}")
         past_pattern = None
@@ -141,7 +156,7 @@ def run_appeal_workflow(ocr_data: dict, insurance_rules: dict, db_session: Sessi
             # Infer missing docs from Policy Agent
             policy_analysis = final_state.get("policy_analysis", {})
             findings = policy_analysis.get("findings", []) if policy_analysis else []
-            missing_docs = [f.issue for f in findings if "Missing" in f.issue]
+            missing_docs = [f.get("issue", "") for f in findings if "Missing" in f.get("issue", "")]
             
             # Infer resolution from Medical Agent (just a heuristic for now)
             # In a real system, this would come from user outcome feedback
@@ -150,16 +165,17 @@ def run_appeal_workflow(ocr_data: dict, insurance_rules: dict, db_session: Sessi
             if medical_analysis and "key_findings" in medical_analysis:
                  resolved_by.append("Clinical Justification")
             
-            record_denial_pattern(
-                db_session,
+            # Written behind the request by the background pattern writer
+            pattern_writer.submit(
                 insurance=insurance,
                 procedure=procedure,
                 cpt_code=cpt_code,
                 denial_code=denial_code,
                 missing_docs=missing_docs,
-                resolved_by=resolved_by
+                resolved_by=resolved_by,
+                denial_reason=denial_reason
             )
-            print("🧠 MEMORY: Pattern recorded/updated.")
+            print("🧠 MEMORY: Pattern queued for recording.")
     except Exception as e:
          print(f"⚠️ Memory Store Failed: {e}")
 
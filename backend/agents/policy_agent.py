@@ -5,26 +5,15 @@ Analyzes extracted claim data against insurance policy rules.
 from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field
-from typing import List, Optional
 import logging
 
 from config import settings
 from agents.state import ClaimState
+from agents.rule_engine import PolicyAnalysis, policy_rule_engine
+from utils.rules_registry import relevant_rules
 
 logger = logging.getLogger(__name__)
 
-# Define Output Structure
-class PolicyFinding(BaseModel):
-    issue: str = Field(description="The specific policy issue (e.g., Missing Prior Auth)")
-    status: str = Field(description="VIOLATION, COMPLIANT, or WARNING")
-    details: str = Field(description="Explanation of the finding")
-
-class PolicyAnalysis(BaseModel):
-    findings: List[PolicyFinding]
-    prior_auth_required: bool
-    policy_limit_issues: bool
-
 def run_policy_agent(state: ClaimState) -> dict:
     """
     Run the Policy Agent to analyze compliance.
@@ -34,6 +23,15 @@ def run_policy_agent(state: ClaimState) -> dict:
     ocr_data = state.get("ocr_data", {})
     rules = state.get("insurance_rules", {})
     
+    # Mechanical checks (prior auth, listed requirements) need no model; only
+    # claims the rule engine cannot decide go to the LLM
+    if settings.POLICY_RULE_ENGINE_ENABLED:
+        precheck = policy_rule_engine.evaluate(ocr_data, rules)
+        if not precheck.ambiguous:
+            logger.info(f"Policy Agent Findings: {len(precheck.analysis.findings)} (rule engine, LLM skipped)")
+            return {"policy_analysis": {**precheck.analysis.dict(), "source": "rule_engine"}}
+        logger.info(f"Policy rule engine could not decide the claim ({', '.join(precheck.reasons)}), asking the LLM")
+    
     # Initialize LLM
     llm = ChatGroq(
         api_key=settings.GROQ_API_KEY,
@@ -72,7 +70,9 @@ def run_policy_agent(state: ClaimState) -> dict:
     try:
         # Flatten OCR data for the prompt
         claim_summary = str(ocr_data)
-        rules_summary = str(rules)
+        # Only the rules for the claim's CPT codes, plus the general plan clauses
+        claim_fields = [doc.get("structured", {}) for doc in ocr_data.values() if isinstance(doc, dict)]
+        rules_summary = str(relevant_rules(rules, claim_fields))
         
         result = chain.invoke({
             "rules": rules_summary,
@@ -80,7 +80,7 @@ def run_policy_agent(state: ClaimState) -> dict:
         })
         
         logger.info(f"Policy Agent Findings: {len(result.findings)}")
-        return {"policy_analysis": result.dict()}
+        return {"policy_analysis": {**result.dict(), "source": "llm"}}
         
     except Exception as e:
         logger.error(f"Policy Agent encountered an error: {e}")
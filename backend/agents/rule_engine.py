@@ -0,0 +1,440 @@
+"""
+Policy Rule Engine: deterministic pre-check for the Policy Agent.
+
+Most of a policy review is a lookup in the plan's procedure_rules: is prior
+authorization required and was it obtained, which of the listed requirements do
+the claim documents show and which are missing. The engine answers those from
+the rules and the extracted fields and returns the same PolicyAnalysis the
+Policy Agent's LLM produces. A claim it cannot decide (no rule for the
+procedure, a requirement only partly evidenced, contradicting prior auth
+evidence) is marked ambiguous and left to the LLM.
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Set, Tuple
+import logging
+import re
+import threading
+
+from pydantic import BaseModel, Field
+
+from utils.fuzzy_match import PROCEDURE_PHRASES, PROCEDURE_WORDS, canonical_denial_code
+from utils.rules_registry import ProcedureRule, claim_codes, plan_for_rules
+
+logger = logging.getLogger(__name__)
+
+
+# Output structure shared with the Policy Agent's LLM parser
+class PolicyFinding(BaseModel):
+    issue: str = Field(description="The specific policy issue (e.g., Missing Prior Auth)")
+    status: str = Field(description="VIOLATION, COMPLIANT, or WARNING")
+    details: str = Field(description="Explanation of the finding")
+
+class PolicyAnalysis(BaseModel):
+    findings: List[PolicyFinding]
+    prior_auth_required: bool
+    policy_limit_issues: bool
+
+
+# Why a claim was left to the LLM
+NO_RULES = "no_plan_rules"
+NO_MATCHING_RULE = "no_rule_for_procedure"
+NAME_MATCH_ONLY = "procedure_matched_by_name_only"
+UNCLEAR_REQUIREMENT = "unclear_requirement"
+CONFLICTING_PRIOR_AUTH = "conflicting_prior_auth_evidence"
+
+# Requirement outcomes
+PRESENT, MISSING, UNCLEAR = "present", "missing", "unclear"
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PARENTHESES = re.compile(r"\(([^)]*)\)")
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*\+?\s*-?\s*(day|week|wk|month|mo|year|yr)s?\b")
+WEEKS_PER_UNIT = {"day": 1 / 7, "week": 1, "wk": 1, "month": 4.345, "mo": 4.345, "year": 52.18, "yr": 52.18}
+
+# Requirements that state a limit or a note rather than a document to submit
+_LIMIT = re.compile(
+    r"\b(?:limited to|limit of|maximum of|max(?:imum)?\.? \d+|up to \d+|not to exceed|no more than"
+    r"|not within|once (?:every|per|a)|limit applies|cap)\b"
+)
+# Requirements that defer to external coverage criteria, which take judgment to apply
+_CRITERIA = re.compile(r"\b(?:ncd|lcd|coverage determination|guidelines?|criteria|level of service)\b")
+_NOTE = re.compile(r"\b(?:no|not) (?:prior )?(?:auth\w*|precert\w*)\b|\bnot required\b")
+_CONDITIONAL = re.compile(r"\bif (?:applicable|indicated|any)\b")
+
+# Words that say how a requirement is evidenced, not what must be evidenced
+GENERIC_WORDS = frozenset({
+    "a", "an", "and", "or", "of", "the", "to", "for", "with", "without", "in", "on", "by", "at",
+    "if", "applicable", "indicated", "any", "etc", "eg", "e", "g", "ie", "i", "prior", "before",
+    "after", "per", "least", "documented", "documentation", "document", "documents", "documenting",
+    "showing", "shows", "show", "showed", "findings", "finding", "results", "result", "performed",
+    "notes", "note", "records", "record", "report", "reports", "evidence", "proof", "required",
+    "requirement", "medical", "clinical", "patient", "physician", "doctor", "provider", "procedure", "service",
+    "day", "days", "week", "weeks", "wk", "wks", "month", "months", "mo", "year", "years", "yr", "yrs",
+})
+
+# Words after which the next few words are negated ("no physical therapy")
+NEGATIONS = frozenset({"no", "not", "without", "denies", "denied", "never", "absent", "lacks", "lacking", "missing"})
+NEGATION_WINDOW = 3
+
+# Evidence that prior authorization was obtained, or that the payer says it was not
+_AUTH_OBTAINED = re.compile(
+    r"\b(?:prior[\s-]*auth\w*|pre[\s-]*auth\w*|pre[\s-]*cert\w*|authori[sz]ation)\s*"
+    r"(?:(?:number|no\.?|#|id|ref\w*|code)\s*)?[:#]?\s*"
+    r"(?:approved|obtained|granted|on file|received|(?=[a-z0-9-]*\d)[a-z0-9][a-z0-9-]{3,})",
+    re.IGNORECASE,
+)
+_AUTH_ABSENT = re.compile(
+    r"\b(?:authori[sz]ation|precertification|pre-?auth\w*|prior auth\w*)\s*(?:was\s*)?(?:absent|not obtained|not on file|missing|denied)\b"
+    r"|\b(?:no|without)\s+(?:prior\s+|valid\s+)?(?:authori[sz]ation|precertification|pre-?auth\w*|auth\w*)\s+(?:was\s+)?(?:obtained|on file|submitted|requested)\b",
+    re.IGNORECASE,
+)
+_AUTH_FIELD = re.compile(r"auth|precert", re.IGNORECASE)
+EMPTY_VALUES = frozenset({"", "none", "no", "n/a", "na", "false", "null", "pending", "not obtained"})
+AUTH_ABSENT_DENIAL_CODES = frozenset({"CO197", "PR197"})
+
+# Documents written by the payer: a denial letter lists what the payer says is
+# missing, so its text is never evidence that a requirement was met
+PAYER_DOCUMENTS = frozenset({"denial", "insurance"})
+PAYER_DOC_TYPES = frozenset({"denial_letter", "eob", "explanation_of_benefits", "insurance_card"})
+
+_PHRASES = sorted(PROCEDURE_PHRASES, key=len, reverse=True)
+
+
+def _normalized_words(text: str) -> List[str]:
+    """Words with the procedure phrase and synonym tables applied ("x-ray" -> "xray")."""
+    padded = f" {' '.join(_WORD.findall(text.casefold()))} "
+    for phrase in _PHRASES:
+        padded = padded.replace(f" {phrase} ", f" {PROCEDURE_PHRASES[phrase]} ")
+    return [PROCEDURE_WORDS.get(w, w) for w in padded.split()]
+
+
+def _stem(word: str) -> str:
+    """Crude stem so "compliance"/"compliant" and "neurological"/"neurology" compare equal."""
+    return word[:6]
+
+
+def _weeks(text: str) -> List[float]:
+    return [float(n) * WEEKS_PER_UNIT[unit] for n, unit in _DURATION.findall(text.casefold())]
+
+
+@dataclass(frozen=True)
+class Requirement:
+    """A procedure rule requirement, reduced to what can be looked up in the claim."""
+    text: str
+    kind: str  # "document", "limit", "criteria" or "note"
+    terms: FrozenSet[str]  # Stems that must all appear in the claim
+    examples: FrozenSet[str]  # Stems of parenthesised examples, any one of which must appear
+    min_weeks: Optional[float]
+    conditional: bool
+
+
+@lru_cache(maxsize=4096)
+def parse_requirement(text: str) -> Requirement:
+    lowered = text.casefold()
+    if _NOTE.search(lowered):
+        kind = "note"
+    elif _LIMIT.search(lowered):
+        kind = "limit"
+    elif _CRITERIA.search(lowered):
+        kind = "criteria"
+    else:
+        kind = "document"
+    examples = " ".join(_PARENTHESES.findall(lowered))
+    main = _PARENTHESES.sub(" ", lowered)
+    weeks = _weeks(main)
+
+    def stems(value: str) -> FrozenSet[str]:
+        return frozenset(
+            _stem(w) for w in _normalized_words(value) if w not in GENERIC_WORDS and not w.isdigit()
+        )
+
+    return Requirement(
+        text=text,
+        kind=kind,
+        terms=stems(main),
+        examples=stems(examples),
+        min_weeks=max(weeks) if weeks else None,
+        conditional=bool(_CONDITIONAL.search(lowered)),
+    )
+
+
+def _contains(stems: Set[str], stem: str) -> bool:
+    return stem in stems or (len(stem) >= 4 and any(s.startswith(stem) for s in stems))
+
+
+@dataclass
+class ClaimEvidence:
+    """What the claim documents say, indexed for requirement lookups."""
+    text: str  # Provider documents (bill, notes, records)
+    payer_text: str  # Denial letter and other payer documents
+    stems: Set[str]  # Stems the provider documents mention outside a negation
+    negated: Set[str]  # Stems they mention only after "no", "without", ...
+    disputed: Set[str]  # Stems the payer documents mention (what the denial says is missing)
+    weeks: List[float]  # Durations the provider documents mention, in weeks
+    denial_codes: Set[str]
+    auth_fields: List[str]  # Values of provider fields named like an authorization
+
+    def has(self, stem: str) -> bool:
+        return _contains(self.stems, stem)
+
+    def negates(self, stem: str) -> bool:
+        return _contains(self.negated, stem)
+
+    def disputes(self, stem: str) -> bool:
+        return _contains(self.disputed, stem)
+
+
+def _field_values(value) -> Iterable[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _field_values(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _field_values(item)
+    elif value is not None:
+        yield str(value)
+
+
+def is_payer_document(key: str, doc: dict) -> bool:
+    structured = doc.get("structured") if isinstance(doc.get("structured"), dict) else {}
+    doc_type = doc.get("doc_type") or structured.get("doc_type")
+    return key in PAYER_DOCUMENTS or doc_type in PAYER_DOC_TYPES or "denial_reason" in structured
+
+
+def claim_evidence(ocr_data: dict) -> ClaimEvidence:
+    """
+    Index the extracted fields and raw text of a claim's documents. Only provider
+    documents count as evidence; payer documents supply the denial codes and the
+    requirements the payer disputes.
+    """
+    parts, payer_parts, denial_codes, auth_fields = [], [], set(), []
+    for key, doc in (ocr_data or {}).items():
+        if not isinstance(doc, dict):
+            continue
+        payer = is_payer_document(key, doc)
+        target = payer_parts if payer else parts
+        structured = doc.get("structured") or {}
+        if isinstance(structured, dict):
+            for name, value in structured.items():
+                if name == "denial_code" and value:
+                    denial_codes.add(canonical_denial_code(str(value)))
+                elif _AUTH_FIELD.search(name) and not payer:
+                    auth_fields.extend(_field_values(value))
+                # Field names carry meaning too ("physical_exam": "...")
+                target.append(name.replace("_", " "))
+                target.extend(_field_values(value))
+        if isinstance(doc.get("raw_text"), str):
+            target.append(doc["raw_text"])
+    text, payer_text = "\n".join(parts), "\n".join(payer_parts)
+
+    stems, negated, countdown = set(), set(), 0
+    for word in _normalized_words(text):
+        if word in NEGATIONS:
+            countdown = NEGATION_WINDOW
+            continue
+        if countdown:
+            countdown -= 1
+            negated.add(_stem(word))
+        else:
+            stems.add(_stem(word))
+    return ClaimEvidence(
+        text=text, payer_text=payer_text, stems=stems, negated=negated - stems,
+        disputed={_stem(w) for w in _normalized_words(payer_text)}, weeks=_weeks(text),
+        denial_codes=denial_codes, auth_fields=auth_fields,
+    )
+
+
+@lru_cache(maxsize=4096)
+def procedure_stems(procedure: str) -> FrozenSet[str]:
+    return frozenset(_stem(w) for w in _normalized_words(procedure))
+
+
+def check_requirement(requirement: Requirement, evidence: ClaimEvidence, procedure: str = "") -> str:
+    """
+    PRESENT, MISSING or UNCLEAR for a requirement ("criteria" ones are always
+    UNCLEAR: whether a claim meets them takes judgment). Words of the claimed
+    procedure itself ("MRI" in "X-ray performed prior to MRI" for a Lumbar MRI) are
+    always in the claim, so they only count when the requirement has nothing else.
+    A requirement the denial letter names is never PRESENT: the payer has already
+    looked at the documents and found it lacking.
+    """
+    if requirement.kind == "criteria":
+        return UNCLEAR
+    terms = requirement.terms - procedure_stems(procedure) or requirement.terms
+    if not terms and not requirement.examples:
+        return UNCLEAR  # Nothing specific to look for ("Clinical notes")
+    present = [t for t in terms if evidence.has(t)]
+    example_found = any(evidence.has(t) for t in requirement.examples)
+    disputed = all(evidence.disputes(t) for t in terms) and (
+        not requirement.examples or any(evidence.disputes(t) for t in requirement.examples)
+    )
+    if len(present) == len(terms) and (example_found or not requirement.examples):
+        if disputed:
+            return UNCLEAR
+        if requirement.min_weeks is None:
+            return PRESENT
+        # The duration must be stated and long enough; anything else is for a reviewer to read
+        return PRESENT if any(w >= requirement.min_weeks for w in evidence.weeks) else UNCLEAR
+    mentioned = present or example_found or any(evidence.negates(t) for t in terms)
+    return UNCLEAR if mentioned else MISSING
+
+
+def check_prior_auth(evidence: ClaimEvidence) -> Tuple[bool, bool]:
+    """(obtained, absent): whether the claim shows an authorization, and whether it says there was none."""
+    obtained = any(
+        value.strip().casefold() not in EMPTY_VALUES for value in evidence.auth_fields
+    ) or bool(_AUTH_OBTAINED.search(evidence.text))
+    absent = bool(evidence.denial_codes & AUTH_ABSENT_DENIAL_CODES) or any(
+        _AUTH_ABSENT.search(text) for text in (evidence.text, evidence.payer_text)
+    )
+    return obtained, absent
+
+
+@dataclass
+class RuleEngineResult:
+    analysis: PolicyAnalysis
+    ambiguous: bool
+    reasons: List[str] = field(default_factory=list)  # Why the LLM is needed (empty when decided)
+    matched_rules: List[str] = field(default_factory=list)  # procedure_rules keys evaluated
+    unclear: List[str] = field(default_factory=list)  # Requirements the engine could not decide
+
+
+class PolicyRuleEngine:
+    """Evaluates procedure_rules against a claim and keeps a tally of how many claims it decided."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"claims": 0, "decided": 0, "ambiguous": 0, "reasons": {}}
+
+    def evaluate(self, ocr_data: dict, rules: Optional[dict]) -> RuleEngineResult:
+        """
+        Check a claim against the plan's procedure rules.
+
+        Args:
+            ocr_data: Documents of the claim with their extracted ("structured") fields and raw text
+            rules: Insurance plan rules, as loaded by the rules registry
+
+        Returns:
+            RuleEngineResult whose analysis is final unless ambiguous is set
+        """
+        result = self._evaluate(ocr_data or {}, rules)
+        if result.ambiguous:
+            logger.debug(f"Policy rule engine left the claim to the LLM: {result.reasons} {result.unclear}")
+        with self._lock:
+            self.stats["claims"] += 1
+            self.stats["ambiguous" if result.ambiguous else "decided"] += 1
+            for reason in result.reasons:
+                self.stats["reasons"][reason] = self.stats["reasons"].get(reason, 0) + 1
+        return result
+
+    def _evaluate(self, ocr_data: dict, rules: Optional[dict]) -> RuleEngineResult:
+        empty = PolicyAnalysis(findings=[], prior_auth_required=False, policy_limit_issues=False)
+        plan = plan_for_rules(rules)
+        if plan is None or not plan.procedure_rules:
+            return RuleEngineResult(empty, ambiguous=True, reasons=[NO_RULES])
+        claim_fields = [doc.get("structured") or {} for doc in ocr_data.values() if isinstance(doc, dict)]
+        cpt_codes, procedures = claim_codes(claim_fields)
+        keys = plan.match(cpt_codes, procedures)
+        if not keys:
+            return RuleEngineResult(empty, ambiguous=True, reasons=[NO_MATCHING_RULE])
+
+        reasons = []
+        if not any(code in plan.cpt_index for code in cpt_codes):
+            # A similar procedure name may still be the wrong rule
+            reasons.append(NAME_MATCH_ONLY)
+
+        evidence = claim_evidence(ocr_data)
+        findings, unclear = [], []
+        prior_auth_required = policy_limit_issues = False
+        for key in keys:
+            rule = plan.procedure_rules[key]
+            prior_auth_required |= rule.prior_authorization_required
+            findings.extend(self._requirement_findings(rule, evidence, unclear))
+            policy_limit_issues |= any(
+                parse_requirement(text).kind == "limit" for text in rule.requirements
+            )
+        auth_finding = self._prior_auth_finding(
+            [plan.procedure_rules[key] for key in keys], evidence, prior_auth_required
+        )
+        if auth_finding is None:
+            reasons.append(CONFLICTING_PRIOR_AUTH)
+        else:
+            findings.insert(0, auth_finding)
+        if unclear:
+            reasons.append(UNCLEAR_REQUIREMENT)
+
+        analysis = PolicyAnalysis(
+            findings=findings, prior_auth_required=prior_auth_required, policy_limit_issues=policy_limit_issues
+        )
+        return RuleEngineResult(analysis, ambiguous=bool(reasons), reasons=reasons, matched_rules=keys, unclear=unclear)
+
+    @staticmethod
+    def _prior_auth_finding(rules: List[ProcedureRule], evidence: ClaimEvidence, required: bool) -> Optional[PolicyFinding]:
+        procedures = ", ".join(f"{rule.procedure} ({rule.cpt_code})" for rule in rules)
+        if not required:
+            return PolicyFinding(
+                issue="Prior Authorization", status="COMPLIANT",
+                details=f"The plan does not require prior authorization for {procedures}."
+            )
+        obtained, absent = check_prior_auth(evidence)
+        if obtained and absent:
+            return None
+        if obtained:
+            return PolicyFinding(
+                issue="Prior Authorization", status="COMPLIANT",
+                details=f"Prior authorization is required for {procedures} and the claim documents show it was obtained."
+            )
+        if absent:
+            return PolicyFinding(
+                issue="Missing Prior Authorization", status="VIOLATION",
+                details=f"Prior authorization is required for {procedures} and the payer reports none was on file."
+            )
+        return PolicyFinding(
+            issue="Prior Authorization Not Documented", status="WARNING",
+            details=f"Prior authorization is required for {procedures}; attach the approval, the claim documents do not show one."
+        )
+
+    @staticmethod
+    def _requirement_findings(rule: ProcedureRule, evidence: ClaimEvidence, unclear: List[str]) -> List[PolicyFinding]:
+        findings = []
+        for text in rule.requirements:
+            requirement = parse_requirement(text)
+            if requirement.kind == "note":
+                continue
+            if requirement.kind == "limit":
+                findings.append(PolicyFinding(
+                    issue="Policy Limit", status="WARNING",
+                    details=f"{rule.procedure} ({rule.cpt_code}): {text}. Confirm the claim stays within it."
+                ))
+                continue
+            outcome = check_requirement(requirement, evidence, rule.procedure)
+            if outcome == PRESENT:
+                findings.append(PolicyFinding(
+                    issue=text, status="COMPLIANT",
+                    details=f"Required for {rule.procedure} ({rule.cpt_code}) and found in the claim documents."
+                ))
+            elif outcome == MISSING:
+                findings.append(PolicyFinding(
+                    issue=f"Missing: {text}", status="WARNING" if requirement.conditional else "VIOLATION",
+                    details=f"Required for {rule.procedure} ({rule.cpt_code}) but not found in the claim documents."
+                ))
+            elif requirement.conditional:
+                findings.append(PolicyFinding(
+                    issue=text, status="WARNING",
+                    details=f"Required for {rule.procedure} ({rule.cpt_code}) where applicable; could not confirm it from the claim documents."
+                ))
+            else:
+                unclear.append(text)
+        return findings
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = {**self.stats, "reasons": dict(self.stats["reasons"])}
+        stats["llm_skip_rate"] = round(stats["decided"] / stats["claims"], 4) if stats["claims"] else 0.0
+        return stats
+
+
+# Global policy rule engine instance
+policy_rule_engine = PolicyRuleEngine()
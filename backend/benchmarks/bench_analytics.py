@@ -0,0 +1,106 @@
+"""
+Benchmark the analytics endpoint: rollup reads vs. ad-hoc aggregation.
+
+For growing amounts of history, seeds denial_patterns and reasoning_results in a
+temporary SQLite database, builds the rollups with utils.analytics.backfill_rollups
+and compares utils.analytics.get_analytics against the GROUP BY / json_each
+queries the dashboard would otherwise run over the raw tables.
+
+Usage (from the backend directory):
+    python benchmarks/bench_analytics.py [--sizes 10000,100000,400000] [--repeat 20]
+"""
+import sys
+import os
+import argparse
+import gc
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, DenialPattern, ReasoningResult, _engine_options, _set_sqlite_pragmas
+from utils.analytics import backfill_rollups, get_analytics
+
+INSURERS = ["Aetna PPO", "BlueCross BlueShield", "Cigna", "Humana", "Medicare", "UnitedHealthcare"]
+DOCS = ["Clinical notes", "Imaging report", "PT notes", "Prior auth form", "Referral", "Lab results"]
+
+AD_HOC = [
+    "SELECT insurance, SUM(occurrence_count) AS n FROM denial_patterns GROUP BY insurance ORDER BY n DESC LIMIT 10",
+    "SELECT denial_code, SUM(occurrence_count) AS n FROM denial_patterns GROUP BY denial_code ORDER BY n DESC LIMIT 10",
+    "SELECT strftime('%Y-%W', last_seen) AS week, SUM(occurrence_count) FROM denial_patterns "
+    "GROUP BY week ORDER BY week DESC LIMIT 12",
+    "SELECT value, SUM(occurrence_count) AS n FROM denial_patterns, json_each(missing_docs) "
+    "GROUP BY value ORDER BY n DESC LIMIT 10",
+    "SELECT AVG(denial_risk_score) FROM reasoning_results WHERE reasoning_type = 'pre_claim'",
+    "SELECT value, COUNT(*) AS n FROM reasoning_results, json_each(missing_requirements) "
+    "GROUP BY value ORDER BY n DESC LIMIT 10",
+]
+
+
+def seed(Session, size: int, rng: random.Random):
+    now = datetime.utcnow()
+    with Session() as db:
+        db.bulk_insert_mappings(DenialPattern, [
+            {
+                "insurance": rng.choice(INSURERS), "denial_code": f"CO-{rng.randint(1, 300)}",
+                "procedure": f"Procedure {i}", "cpt_code": str(rng.randint(70000, 79999)),
+                "missing_docs": rng.sample(DOCS, 2), "resolved_by": [], "occurrence_count": rng.randint(1, 5),
+                "last_seen": now - timedelta(days=rng.randint(0, 365))
+            }
+            for i in range(size)
+        ])
+        db.bulk_insert_mappings(ReasoningResult, [
+            {
+                "session_id": str(i), "reasoning_type": "pre_claim", "denial_risk_score": rng.randint(0, 100),
+                "missing_requirements": rng.sample(DOCS, 2), "created_at": now - timedelta(days=rng.randint(0, 365))
+            }
+            for i in range(size // 2)
+        ])
+        db.commit()
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics rollup benchmark")
+    parser.add_argument("--sizes", default="10000,100000,400000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print("\n📊 ANALYTICS ROLLUP BENCHMARK")
+    print("===========================================")
+    print(f"   {'history':>9} {'ad-hoc scan':>14} {'rollups':>12} {'rollup rows':>12}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            url = f"sqlite:///{Path(tmp_dir) / 'analytics.db'}"
+            engine = create_engine(url, **_engine_options(url))
+            event.listen(engine, "connect", _set_sqlite_pragmas)
+            Base.metadata.create_all(bind=engine)
+            Session = sessionmaker(bind=engine)
+            seed(Session, size, rng)
+            gc.collect()  # Don't time collection of the seed data
+            with Session() as db:
+                backfill_rollups(db)
+                rollup_rows = db.execute(text("SELECT COUNT(*) FROM analytics_rollups")).scalar()
+                scan = timed(lambda: [db.execute(text(sql)).all() for sql in AD_HOC], max(args.repeat // 10, 1))
+                rollups = timed(lambda: get_analytics(db), args.repeat)
+            engine.dispose()
+        print(f"   {size:>9} {scan * 1000:>11.1f} ms {rollups * 1000:>9.2f} ms {rollup_rows:>12}")
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Report the effect of compressed storage on database size and read latency.
+
+Builds two SQLite databases holding the same OCR text, OCR layout and reasoning
+JSON rows, one plain and one compressed as database.CompressedText/CompressedJSON
+store them, then compares file size and the time to read and decode every row.
+OCR text is taken from the app database when it has any, otherwise synthesized.
+Also reports how much archiving would save on the sample PDFs in TestFiles.
+
+Usage (from the backend directory):
+    python benchmarks/bench_compression.py [--rows 2000] [--db data/app.db]
+"""
+import sys
+import os
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.compression import compress_bytes, compress_text, decompress_text, default_codec, is_compressed, ZSTD
+
+MIN_BYTES = 1024  # settings.COMPRESS_MIN_BYTES default
+
+BILL_LINES = [
+    "PATIENT NAME: {name}    DOB: {dob}    MEMBER ID: {member}",
+    "CPT {cpt}  {procedure}  UNITS 1  CHARGE ${amount}",
+    "DIAGNOSIS CODE ICD-10 {icd}  PRIMARY",
+    "CLAIM NUMBER {claim}  DATE OF SERVICE {dob}",
+    "DENIAL REASON CODE CO-{code}: Prior authorization was not obtained.",
+    "The documentation submitted does not establish medical necessity for the service.",
+    "Please submit supporting clinical notes within 180 days of this notice.",
+]
+
+
+def synthetic_ocr_text(rng: random.Random) -> str:
+    lines = []
+    for _ in range(rng.randint(40, 160)):
+        lines.append(rng.choice(BILL_LINES).format(
+            name=rng.choice(["JOHN SMITH", "MARIA GARCIA", "WEI CHEN", "AISHA KHAN"]),
+            dob=f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1950, 2020)}",
+            member=rng.randint(10**8, 10**9),
+            cpt=rng.randint(10000, 99999),
+            procedure=rng.choice(["MRI LUMBAR SPINE", "KNEE ARTHROSCOPY", "CT ABDOMEN", "PHYSICAL THERAPY"]),
+            amount=f"{rng.uniform(50, 5000):.2f}",
+            icd=f"M{rng.randint(10, 99)}.{rng.randint(0, 9)}",
+            claim=rng.randint(10**9, 10**10),
+            code=rng.randint(1, 300),
+        ))
+    return "\n".join(lines)
+
+
+def synthetic_layout(text: str, rng: random.Random) -> dict:
+    lines = text.split("\n")
+    return {
+        "lines": lines,
+        "boxes": [[rng.randint(0, 2000) for _ in range(4)] for _ in lines],
+        "scores": [round(rng.uniform(0.8, 1.0), 4) for _ in lines],
+        "pages": [i // 50 for i in range(len(lines))],
+    }
+
+
+def load_texts(db_path: Path, rows: int) -> list:
+    if not db_path.exists():
+        return []
+    with sqlite3.connect(db_path) as conn:
+        try:
+            values = [r[0] for r in conn.execute(
+                "SELECT ocr_text FROM uploaded_documents WHERE ocr_text IS NOT NULL LIMIT ?", (rows,)
+            )]
+        except sqlite3.Error:
+            return []
+    return [decompress_text(v) for v in values if v]
+
+
+def compress_json(value) -> str:
+    encoded = json.dumps(value)
+    packed = compress_text(encoded, MIN_BYTES)
+    return packed if is_compressed(packed) else encoded
+
+
+def build(path: Path, records: list, compressed: bool):
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE docs (id INTEGER PRIMARY KEY, ocr_text TEXT, ocr_layout JSON, output_data JSON)")
+        for i, (text, layout, output) in enumerate(records):
+            if compressed:
+                row = (i, compress_text(text, MIN_BYTES), compress_json(layout), compress_json(output))
+            else:
+                row = (i, text, json.dumps(layout), json.dumps(output))
+            conn.execute("INSERT INTO docs VALUES (?, ?, ?, ?)", row)
+        conn.commit()
+        conn.execute("VACUUM")
+
+
+def read_all(path: Path) -> float:
+    start = time.perf_counter()
+    with sqlite3.connect(path) as conn:
+        for text, layout, output in conn.execute("SELECT ocr_text, ocr_layout, output_data FROM docs"):
+            decompress_text(text)
+            json.loads(decompress_text(layout))
+            json.loads(decompress_text(output))
+    return time.perf_counter() - start
+
+
+def read_one(path: Path, ids: list) -> float:
+    """Average latency of single-row lookups, like analyze loading one document."""
+    with sqlite3.connect(path) as conn:
+        start = time.perf_counter()
+        for doc_id in ids:
+            text, layout = conn.execute("SELECT ocr_text, ocr_layout FROM docs WHERE id = ?", (doc_id,)).fetchone()
+            decompress_text(text)
+            json.loads(decompress_text(layout))
+        return (time.perf_counter() - start) / len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compressed storage report")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--db", type=Path, default=Path(__file__).resolve().parent.parent / "data" / "app.db")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    texts = load_texts(args.db, args.rows)
+    source = f"{len(texts)} rows from {args.db}" if texts else "synthetic OCR text"
+    texts += [synthetic_ocr_text(rng) for _ in range(args.rows - len(texts))]
+    records = [
+        (text, synthetic_layout(text, rng), {"explanation": text[:1500], "missing_requirements": text.split("\n")[:10]})
+        for text in texts
+    ]
+
+    print("\n📊 COMPRESSED STORAGE REPORT")
+    print("===========================================")
+    print(f"   Codec: {'zstd' if default_codec() == ZSTD else 'zlib'}   Rows: {len(records)} ({source})")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {}
+        lookup_ids = [rng.randrange(len(records)) for _ in range(500)]
+        for label, compressed in (("plain", False), ("compressed", True)):
+            path = Path(tmp_dir) / f"{label}.db"
+            build(path, records, compressed)
+            read_all(path)  # Warm the page cache
+            results[label] = (path.stat().st_size, read_all(path), read_one(path, lookup_ids))
+
+        for label, (size, full_scan, lookup) in results.items():
+            print(f"   {label:<11} {size / 1024 / 1024:>8.2f} MB   full read {full_scan * 1000:>8.1f} ms   "
+                  f"row lookup {lookup * 1e6:>7.1f} µs")
+        plain, packed = results["plain"][0], results["compressed"][0]
+        print(f"   Size reduction: {(1 - packed / plain) * 100:.1f}%")
+
+    test_files = Path(__file__).resolve().parent.parent.parent / "TestFiles"
+    pdfs = sorted(test_files.glob("*.pdf")) if test_files.exists() else []
+    if pdfs:
+        print("\n   Archived file savings (sample PDFs)")
+        for pdf in pdfs:
+            data = pdf.read_bytes()
+            ratio = len(compress_bytes(data)) / len(data)
+            verdict = "archived" if ratio <= 0.9 else "kept as-is"
+            print(f"   {pdf.name:<28} {len(data) / 1024:>8.1f} KB   ratio {ratio:>5.2f}   {verdict}")
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
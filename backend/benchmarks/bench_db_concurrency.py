@@ -0,0 +1,176 @@
+"""
+Benchmark concurrent database reads and writes.
+
+1. Threads: writer threads insert documents (one commit each) while reader threads
+   run the document listing query, on a default SQLite engine (rollback journal)
+   and on the tuned engine from database.py (WAL, pragmas, pool). Reports
+   throughput and "database is locked" errors.
+2. Event loop: concurrent async handlers run the listing query through the sync
+   Session (blocking the loop, as routes did before) and through AsyncSession,
+   reporting request throughput and the worst event-loop stall.
+
+Usage (from the backend directory):
+    python benchmarks/bench_db_concurrency.py [--writers 4] [--readers 4] [--seconds 5]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, UploadedDocument, _engine_options, _set_sqlite_pragmas, async_database_url
+
+
+def listing_query():
+    return select(
+        UploadedDocument.id, UploadedDocument.filename, UploadedDocument.file_path
+    ).where(UploadedDocument.category == "PreClaim").order_by(UploadedDocument.id.desc()).limit(200)
+
+
+def make_engine(url: str, tuned: bool):
+    if not tuned:
+        # What database.py used to create: no pragmas, default pool, rollback journal
+        return create_engine(url, connect_args={"check_same_thread": False})
+    engine = create_engine(url, **_engine_options(url))
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([
+            UploadedDocument(filename=f"seed_{i}.pdf", file_path=f"/tmp/seed_{i}.pdf", category="PreClaim")
+            for i in range(rows)
+        ])
+        db.commit()
+
+
+def run_threads(engine, writers: int, readers: int, seconds: float) -> dict:
+    Session = sessionmaker(bind=engine)
+    stop = threading.Event()
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def writer(n):
+        i = 0
+        while not stop.is_set():
+            try:
+                with Session() as db:
+                    db.add(UploadedDocument(filename=f"w{n}_{i}.pdf", file_path=f"/tmp/w{n}_{i}.pdf", category="PreClaim"))
+                    db.commit()
+                count("writes")
+            except OperationalError:
+                count("errors")
+            i += 1
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with Session() as db:
+                    db.execute(listing_query()).all()
+                count("reads")
+            except OperationalError:
+                count("errors")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return {key: value / seconds if key != "errors" else value for key, value in counts.items()}
+
+
+async def run_handlers(sync_engine, async_engine, use_async: bool, requests: int, concurrency: int):
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+    max_stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal max_stall
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            max_stall = max(max_stall, now - last)
+            last = now
+
+    async def handler():
+        if use_async:
+            async with AsyncSession() as db:
+                (await db.execute(listing_query())).all()
+        else:
+            with SyncSession() as db:
+                db.execute(listing_query()).all()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            await handler()
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker_task
+    return requests / elapsed, max_stall
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Database concurrency benchmark")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    print("\n📊 DATABASE CONCURRENCY BENCHMARK")
+    print("===========================================")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"   Threads: {args.writers} writers, {args.readers} readers, {args.seconds:.0f}s")
+        for label, tuned in (("default", False), ("wal+pragmas", True)):
+            url = f"sqlite:///{Path(tmp_dir) / f'{label}.db'}"
+            engine = make_engine(url, tuned)
+            seed(engine, args.seed_rows)
+            result = run_threads(engine, args.writers, args.readers, args.seconds)
+            print(f"   {label:<12} {result['writes']:>8.0f} writes/s {result['reads']:>8.0f} reads/s "
+                  f"{result['errors']:>6} lock errors")
+            engine.dispose()
+
+        url = f"sqlite:///{Path(tmp_dir) / 'wal+pragmas.db'}"
+        sync_engine = make_engine(url, tuned=True)
+        async_engine = create_async_engine(async_database_url(url), **_engine_options(url, async_driver=True))
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        print(f"\n   Event loop: {args.requests} listing requests, 20 concurrent")
+        for label, use_async in (("sync Session", False), ("AsyncSession", True)):
+            rate, stall = await run_handlers(sync_engine, async_engine, use_async, args.requests, 20)
+            print(f"   {label:<13} {rate:>8.0f} req/s   max loop stall {stall * 1000:>8.1f} ms")
+        sync_engine.dispose()
+        await async_engine.dispose()
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""
+Benchmark the in-memory denial knowledge graph at ~1M edges.
+
+Generates synthetic denial patterns (insurer plan, denial code, CPT, procedure,
+missing documents, resolutions) until the graph holds the requested number of
+edges, then reports build time and multi-hop query latency. The first query is
+also run as SQL over the flat table (json_each on the JSON arrays) in a
+temporary SQLite database for comparison.
+
+Usage (from the backend directory):
+    python benchmarks/bench_knowledge_graph.py [--edges 1000000] [--queries 200]
+"""
+import sys
+import os
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.knowledge_graph import KnowledgeGraph
+
+Row = namedtuple("Row", "id insurance denial_code cpt_code procedure missing_docs resolved_by occurrence_count")
+
+PAYERS = ["BlueCross {} PPO", "Blue Cross Blue Shield of {}", "Aetna {}", "Cigna {}", "UnitedHealthcare {}",
+          "Humana {}", "Medicare {}", "Kaiser {}"]
+STATES = ["Texas", "Ohio", "Illinois", "Florida", "California", "Georgia", "Michigan", "Arizona"]
+DOCS = [f"Document type {i}" for i in range(300)]
+RESOLUTIONS = [f"Resolution {i}" for i in range(200)]
+
+
+def make_rows(edges: int, rng: random.Random) -> list:
+    rows, total = [], 0
+    while total < edges:
+        docs = rng.sample(DOCS, rng.randint(1, 4))
+        fixes = rng.sample(RESOLUTIONS, rng.randint(1, 3))
+        rows.append(Row(
+            id=len(rows) + 1,
+            insurance=rng.choice(PAYERS).format(rng.choice(STATES)),
+            denial_code=f"CO-{rng.randint(1, 300)}",
+            cpt_code=str(rng.randint(70000, 72000)),
+            procedure=f"Procedure {rng.randint(1, 3000)}",
+            missing_docs=docs,
+            resolved_by=fixes,
+            occurrence_count=rng.randint(1, 20),
+        ))
+        total += 4 + len(docs) + len(fixes)
+    return rows
+
+
+def sql_baseline(rows: list, cpts: list) -> float:
+    with tempfile.TemporaryDirectory() as tmp_dir, sqlite3.connect(Path(tmp_dir) / "patterns.db") as conn:
+        conn.execute("CREATE TABLE denial_patterns (id INTEGER PRIMARY KEY, insurance TEXT, denial_code TEXT, "
+                     "cpt_code TEXT, procedure TEXT, missing_docs JSON, resolved_by JSON, occurrence_count INTEGER)")
+        conn.execute("CREATE INDEX ix_cpt ON denial_patterns (cpt_code)")
+        conn.executemany("INSERT INTO denial_patterns VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+            (r.id, r.insurance, r.denial_code, r.cpt_code, r.procedure, json.dumps(r.missing_docs),
+             json.dumps(r.resolved_by), r.occurrence_count) for r in rows
+        ])
+        conn.commit()
+        start = time.perf_counter()
+        for cpt in cpts:
+            conn.execute(
+                "SELECT value, SUM(occurrence_count) AS weight FROM denial_patterns, json_each(missing_docs) "
+                "WHERE cpt_code = ? GROUP BY value ORDER BY weight DESC LIMIT 10", (cpt,)
+            ).fetchall()
+        return (time.perf_counter() - start) / len(cpts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge graph benchmark")
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rows = make_rows(args.edges, rng)
+
+    print("\n📊 KNOWLEDGE GRAPH BENCHMARK")
+    print("===========================================")
+    graph = KnowledgeGraph()
+    start = time.perf_counter()
+    graph.build(rows)
+    build_time = time.perf_counter() - start
+    metrics = graph.metrics()
+    print(f"   Patterns: {metrics['patterns']}   nodes: {metrics['nodes']}   edges: {metrics['edges']}")
+    print(f"   Build: {build_time:.2f}s")
+
+    cpts = [rng.choice(rows).cpt_code for _ in range(args.queries)]
+    queries = {
+        "missing docs for a CPT, all payers": [("missing_doc", {"cpt": [c]}) for c in cpts],
+        "resolutions for a code at any BlueCross plan": [
+            ("resolution", {"denial_code": [f"CO-{rng.randint(1, 300)}"], "insurer": ["BlueCross"]})
+            for _ in range(args.queries)
+        ],
+        "denial codes for a payer + missing doc": [
+            ("denial_code", {"insurer": [rng.choice(["Aetna", "Cigna", "Humana"])], "missing_doc": [rng.choice(DOCS)]})
+            for _ in range(args.queries)
+        ],
+        "top missing docs, whole graph": [("missing_doc", {})] * min(args.queries, 10),
+    }
+    for label, batch in queries.items():
+        latencies = []
+        for target, filters in batch:
+            t = time.perf_counter()
+            graph.query(target, filters)
+            latencies.append((time.perf_counter() - t) * 1000)
+        print(f"   {label:<46} p50 {np.percentile(latencies, 50):>8.3f} ms   p99 {np.percentile(latencies, 99):>8.3f} ms")
+
+    extra = make_rows(1000, rng)
+    start = time.perf_counter()
+    graph.apply(Row(*((r.id + len(rows),) + tuple(r[1:]))) for r in extra)
+    print(f"   Incremental update: {(time.perf_counter() - start) / len(extra) * 1e6:.1f} µs/pattern")
+
+    sql_time = sql_baseline(rows, cpts[:50])
+    print(f"\n   SQL json_each baseline (missing docs for a CPT): {sql_time * 1000:.3f} ms/query")
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark OCR throughput (images per second) for different batch sizes.
+
+Usage (from the backend directory):
+    python benchmarks/bench_ocr_batching.py [--batch-sizes 1 2 4 8]
+"""
+import sys
+import os
+import argparse
+import tempfile
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf2image import convert_from_path
+from ocr.paddle_ocr import ocr_processor
+
+TEST_FILES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "TestFiles")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR batch size benchmark")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--files-dir", default=TEST_FILES_DIR)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Render every test PDF page once so all runs OCR the same images
+        image_paths = []
+        for name in sorted(os.listdir(args.files_dir)):
+            if not name.lower().endswith(".pdf"):
+                continue
+            pages = convert_from_path(os.path.join(args.files_dir, name))
+            for i, page in enumerate(pages):
+                img_path = os.path.join(tmp_dir, f"{os.path.splitext(name)[0]}_{i}.jpg")
+                page.save(img_path, "JPEG")
+                image_paths.append(img_path)
+
+        print(f"\n📊 OCR BATCHING BENCHMARK ({len(image_paths)} page images)")
+        print("===========================================")
+        report = ocr_processor.benchmark_batch_sizes(image_paths, args.batch_sizes)
+        for size, row in report.items():
+            print(f"   batch_size={size:<3} {row['seconds']:>8.2f}s  {row['images_per_second']:>6.2f} images/s")
+        print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark OCR preprocessing presets on the bundled TestFiles.
+
+Every preset OCRs the same PDFs. Speed is reported as total seconds, accuracy as
+word-level similarity against the 'off' preset (full resolution, color, angle
+classifier always on), which is the original pipeline.
+
+Usage (from the backend directory):
+    python benchmarks/bench_ocr_preprocess.py [--presets off fast balanced accurate]
+"""
+import sys
+import os
+import argparse
+import difflib
+import time
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr.paddle_ocr import OCRProcessor
+from ocr.preprocess import PRESETS
+
+TEST_FILES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "TestFiles")
+
+
+def word_similarity(reference: str, candidate: str) -> float:
+    return difflib.SequenceMatcher(None, reference.split(), candidate.split(), autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR preprocessing preset benchmark")
+    parser.add_argument("--presets", nargs="+", default=list(PRESETS))
+    parser.add_argument("--files-dir", default=TEST_FILES_DIR)
+    args = parser.parse_args()
+
+    files = [os.path.join(args.files_dir, name) for name in sorted(os.listdir(args.files_dir)) if name.lower().endswith(".pdf")]
+    presets = ["off"] + [name for name in args.presets if name != "off"]
+
+    texts, timings = {}, {}
+    for name in presets:
+        processor = OCRProcessor(preset=name)
+        start = time.perf_counter()
+        texts[name] = [processor.extract_text_from_pdf(path) for path in files]
+        timings[name] = time.perf_counter() - start
+        processor.batcher.close()
+
+    print(f"\n📊 OCR PREPROCESSING BENCHMARK ({len(files)} PDFs)")
+    print("===========================================")
+    print(f"   {'preset':<10} {'seconds':>8} {'speedup':>8} {'similarity':>11}")
+    for name in presets:
+        similarity = sum(word_similarity(ref, cand) for ref, cand in zip(texts["off"], texts[name])) / max(len(files), 1)
+        speedup = timings["off"] / timings[name] if timings[name] else 0.0
+        print(f"   {name:<10} {timings[name]:>8.2f} {speedup:>7.2f}x {similarity:>10.1%}")
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark archiving of cold denial patterns.
+
+Seeds denial_patterns in a temporary SQLite database with observations spread over
+the last few years, then runs utils.memory_graph.archive_cold_patterns and compares
+the hot table and the in-process pattern index load before and after.
+
+Usage (from the backend directory):
+    python benchmarks/bench_pattern_decay.py [--size 200000] [--years 3] [--min-score 0.05]
+"""
+import sys
+import os
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, DenialPattern, DenialPatternArchive, _engine_options, _set_sqlite_pragmas
+from utils.decay import decay_weight
+from utils.memory_graph import archive_cold_patterns
+from utils.pattern_index import pattern_index
+
+INSURERS = ["Aetna PPO", "BlueCross BlueShield", "Cigna", "Humana", "Medicare", "UnitedHealthcare"]
+
+
+def seed(Session, size: int, years: float, rng: random.Random):
+    now = datetime.utcnow()
+    rows = []
+    for i in range(size):
+        last_seen = now - timedelta(days=rng.uniform(0, years * 365))
+        count = rng.randint(1, 5)
+        rows.append({
+            "insurance": rng.choice(INSURERS), "denial_code": f"CO-{rng.randint(1, 300)}",
+            "procedure": f"Procedure {i}", "cpt_code": str(rng.randint(70000, 79999)),
+            "missing_docs": ["Clinical notes"], "resolved_by": ["Prior authorization"],
+            "occurrence_count": count, "last_seen": last_seen, "decay_weight": decay_weight(count, last_seen)
+        })
+    with Session() as db:
+        db.bulk_insert_mappings(DenialPattern, rows)
+        db.commit()
+
+
+def index_load_ms(db) -> float:
+    start = time.perf_counter()
+    pattern_index.load(db)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold pattern archiving benchmark")
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--min-score", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    print("\n📊 PATTERN DECAY / ARCHIVE BENCHMARK")
+    print("===========================================")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = f"sqlite:///{Path(tmp_dir) / 'decay.db'}"
+        engine = create_engine(url, **_engine_options(url))
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        pattern_index.signal_path = Path(tmp_dir) / "pattern_index.signal"
+        seed(Session, args.size, args.years, random.Random(42))
+
+        with Session() as db:
+            before_ms = index_load_ms(db)
+            start = time.perf_counter()
+            archived = archive_cold_patterns(db, args.min_score, args.batch_size)
+            archive_s = time.perf_counter() - start
+            hot = db.query(func.count(DenialPattern.id)).scalar()
+            cold = db.query(func.count(DenialPatternArchive.id)).scalar()
+            after_ms = index_load_ms(db)
+            start = time.perf_counter()
+            again = archive_cold_patterns(db, args.min_score, args.batch_size)
+            noop_ms = (time.perf_counter() - start) * 1000
+        engine.dispose()
+
+    print(f"   Patterns seeded:        {args.size} over {args.years:g} years")
+    print(f"   Archived (score < {args.min_score:g}): {archived} in {archive_s:.2f}s "
+          f"({archived / archive_s if archive_s else 0:.0f} rows/s)")
+    print(f"   Hot / archive rows:     {hot} / {cold}")
+    print(f"   Index load before:      {before_ms:.1f} ms")
+    print(f"   Index load after:       {after_ms:.1f} ms")
+    print(f"   Repeat sweep (nothing cold): {noop_ms:.2f} ms, {again} archived")
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark denial pattern lookups: database query vs. the in-process pattern index.
+
+Seeds a temporary SQLite database with N patterns, then times the query
+get_pattern_suggestions used to run against the same lookups served by
+utils.pattern_index.PatternIndex, plus the cost of a full index load and of
+write-through updates. Then times fuzzy searches with the insurer and procedure
+spelled differently from the stored pattern ("BlueCross PPO" for "BlueCross
+BlueShield", words reordered) and reports how often the right pattern ranks first.
+
+Usage (from the backend directory):
+    python benchmarks/bench_pattern_index.py [--patterns 100000] [--lookups 20000]
+"""
+import sys
+import os
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, DenialPattern, _engine_options, _set_sqlite_pragmas
+from utils.pattern_index import PatternIndex
+
+# Stored spelling -> spellings seen on other documents
+INSURERS = {
+    "Aetna": ["Aetna PPO", "AETNA Inc"],
+    "BlueCross BlueShield": ["BlueCross PPO", "Blue Cross Blue Shield of Texas", "BCBS"],
+    "Cigna": ["Cigna HealthSpring", "CIGNA Open Access Plus"],
+    "Humana": ["Humana Gold Plus HMO"],
+    "Medicare": ["Medicare Part B"],
+    "UnitedHealthcare": ["United Healthcare Choice Plus", "UHC"],
+    "Kaiser Permanente": ["Kaiser"],
+    "Anthem": ["Anthem Blue Cross"],
+}
+PROCEDURES = ["MRI Lumbar Spine", "Knee Arthroscopy", "CT Abdomen", "Physical Therapy", "Colonoscopy"]
+
+
+def respell_procedure(procedure: str, rng: random.Random) -> str:
+    """Reorder the words and abbreviate a few, as another document might."""
+    words = procedure.split()
+    rng.shuffle(words)
+    text = " ".join(words)
+    return text.replace("Abdomen", "Abdominal").replace("Physical Therapy", "PT")
+
+
+def seed(Session, count: int, rng: random.Random) -> list:
+    keys, seen = [], set()
+    while len(keys) < count:
+        key = (rng.choice(list(INSURERS)), f"CO-{rng.randint(1, 300)}", f"{rng.choice(PROCEDURES)} {rng.randint(1, 500)}")
+        if key not in seen:
+            seen.add(key)
+            keys.append(key)
+    with Session() as db:
+        db.add_all([
+            DenialPattern(
+                insurance=ins, denial_code=code, procedure=proc, cpt_code="00000",
+                occurrence_count=rng.randint(1, 10), missing_docs=["Clinical notes"],
+                resolved_by=["Prior authorization"], last_seen=datetime.utcnow()
+            )
+            for ins, code, proc in keys
+        ])
+        db.commit()
+    return keys
+
+
+def query_lookup(db, insurance: str, denial_code: str, procedure: str):
+    """The query get_pattern_suggestions ran before the index."""
+    return db.query(DenialPattern).filter(
+        DenialPattern.insurance == insurance,
+        DenialPattern.denial_code == denial_code,
+        DenialPattern.procedure == procedure
+    ).first()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pattern lookup benchmark")
+    parser.add_argument("--patterns", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print("\n📊 PATTERN LOOKUP BENCHMARK")
+    print("===========================================")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = f"sqlite:///{Path(tmp_dir) / 'patterns.db'}"
+        engine = create_engine(url, **_engine_options(url))
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        keys = seed(Session, args.patterns, rng)
+        # Mostly hits, some misses, in the caller's original casing
+        probes = [rng.choice(keys) for _ in range(args.lookups)]
+        probes += [(ins, "CO-999", proc) for ins, _, proc in rng.sample(keys, args.lookups // 10)]
+
+        with Session() as db:
+            start = time.perf_counter()
+            db_hits = sum(query_lookup(db, *probe) is not None for probe in probes)
+            db_time = (time.perf_counter() - start) / len(probes)
+
+        index = PatternIndex(Path(tmp_dir) / "pattern_index.signal")
+        with Session() as db:
+            index.load(db)
+            start = time.perf_counter()
+            index_hits = sum(index.lookup(*probe, db=db) is not None for probe in probes)
+            index_time = (time.perf_counter() - start) / len(probes)
+
+            rows = db.query(DenialPattern).limit(1000).all()
+            start = time.perf_counter()
+            for row in rows:
+                index.apply([row])
+            apply_time = (time.perf_counter() - start) / len(rows)
+
+            fuzzy_probes = [
+                (key, (rng.choice(INSURERS[key[0]]), key[1].replace("-", " "), respell_procedure(key[2], rng)))
+                for key in (rng.choice(keys) for _ in range(args.lookups // 4))
+            ]
+            start = time.perf_counter()
+            results = [index.search(*probe, db=db) for _, probe in fuzzy_probes]
+            fuzzy_time = (time.perf_counter() - start) / len(fuzzy_probes)
+            top1 = sum(
+                bool(matches) and (matches[0].entry.insurance, matches[0].entry.denial_code, matches[0].entry.procedure) == key
+                for (key, _), matches in zip(fuzzy_probes, results)
+            )
+            exact_misses = sum(index.lookup(*probe, db=db) is None for _, probe in fuzzy_probes)
+
+        print(f"   Patterns: {len(keys)}   Lookups: {len(probes)}")
+        print(f"   {'database query':<16} {db_time * 1e6:>9.1f} µs/lookup   {db_hits} hits")
+        print(f"   {'pattern index':<16} {index_time * 1e6:>9.1f} µs/lookup   {index_hits} hits")
+        print(f"   Speedup: {db_time / index_time:.0f}x")
+        print(f"   Index load: {index.stats['last_load_ms']:.1f} ms   write-through: {apply_time * 1e6:.1f} µs/update")
+        print(f"\n   Fuzzy search ({len(fuzzy_probes)} respelled queries)")
+        print(f"   {'exact lookup':<16} {exact_misses / len(fuzzy_probes) * 100:>8.1f}% missed")
+        print(f"   {'fuzzy search':<16} {fuzzy_time * 1e6:>9.1f} µs/search   top-1 correct {top1 / len(fuzzy_probes) * 100:.1f}%")
+        engine.dispose()
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
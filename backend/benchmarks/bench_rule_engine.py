@@ -0,0 +1,106 @@
+"""
+Report the share of claims the policy rule engine decides without the LLM.
+
+Builds a synthetic claim corpus from the bundled plans: for every procedure rule,
+a claim whose notes cover every requirement (with an authorization number where
+required), one with no supporting notes, one denied for missing authorization
+(CO-197), one whose denial letter lists every requirement as not documented, one
+whose notes cover only half of each requirement, one carrying only the procedure
+name, plus the mock OCR claim (CT Abdomen, which no plan has a rule for). Runs agents.rule_engine over each and prints the share that skips the Policy
+Agent's LLM, broken down by claim kind and by the reason the rest were left to it.
+
+This measures how often the engine can decide, not whether its findings are right;
+the claim notes reuse the rule wording, so requirement matching is at its easiest.
+
+Usage (from the backend directory):
+    python benchmarks/bench_rule_engine.py [--rules-dir insurance_rules]
+"""
+import sys
+import os
+import argparse
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.rule_engine import PolicyRuleEngine
+from ocr.mock_ocr_data import MOCK_OCR_DATA
+from utils.rules_registry import RulesRegistry
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def claim(cpt_code, procedure, note, denial_code="CO-50", denial_reason="", **bill_fields):
+    bill = {"procedure_name": procedure, **bill_fields}
+    if cpt_code:
+        bill["cpt_code"] = cpt_code
+    return {
+        "bill": {"structured": bill},
+        "doctor": {"structured": {"assessment": note}},
+        "denial": {"structured": {"denial_code": denial_code, "denial_reason": denial_reason, "procedure": procedure}},
+    }
+
+
+def half(text: str) -> str:
+    words = text.split()
+    return " ".join(words[:max(1, len(words) // 2)])
+
+
+def corpus(rule):
+    """(kind, ocr_data) claims for one procedure rule."""
+    # Durations are doubled so "6 weeks of ..." is met however the rule counts them
+    complete = ". ".join(rule.requirements).replace("+", "") + ". Duration: 52 weeks."
+    auth = {"prior_auth_number": "PA-204117"} if rule.prior_authorization_required else {}
+    yield "complete", claim(rule.cpt_code, rule.procedure, complete, **auth)
+    yield "no notes", claim(rule.cpt_code, rule.procedure, "Office visit.", denial_code="CO-16", **auth)
+    if rule.prior_authorization_required:
+        yield "no prior auth", claim(rule.cpt_code, rule.procedure, complete, denial_code="CO-197")
+    yield "denial disputes", claim(
+        rule.cpt_code, rule.procedure, complete, denial_reason="Not documented: " + "; ".join(rule.requirements), **auth
+    )
+    yield "partial notes", claim(rule.cpt_code, rule.procedure, ". ".join(half(r) for r in rule.requirements), **auth)
+    yield "name only", claim(None, rule.procedure, complete, **auth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Policy rule engine LLM skip-rate report")
+    parser.add_argument("--rules-dir", default=str(BACKEND_DIR / "insurance_rules"))
+    args = parser.parse_args()
+
+    registry = RulesRegistry(Path(args.rules_dir))
+    registry.load()
+    engine = PolicyRuleEngine()
+
+    by_kind = defaultdict(Counter)
+    timings = []
+    for summary in registry.plans():
+        plan = registry.get(summary["id"])
+        cases = [kind_claim for rule in plan.procedure_rules.values() for kind_claim in corpus(rule)]
+        cases.append(("unknown procedure", MOCK_OCR_DATA))
+        for kind, ocr_data in cases:
+            start = time.perf_counter()
+            result = engine.evaluate(ocr_data, plan.rules)
+            timings.append(time.perf_counter() - start)
+            by_kind[kind]["ambiguous" if result.ambiguous else "decided"] += 1
+
+    metrics = engine.metrics()
+    print("\n📊 POLICY RULE ENGINE BENCHMARK")
+    print("===========================================")
+    print(f"   Plans: {len(registry.plans())}   claims evaluated: {metrics['claims']}")
+    print(f"   {'claim kind':<20} {'claims':>7} {'LLM skipped':>12}")
+    for kind, counts in by_kind.items():
+        total = counts["decided"] + counts["ambiguous"]
+        print(f"   {kind:<20} {total:>7} {counts['decided'] / total:>12.0%}")
+    print("-------------------------------------------")
+    print(f"   Claims that skip the LLM: {metrics['decided']} / {metrics['claims']} ({metrics['llm_skip_rate']:.0%})")
+    for reason, count in sorted(metrics["reasons"].items(), key=lambda item: -item[1]):
+        print(f"   Sent to LLM, {reason}: {count}")
+    if timings:
+        print(f"   Evaluation time: {sum(timings) / len(timings) * 1e6:.1f} µs per claim")
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Report the prompt-size reduction from CPT-indexed rule slicing.
+
+For every bundled plan and every CPT code it has a rule for, compares the rules
+text the Policy Agent (str(rules)) and the pre-claim analysis (indented JSON)
+would put in the prompt with the whole plan vs. with utils.rules_registry's
+relevant_rules() slice. Tokens are estimated by counting words, numbers,
+punctuation marks and line breaks (with their indentation), which tracks BPE
+tokenizers closely enough for a ratio.
+
+Usage (from the backend directory):
+    python benchmarks/bench_rule_slicing.py [--rules-dir insurance_rules]
+"""
+import sys
+import os
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rules_registry import RulesRegistry, claim_codes
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+_TOKEN = re.compile(r"\w+|[^\w\s]|\n\s*")
+
+
+def tokens(text: str) -> int:
+    return len(_TOKEN.findall(text))
+
+
+PROMPT_FORMATS = {
+    "policy agent": str,
+    "pre-claim": lambda rules: json.dumps(rules, indent=2),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule slicing prompt-size report")
+    parser.add_argument("--rules-dir", default=str(BACKEND_DIR / "insurance_rules"))
+    args = parser.parse_args()
+
+    registry = RulesRegistry(Path(args.rules_dir))
+    registry.load()
+
+    print("\n📊 CPT RULE SLICING BENCHMARK")
+    print("===========================================")
+    print(f"   {'plan':<26} {'prompt':<13} {'full':>6} {'sliced':>7} {'saved':>7}")
+    totals = {name: [0, 0] for name in PROMPT_FORMATS}
+    slice_times = []
+    for summary in registry.plans():
+        plan = registry.get(summary["id"])
+        for name, render in PROMPT_FORMATS.items():
+            full = tokens(render(plan.rules))
+            sliced = []
+            for cpt_code, rule in plan.procedure_rules.items():
+                # A claim for this code, as the bill's extracted fields would carry it
+                claim = [{"cpt_code": cpt_code, "procedure_name": rule.procedure}]
+                start = time.perf_counter()
+                rules = plan.slice(*claim_codes(claim))
+                slice_times.append(time.perf_counter() - start)
+                sliced.append(tokens(render(rules)))
+            average = sum(sliced) / len(sliced) if sliced else full
+            totals[name][0] += full * len(sliced)
+            totals[name][1] += sum(sliced)
+            print(f"   {plan.name[:26]:<26} {name:<13} {full:>6} {average:>7.0f} {1 - average / full:>7.0%}")
+
+    print("-------------------------------------------")
+    for name, (full, sliced) in totals.items():
+        if full:
+            print(f"   All plans, {name:<13} prompt tokens: {full} -> {sliced} ({1 - sliced / full:.0%} fewer)")
+    if slice_times:
+        print(f"   Slice time: {sum(slice_times) / len(slice_times) * 1e6:.1f} µs per claim")
+
+    # A claim whose procedure no plan has a rule for keeps the whole plan
+    mock = [{"cpt_code": "74160", "procedure_name": "CT Abdomen"}]
+    plan = registry.get(registry.plans()[0]["id"]) if registry.plans() else None
+    if plan is not None:
+        kept = plan.slice(*claim_codes(mock)) is plan.rules
+        print(f"   Unmatched claim (CPT 74160, CT Abdomen) keeps the full plan: {kept}")
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark similar-case retrieval over past denials.
+
+Builds N synthetic denial patterns (reason, procedure, code, missing documents),
+embeds them with utils.similar_cases.embed_case and loads them into a
+SimilarCaseIndex. Reports embedding throughput, top-k search latency, the cost
+of incremental inserts, and how often a reworded query (same case, different
+wording and procedure spelling) finds its source pattern in the top k.
+
+Usage (from the backend directory):
+    python benchmarks/bench_similar_cases.py [--patterns 100000] [--queries 2000] [--k 5]
+"""
+import sys
+import os
+import argparse
+import random
+import time
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.similar_cases import SimilarCaseIndex, embed_case
+
+DIM = int(os.getenv("SIMILAR_CASE_DIM", "256"))  # settings.SIMILAR_CASE_DIM
+
+PROCEDURES = {
+    "CT Abdomen": "Abdominal CT scan",
+    "MRI Lumbar Spine": "Lumbar MRI",
+    "Knee Arthroscopy": "Arthroscopy of the knee",
+    "Physical Therapy": "PT sessions",
+    "Upper Endoscopy": "EGD",
+    "Brain MRI with contrast": "MRI brain w contrast",
+    "Total Knee Replacement": "Knee replacement, total",
+    "Shoulder Rotator Cuff Repair": "Rotator cuff repair of shoulder",
+}
+REASONS = [
+    ("not medically necessary according to clinical guidelines", "does not meet medical necessity criteria in the guidelines"),
+    ("prior authorization was not obtained", "no prior authorization on file"),
+    ("conservative treatment must be attempted first", "conservative therapy was not tried first"),
+    ("documentation does not support the level of service", "records don't support the service level billed"),
+    ("service is experimental or investigational", "considered investigational"),
+    ("frequency limit exceeded for this benefit period", "exceeds the allowed frequency this period"),
+]
+DOCS = ["Clinical notes", "Imaging report", "PT notes", "Prior auth form", "Referral", "Lab results"]
+CODES = ["CO-50", "CO-197", "CO-151", "CO-96", "CO-16", "CO-119"]
+
+
+def make_case(rng: random.Random):
+    procedure = rng.choice(list(PROCEDURES))
+    reason = rng.randrange(len(REASONS))
+    detail = f"{rng.choice(['Patient', 'Member'])} case {rng.randint(1, 10**6)} {rng.choice(['left', 'right', 'bilateral'])}"
+    return {
+        "procedure": procedure,
+        "reason_id": reason,
+        "reason": f"The requested {procedure} {REASONS[reason][0]}. {detail}",
+        "code": rng.choice(CODES),
+        "docs": rng.sample(DOCS, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-case retrieval benchmark")
+    parser.add_argument("--patterns", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    cases = [make_case(rng) for _ in range(args.patterns)]
+
+    print("\n📊 SIMILAR-CASE RETRIEVAL BENCHMARK")
+    print("===========================================")
+    start = time.perf_counter()
+    vectors = {i: embed_case(c["reason"], c["procedure"], c["code"], c["docs"], dim=DIM) for i, c in enumerate(cases)}
+    embed_time = time.perf_counter() - start
+
+    index = SimilarCaseIndex(DIM)
+    start = time.perf_counter()
+    index.build(vectors)
+    build_time = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for _ in range(args.queries):
+        i = rng.randrange(len(cases))
+        case = cases[i]
+        # Reworded reason and a different procedure spelling; no missing docs at query time
+        query = embed_case(
+            f"{PROCEDURES[case['procedure']]} {REASONS[case['reason_id']][1]}",
+            PROCEDURES[case["procedure"]], case["code"], dim=DIM
+        )
+        start = time.perf_counter()
+        results = index.search(query, args.k)
+        latencies.append(time.perf_counter() - start)
+        # Any pattern with the same procedure, reason and code is a correct neighbour
+        hits += any(
+            cases[pid]["procedure"] == case["procedure"] and cases[pid]["reason_id"] == case["reason_id"]
+            and cases[pid]["code"] == case["code"]
+            for pid, _ in results
+        )
+
+    extra = {args.patterns + n: embed_case(*("x", "CT Abdomen"), dim=DIM) for n in range(1000)}
+    start = time.perf_counter()
+    for pattern_id, vector in extra.items():
+        index.add({pattern_id: vector})
+    insert_time = (time.perf_counter() - start) / len(extra)
+
+    latencies = np.array(latencies) * 1000
+    print(f"   Patterns: {len(index)}   dim {DIM}   matrix {len(index) * DIM * 4 / 1024 / 1024:.1f} MB")
+    print(f"   Embedding: {args.patterns / embed_time:>10.0f} cases/s   index build {build_time * 1000:.0f} ms")
+    print(f"   Search top-{args.k}: p50 {np.percentile(latencies, 50):.2f} ms   p99 {np.percentile(latencies, 99):.2f} ms")
+    print(f"   Incremental insert: {insert_time * 1e6:.1f} µs/pattern")
+    print(f"   Reworded queries with a matching case in top-{args.k}: {hits / args.queries * 100:.1f}%")
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    main()
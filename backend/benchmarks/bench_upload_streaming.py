@@ -0,0 +1,85 @@
+"""
+Benchmark large-file upload storage.
+
+Compares the old blocking shutil.copyfileobj path with the chunked async writer
+(utils/upload_storage.py), reporting throughput and the worst event-loop stall
+seen by a concurrent ticker while each file is written.
+
+Usage (from the backend directory):
+    python benchmarks/bench_upload_streaming.py [--sizes-mb 10 100 500]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.datastructures import UploadFile
+from utils.upload_storage import stream_upload_to_disk
+
+
+async def measure(write, source: Path, destination: Path):
+    """Run one write while a ticker records the longest gap between event loop iterations."""
+    max_stall = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal max_stall
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            max_stall = max(max_stall, now - last)
+            last = now
+
+    ticker_task = asyncio.create_task(ticker())
+    with open(source, "rb") as f:
+        upload = UploadFile(file=f, filename=source.name)
+        start = time.perf_counter()
+        await write(upload, destination)
+        elapsed = time.perf_counter() - start
+    done.set()
+    await ticker_task
+    destination.unlink()
+    return elapsed, max_stall
+
+
+async def blocking_copy(upload, destination):
+    with open(destination, "wb") as buffer:
+        shutil.copyfileobj(upload.file, buffer)
+
+
+async def streaming_copy(upload, destination):
+    await stream_upload_to_disk(upload, destination, max_size=1 << 40)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Upload storage benchmark")
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    print("\n📊 UPLOAD STREAMING BENCHMARK")
+    print("===========================================")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        for size_mb in args.sizes_mb:
+            source = tmp / f"source_{size_mb}mb.bin"
+            with open(source, "wb") as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(1024 * 1024))
+
+            for label, write in (("blocking", blocking_copy), ("streaming", streaming_copy)):
+                elapsed, stall = await measure(write, source, tmp / "out.bin")
+                print(f"   {size_mb:>5}MB {label:<10} {size_mb / elapsed:>8.1f} MB/s   max loop stall {stall * 1000:>8.1f} ms")
+            source.unlink()
+    print("===========================================")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -20,6 +20,14 @@ class Settings:
     BASE_DIR = Path(__file__).resolve().parent
     DATABASE_PATH = BASE_DIR / "data" / "app.db"
     DATABASE_URL: str = os.getenv("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+    # Connection pool (per engine; the sync and async engines each have one)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # SQLite tuning (see SQLITE_PRAGMAS in database.py)
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))  # 64MB page cache
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # 256MB
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
     
     # Uploads
     # Uploads - RESOLVED ABSOLUTE PATH
@@ -36,14 +44,115 @@ class Settings:
     REASONING_MODEL: str = "llama-3.3-70b-versatile"  # Llama-3.3-70B for reasoning
     
     # Insurance Rules
-    INSURANCE_RULES_DIR: Path = Path("./backend/insurance_rules")
+    INSURANCE_RULES_DIR: Path = Path(os.getenv("INSURANCE_RULES_DIR", "./backend/insurance_rules"))
+    # Plan files are kept parsed in memory (utils/rules_registry.py); the directory is
+    # checked for edits at most this often (seconds)
+    RULES_CHECK_INTERVAL: float = float(os.getenv("RULES_CHECK_INTERVAL", "2"))
+    # The Policy Agent checks prior auth and listed requirements with the local rule
+    # engine (agents/rule_engine.py) and only calls the LLM for claims it cannot decide
+    POLICY_RULE_ENGINE_ENABLED: bool = os.getenv("POLICY_RULE_ENGINE_ENABLED", "true").lower() == "true"
     
     # Development/Testing
     USE_MOCK_OCR: bool = os.getenv("USE_MOCK_OCR", "false").lower() == "true"
-    
+
+    # OCR batching
+    # Pages waiting for OCR are grouped into batches of up to OCR_BATCH_SIZE images.
+    # The batcher waits at most OCR_BATCH_WAIT_MS for a batch to fill before running it.
+    OCR_BATCH_SIZE: int = int(os.getenv("OCR_BATCH_SIZE", "4"))
+    OCR_BATCH_WAIT_MS: int = int(os.getenv("OCR_BATCH_WAIT_MS", "50"))
+
+    # OCR image preprocessing preset: off, fast, balanced, accurate (see ocr/preprocess.py).
+    # "off" keeps full resolution, color and the angle classifier on every page; fast and
+    # balanced skip the classifier for pages whose text lines run horizontally, which does
+    # not catch upside-down pages, so they are opt-in
+    OCR_PREPROCESS_PRESET: str = os.getenv("OCR_PREPROCESS_PRESET", "off")
+
+    # Pages larger than OCR_TILE_SIZE pixels on a side (after the preset's resize) are
+    # OCRed as overlapping tiles, cropped from the source one at a time so the whole page is
+    # never converted or resized in memory. With the default "off" preset and "accurate"
+    # (2600 px), scans above 2048 px tile; "fast" and "balanced" downscale below it.
+    OCR_TILE_SIZE: int = int(os.getenv("OCR_TILE_SIZE", "2048"))
+    OCR_TILE_OVERLAP: int = int(os.getenv("OCR_TILE_OVERLAP", "160"))
+
+    # Shared OCR service (ocr/service.py). When OCR_SERVICE_SOCKET is set, API workers
+    # send OCR requests to the service over this Unix socket instead of loading models.
+    OCR_SERVICE_SOCKET: str = os.getenv("OCR_SERVICE_SOCKET", "")
+    OCR_SERVICE_WORKERS: int = int(os.getenv("OCR_SERVICE_WORKERS", "1"))
+    OCR_SERVICE_TIMEOUT: float = float(os.getenv("OCR_SERVICE_TIMEOUT", "300"))
+
+    # Background OCR ingestion (utils/ingestion.py)
+    OCR_INGEST_WORKERS: int = int(os.getenv("OCR_INGEST_WORKERS", "2"))
+    # How long analysis waits for documents that are still being OCRed
+    OCR_WAIT_TIMEOUT: float = float(os.getenv("OCR_WAIT_TIMEOUT", "120"))
+    # Documents whose OCR started this long ago and are still 'processing' (e.g. after a crash)
+    # are re-queued; each worker checks at startup and then every OCR_RECOVERY_INTERVAL_SECONDS
+    OCR_STALE_AFTER_SECONDS: int = int(os.getenv("OCR_STALE_AFTER_SECONDS", "900"))
+    OCR_RECOVERY_INTERVAL_SECONDS: int = int(os.getenv("OCR_RECOVERY_INTERVAL_SECONDS", "300"))
+
     # File size limits (in bytes)
-    MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
-    
+    MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", str(10 * 1024 * 1024)))  # 10MB per file
+    # Whole multipart request; checked against Content-Length and counted as the body streams in
+    MAX_UPLOAD_REQUEST_SIZE: int = int(os.getenv("MAX_UPLOAD_REQUEST_SIZE", str(100 * 1024 * 1024)))  # 100MB
+
+    # Resumable chunked uploads (routes/chunked_upload.py)
+    MAX_CHUNKED_UPLOAD_SIZE: int = int(os.getenv("MAX_CHUNKED_UPLOAD_SIZE", str(1024 * 1024 * 1024)))  # 1GB per file
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))  # Recommended to clients
+    MAX_UPLOAD_CHUNK_SIZE: int = int(os.getenv("MAX_UPLOAD_CHUNK_SIZE", str(16 * 1024 * 1024)))  # Per PUT request
+    # Unfinished chunked uploads are discarded after this long
+    CHUNKED_UPLOAD_TTL_SECONDS: int = int(os.getenv("CHUNKED_UPLOAD_TTL_SECONDS", str(24 * 3600)))
+
+    # Uploads are stored once per content under UPLOAD_FOLDER/.blobs (utils/blob_store.py);
+    # unreferenced blobs are only deleted once untouched for this long
+    BLOB_GRACE_SECONDS: int = int(os.getenv("BLOB_GRACE_SECONDS", "3600"))
+
+    # In-process denial pattern index (utils/pattern_index.py). Workers touch the
+    # signal file after writing patterns; others check it every CHECK_INTERVAL seconds.
+    PATTERN_INDEX_SIGNAL_FILE: Path = Path(os.getenv("PATTERN_INDEX_SIGNAL_FILE", BASE_DIR / "data" / "pattern_index.signal"))
+    PATTERN_INDEX_CHECK_INTERVAL: float = float(os.getenv("PATTERN_INDEX_CHECK_INTERVAL", "1"))
+    PATTERN_INDEX_MAX_AGE: float = float(os.getenv("PATTERN_INDEX_MAX_AGE", "300"))
+    # Pattern learning is written behind the request (utils/pattern_writer.py): observations
+    # are batched for up to FLUSH_INTERVAL seconds or FLUSH_BATCH_SIZE entries per transaction
+    PATTERN_FLUSH_INTERVAL: float = float(os.getenv("PATTERN_FLUSH_INTERVAL", "1"))
+    PATTERN_FLUSH_BATCH_SIZE: int = int(os.getenv("PATTERN_FLUSH_BATCH_SIZE", "200"))
+    PATTERN_QUEUE_MAX: int = int(os.getenv("PATTERN_QUEUE_MAX", "10000"))
+    # Similar-case retrieval (utils/similar_cases.py): embedding size, neighbours returned
+    # to the agents, and the minimum cosine similarity for a past case to count
+    SIMILAR_CASE_DIM: int = int(os.getenv("SIMILAR_CASE_DIM", "256"))
+    SIMILAR_CASES_K: int = int(os.getenv("SIMILAR_CASES_K", "3"))
+    SIMILAR_CASE_MIN_SCORE: float = float(os.getenv("SIMILAR_CASE_MIN_SCORE", "0.3"))
+    # Minimum procedure similarity (0..1) for a fuzzy match to count as a past pattern
+    # (the payer itself must match exactly after alias normalization)
+    PATTERN_FUZZY_MIN_SCORE: float = float(os.getenv("PATTERN_FUZZY_MIN_SCORE", "0.6"))
+    # Pattern scores decay exponentially with this half-life (utils/decay.py; stored weights
+    # assume it stays fixed). Every PATTERN_ARCHIVE_INTERVAL_SECONDS, patterns whose decayed
+    # score fell below ARCHIVE_MIN_SCORE move to denial_patterns_archive (utils/pattern_archiver.py;
+    # 0 disables archiving; 0.05 is a single observation about 13 months old). This is
+    # independent of RETENTION_ENABLED.
+    PATTERN_HALF_LIFE_DAYS: float = float(os.getenv("PATTERN_HALF_LIFE_DAYS", "90"))
+    PATTERN_ARCHIVE_ENABLED: bool = os.getenv("PATTERN_ARCHIVE_ENABLED", "true").lower() == "true"
+    PATTERN_ARCHIVE_MIN_SCORE: float = float(os.getenv("PATTERN_ARCHIVE_MIN_SCORE", "0.05"))
+    PATTERN_ARCHIVE_INTERVAL_SECONDS: int = int(os.getenv("PATTERN_ARCHIVE_INTERVAL_SECONDS", "3600"))
+    PATTERN_ARCHIVE_BATCH_SIZE: int = int(os.getenv("PATTERN_ARCHIVE_BATCH_SIZE", "500"))  # Patterns moved per transaction
+
+    # Text/JSON column values at least this large are stored compressed (utils/compression.py)
+    COMPRESS_MIN_BYTES: int = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+    # Blobs and appeal PDFs untouched this many days are compressed on disk when it
+    # saves space (0 disables archiving). PDF, JPEG, PNG and TIFF are compressed
+    # already and are skipped, so this only affects BMP uploads.
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "7"))
+
+    # Retention (utils/retention.py)
+    # Days to keep documents per upload category ("Category=days,...", e.g.
+    # "Appeal=30,PreClaim=90,Denial=90"); generated appeal PDFs follow the Appeal
+    # category. Categories not listed use RETENTION_DEFAULT_DAYS, where 0 keeps files
+    # forever. Expiry is opt-in: by default nothing is deleted for its age, and the
+    # sweeper only collects orphaned files and abandoned chunked uploads.
+    RETENTION_ENABLED: bool = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+    RETENTION_CATEGORY_DAYS: str = os.getenv("RETENTION_CATEGORY_DAYS", "")
+    RETENTION_DEFAULT_DAYS: int = int(os.getenv("RETENTION_DEFAULT_DAYS", "0"))
+    RETENTION_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("RETENTION_SWEEP_INTERVAL_SECONDS", "3600"))
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+
     def __init__(self):
         """Ensure required directories exist."""
         self.UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
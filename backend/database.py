@@ -1,36 +1,156 @@
 """
 Database models and session management using SQLAlchemy.
 """
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, JSON
+from sqlalchemy import create_engine, event, func, inspect, text, Column, Integer, String, Text, DateTime, Float, JSON, Index, LargeBinary
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import load_only, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+from pathlib import Path
+import json
 from config import settings
+from utils.compression import compress_text, decompress_text, is_compressed
+from utils.decay import decay_weight
+
+IS_SQLITE = settings.DATABASE_URL.startswith("sqlite")
+
+# Applied to every new SQLite connection. WAL lets readers run alongside a writer;
+# synchronous=NORMAL is durable in WAL mode except for the last commits on power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -settings.SQLITE_CACHE_SIZE_KB,  # Negative values are KiB
+    "mmap_size": settings.SQLITE_MMAP_SIZE,
+    "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,  # Wait for a writer instead of failing with "database is locked"
+    "temp_store": "MEMORY",
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _engine_options(url: str, async_driver: bool = False) -> dict:
+    """Connection and pool settings shared by the sync and async engines."""
+    if not url.startswith("sqlite"):
+        return {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+        }
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+        # Each connection would get its own in-memory database
+        return {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+    return {
+        "connect_args": {"check_same_thread": False},
+        "poolclass": AsyncAdaptedQueuePool if async_driver else QueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def async_database_url(url: str) -> str:
+    """Async driver URL for DATABASE_URL: aiosqlite for SQLite, asyncpg for PostgreSQL."""
+    for prefix, async_prefix in (
+        ("sqlite:", "sqlite+aiosqlite:"),
+        ("postgresql+psycopg2:", "postgresql+asyncpg:"),
+        ("postgresql:", "postgresql+asyncpg:"),
+        ("postgres:", "postgresql+asyncpg:"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
 
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL, 
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+
+# Async engine for request handlers, so queries do not block the event loop
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **_engine_options(settings.DATABASE_URL, async_driver=True)
 )
 
-# Session factory
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+# Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
 
 
+class CompressedText(TypeDecorator):
+    """Text column stored compressed above COMPRESS_MIN_BYTES; plain values still read back."""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value, settings.COMPRESS_MIN_BYTES)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value) if value is not None else None
+
+
+class CompressedJSON(TypeDecorator):
+    """
+    JSON column whose large values are stored as a compressed JSON string.
+    The column stays JSON in the database, so existing rows need no migration.
+    """
+    impl = JSON
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        encoded = json.dumps(value)
+        if len(encoded) < settings.COMPRESS_MIN_BYTES:
+            return value
+        packed = compress_text(encoded, settings.COMPRESS_MIN_BYTES)
+        return packed if is_compressed(packed) else value
+
+    def process_result_value(self, value, dialect):
+        if is_compressed(value):
+            return json.loads(decompress_text(value))
+        return value
+
+
 class UploadedDocument(Base):
     """Model for storing uploaded document information."""
     __tablename__ = "uploaded_documents"
+    __table_args__ = (
+        # Keyset pagination of the document listing, per category and overall
+        Index("ix_uploaded_documents_category_id", "category", "id"),
+        Index("ix_uploaded_documents_category_uploaded", "category", "upload_timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
+    category = Column(String)  # Upload subfolder: PreClaim, Denial, Appeal, ...
     file_type = Column(String)  # pdf, jpg, png
+    file_size = Column(Integer)  # Bytes stored on disk
+    content_hash = Column(String(64), index=True)  # SHA-256 of the file content
     upload_timestamp = Column(DateTime, default=datetime.utcnow)
-    ocr_text = Column(Text)  # Extracted OCR text
+    ocr_text = Column(CompressedText)  # Extracted OCR text
+    ocr_layout = Column(CompressedJSON)  # OCRLayout.to_dict(): lines, boxes, scores, pages
     ocr_completed = Column(Integer, default=0)  # 0 = pending, 1 = completed
+    ocr_status = Column(String, index=True)  # queued, processing, completed, failed (see utils/ingestion.py)
+    processing_started_at = Column(DateTime)  # When a worker claimed the document for OCR
+    ocr_error = Column(Text)  # Error message when OCR failed
 
 
 class AnalysisSession(Base):
@@ -63,12 +183,20 @@ class GeneratedAppeal(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, nullable=False)
-    appeal_text = Column(Text)
+    appeal_text = Column(CompressedText)
     pdf_path = Column(String)
-    generated_at = Column(DateTime, default=datetime.utcnow)
+    generated_at = Column(DateTime, default=datetime.utcnow, index=True)  # Retention sweeps by age
     denial_risk_score = Column(Float)  # 0-100 percentage
 
 
+class ArchiveSkip(Base):
+    """Files the archiver tried and kept uncompressed, so later sweeps don't read them again."""
+    __tablename__ = "archive_skips"
+
+    path = Column(String, primary_key=True)
+    checked_at = Column(DateTime, default=datetime.utcnow)
+
+
 class ReasoningResult(Base):
     """Model for storing LLM reasoning outputs."""
     __tablename__ = "reasoning_results"
@@ -76,8 +204,8 @@ class ReasoningResult(Base):
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, nullable=False)
     reasoning_type = Column(String)  # pre_claim, denial_explanation, appeal
-    input_data = Column(JSON)
-    output_data = Column(JSON)
+    input_data = Column(CompressedJSON)  # Document ids + plan; fields live in ExtractedData
+    output_data = Column(CompressedJSON)
     denial_risk_score = Column(Float)
     missing_requirements = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -86,6 +214,11 @@ class ReasoningResult(Base):
 class DenialPattern(Base):
     """Model for storing learning denial patterns without training."""
     __tablename__ = "denial_patterns"
+    __table_args__ = (
+        # One row per pattern; target of the upsert in utils/memory_graph.py and
+        # also serves (insurance, denial_code) lookups
+        Index("uq_denial_patterns_key", "insurance", "denial_code", "procedure", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     insurance = Column(String, index=True)
@@ -96,11 +229,138 @@ class DenialPattern(Base):
     resolved_by = Column(JSON)
     occurrence_count = Column(Integer, default=1)
     last_seen = Column(DateTime, default=datetime.utcnow)
+    denial_reason = Column(Text)  # Most recent denial reason text seen for the pattern
+    embedding = Column(LargeBinary)  # float32 case vector, see utils/similar_cases.py
+    # Forward-decayed observation weight (utils/decay.py); indexed for ranking and archiving
+    decay_weight = Column(Float, index=True)
+
+
+class DenialPatternArchive(Base):
+    """Denial patterns whose decayed score went cold, moved out of denial_patterns."""
+    __tablename__ = "denial_patterns_archive"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pattern_id = Column(Integer, index=True)  # DenialPattern.id it had while live
+    insurance = Column(String, index=True)
+    procedure = Column(String)
+    cpt_code = Column(String)
+    denial_code = Column(String)
+    missing_docs = Column(JSON)
+    resolved_by = Column(JSON)
+    occurrence_count = Column(Integer)
+    last_seen = Column(DateTime)
+    denial_reason = Column(Text)
+    decay_weight = Column(Float)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AnalyticsRollup(Base):
+    """Running totals for the analytics dashboard, incremented as denials and analyses are written."""
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (
+        # Target of the increment upsert in utils/analytics.py
+        Index("uq_analytics_rollups_key", "metric", "bucket", unique=True),
+        # Top-N per metric
+        Index("ix_analytics_rollups_top", "metric", "count"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    metric = Column(String, nullable=False)  # e.g. denials_by_insurer, risk_by_week
+    bucket = Column(String, nullable=False)  # Insurer, code, ISO week, requirement, or "all"
+    count = Column(Integer, default=0, nullable=False)
+    value_sum = Column(Float, default=0.0, nullable=False)  # For averages (risk scores)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+def _add_missing_columns():
+    """
+    Add columns that were introduced after a table was first created.
+    create_all() only creates missing tables, so existing databases need this.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            # Indexes declared after the table was created
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def _backfill_document_categories():
+    """Derive the category of documents uploaded before it was stored from their folder name."""
+    db = SessionLocal()
+    try:
+        documents = db.query(UploadedDocument).filter(UploadedDocument.category.is_(None)).all()
+        for doc in documents:
+            doc.category = Path(doc.file_path).parent.name
+        if documents:
+            db.commit()
+    finally:
+        db.close()
+
+
+def _merge_duplicate_denial_patterns():
+    """
+    Merge rows that share (insurance, denial_code, procedure) so the unique index
+    can be created on databases written before it existed.
+    """
+    if not inspect(engine).has_table(DenialPattern.__tablename__):
+        return
+    db = SessionLocal()
+    try:
+        keys = db.query(DenialPattern.insurance, DenialPattern.denial_code, DenialPattern.procedure).group_by(
+            DenialPattern.insurance, DenialPattern.denial_code, DenialPattern.procedure
+        ).having(func.count(DenialPattern.id) > 1).all()
+        for insurance, denial_code, procedure in keys:
+            # Only columns every schema version has; newer ones are added after this runs
+            rows = db.query(DenialPattern).options(load_only(
+                DenialPattern.occurrence_count, DenialPattern.missing_docs,
+                DenialPattern.resolved_by, DenialPattern.last_seen
+            )).filter(
+                DenialPattern.insurance == insurance,
+                DenialPattern.denial_code == denial_code,
+                DenialPattern.procedure == procedure
+            ).order_by(DenialPattern.id).all()
+            keep, duplicates = rows[0], rows[1:]
+            for row in duplicates:
+                keep.occurrence_count = (keep.occurrence_count or 0) + (row.occurrence_count or 0)
+                keep.missing_docs = list(dict.fromkeys((keep.missing_docs or []) + (row.missing_docs or [])))
+                keep.resolved_by = list(dict.fromkeys((keep.resolved_by or []) + (row.resolved_by or [])))
+                if row.last_seen and (keep.last_seen is None or row.last_seen > keep.last_seen):
+                    keep.last_seen = row.last_seen
+                db.delete(row)
+        if keys:
+            db.commit()
+    finally:
+        db.close()
+
+
+def _backfill_decay_weights():
+    """Give patterns stored before decay existed a weight: their whole count at last_seen."""
+    db = SessionLocal()
+    try:
+        patterns = db.query(DenialPattern).filter(DenialPattern.decay_weight.is_(None)).all()
+        for pattern in patterns:
+            pattern.decay_weight = decay_weight(pattern.occurrence_count or 1, pattern.last_seen)
+        if patterns:
+            db.commit()
+    finally:
+        db.close()
 
 
 def init_db():
     """Initialize database tables."""
     Base.metadata.create_all(bind=engine)
+    _merge_duplicate_denial_patterns()
+    _add_missing_columns()
+    _backfill_document_categories()
+    _backfill_decay_weights()
 
 
 def get_db():
@@ -110,3 +370,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for getting an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -8,6 +8,9 @@ import json
 import logging
 from typing import Dict, Any, Optional
 
+from ocr.layout import OCRLayout
+from utils.field_locator import locate_field_regions
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -74,13 +77,16 @@ Document text:
             logger.error(f"Error classifying document: {str(e)}")
             return "unknown"
     
-    def extract_fields(self, ocr_text: str, doc_type: str) -> Dict[str, Any]:
+    def extract_fields(self, ocr_text: str, doc_type: str, layout: Optional[OCRLayout] = None) -> Dict[str, Any]:
         """
         Extract structured fields from document based on its type.
+        Only the regions around the schema's field labels are sent to the model;
+        the leading 3000 characters are used when no label can be located.
         
         Args:
             ocr_text: Raw OCR text
             doc_type: Document type (from classification)
+            layout: OCR layout with line boxes, if available
             
         Returns:
             Dictionary of extracted fields
@@ -132,6 +138,13 @@ Document text:
         if not schema:
             return {}
         
+        # Narrow the document down to the regions holding the schema fields
+        document_text = locate_field_regions(ocr_text, list(schema), layout)
+        if document_text:
+            logger.info(f"Field locator selected {len(document_text)} of {len(ocr_text)} chars for {doc_type}")
+        else:
+            document_text = ocr_text[:3000]
+        
         # Build extraction prompt
         schema_str = json.dumps(schema, indent=2)
         prompt = f"""You are an information extraction model for medical documents.
@@ -144,7 +157,7 @@ Return ONLY valid JSON with the extracted values. If a field is not found, use e
 Do not include any explanations.
 
 Document text:
-{ocr_text[:3000]}
+{document_text}
 """
         
         try:
@@ -4,6 +4,7 @@ Handles complex reasoning tasks: denial risk analysis, denial explanation, and a
 """
 from groq import Groq
 from config import settings
+from utils.rules_registry import relevant_rules
 import json
 import logging
 from typing import Dict, Any, List, Optional
@@ -39,7 +40,9 @@ class ReasoningLLM:
         """
         # Prepare input data
         docs_str = json.dumps(extracted_documents, indent=2)
-        rules_str = json.dumps(insurance_rules, indent=2) if insurance_rules else "No insurance rules provided"
+        # Only the rules for the CPT codes in the documents, plus the general plan clauses
+        rules = relevant_rules(insurance_rules, [doc.get("fields", {}) for doc in extracted_documents])
+        rules_str = json.dumps(rules, indent=2) if rules else "No insurance rules provided"
         
         prompt = f"""You are a medical insurance pre-authorization analyst.
 
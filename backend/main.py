@@ -51,10 +51,22 @@ except ImportError:
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 
-from database import init_db
-from routes import upload, analyze, appeal, insurance
+from database import init_db, async_engine, SessionLocal
+from utils.ingestion import ingestion
+from utils.retention import retention
+from utils.pattern_index import pattern_index
+from utils.pattern_writer import pattern_writer
+from utils.pattern_archiver import pattern_archiver
+from utils.similar_cases import similar_cases
+from utils.knowledge_graph import knowledge_graph
+from utils.analytics import backfill_rollups
+from utils.rules_registry import rules_registry
+from utils.upload_storage import UploadSizeLimitMiddleware
+from agents.rule_engine import policy_rule_engine
+from routes import upload, chunked_upload, analyze, appeal, insurance
 from config import settings
 
 # Configure logging
@@ -80,6 +92,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads while the multipart body streams in, before it is spooled to disk
+app.add_middleware(UploadSizeLimitMiddleware, max_size=settings.MAX_UPLOAD_REQUEST_SIZE)
+
+def seed_rollups():
+    """Seed analytics rollups from existing history on first start."""
+    db = SessionLocal()
+    try:
+        backfill_rollups(db)
+    finally:
+        db.close()
+
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
@@ -87,9 +111,31 @@ async def startup_event():
     logger.info("Initializing database...")
     init_db()
     logger.info("Database initialized successfully")
+    ingestion.recover_pending()
+    ingestion.start_recovery(settings.OCR_RECOVERY_INTERVAL_SECONDS)
+    pattern_index.load()
+    similar_cases.load()
+    knowledge_graph.load()
+    seed_rollups()
+    rules_registry.load()
+    pattern_writer.start()
+    if settings.RETENTION_ENABLED:
+        retention.start(settings.RETENTION_SWEEP_INTERVAL_SECONDS)
+    if settings.PATTERN_ARCHIVE_ENABLED:
+        pattern_archiver.start(settings.PATTERN_ARCHIVE_INTERVAL_SECONDS)
     logger.info(f"Upload folder: {settings.UPLOAD_FOLDER}")
     logger.info(f"Insurance rules directory: {settings.INSURANCE_RULES_DIR}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and close database connections."""
+    await ingestion.stop_recovery()
+    await retention.stop()
+    await pattern_archiver.stop()
+    # Write out queued pattern observations before the engine goes away
+    await asyncio.to_thread(pattern_writer.stop)
+    await async_engine.dispose()
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -108,6 +154,14 @@ async def health_check():
         "database": "connected",
         "groq_api_configured": bool(settings.GROQ_API_KEY),
         "upload_folder": str(settings.UPLOAD_FOLDER),
+        "pattern_memory": {
+            "index": pattern_index.metrics(),
+            "writer": pattern_writer.metrics(),
+            "archiver": pattern_archiver.metrics(),
+            "similar_cases": similar_cases.metrics()
+        },
+        "insurance_rules": rules_registry.metrics(),
+        "policy_rule_engine": policy_rule_engine.metrics(),
         "models": {
             "extractor": settings.EXTRACTOR_MODEL,
             "reasoning": settings.REASONING_MODEL
@@ -116,6 +170,7 @@ async def health_check():
 
 # Register routers
 app.include_router(upload.router, prefix="/api", tags=["Upload"])
+app.include_router(chunked_upload.router, prefix="/api", tags=["Upload"])
 app.include_router(analyze.router, prefix="/api", tags=["Analysis"])
 app.include_router(appeal.router, prefix="/api", tags=["Appeal"])
 app.include_router(insurance.router, prefix="/api", tags=["Insurance"])
@@ -123,6 +178,10 @@ from routes import session
 app.include_router(session.router, prefix="/api", tags=["Session"])
 from routes import simulation
 app.include_router(simulation.router, prefix="/api", tags=["Simulation"])
+from routes import knowledge_graph as knowledge_graph_routes
+app.include_router(knowledge_graph_routes.router, prefix="/api", tags=["Knowledge Graph"])
+from routes import analytics
+app.include_router(analytics.router, prefix="/api", tags=["Analytics"])
 
 if __name__ == "__main__":
     import uvicorn
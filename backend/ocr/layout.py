@@ -0,0 +1,158 @@
+"""
+Compact layout representation of OCR output.
+Keeps recognized lines together with their bounding boxes, confidences and page numbers.
+"""
+from array import array
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+
+class OCRLayout:
+    """
+    Recognized text lines with geometry, stored as flat typed arrays.
+
+    boxes holds 4 ints per line (x0, y0, x1, y1), scores one float per line and
+    pages the zero-based page index of each line.
+    """
+
+    def __init__(self, paginated: bool = False):
+        self.paginated = paginated  # PDF-style output with "--- Page N ---" headers
+        self.lines: List[str] = []
+        self.boxes = array('i')
+        self.scores = array('f')
+        self.pages = array('H')
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def append(self, text: str, box: Optional[Tuple[int, int, int, int]] = None, score: float = 1.0, page: int = 0):
+        """Add one recognized line. Lines without geometry get a (0, 0, 0, 0) box."""
+        self.lines.append(text)
+        self.boxes.extend(box if box is not None else (0, 0, 0, 0))
+        self.scores.append(float(score))
+        self.pages.append(page)
+
+    def extend(self, other: "OCRLayout", page: Optional[int] = None):
+        """Append all lines of another layout, optionally moving them to a given page."""
+        for text, box, score, line_page in other:
+            self.append(text, box, score, line_page if page is None else page)
+
+    def box(self, index: int) -> Tuple[int, int, int, int]:
+        return tuple(self.boxes[index * 4:index * 4 + 4])
+
+    def has_geometry(self) -> bool:
+        return any(self.boxes)
+
+    def __iter__(self) -> Iterator[Tuple[str, Tuple[int, int, int, int], float, int]]:
+        for i, text in enumerate(self.lines):
+            yield text, self.box(i), self.scores[i], self.pages[i]
+
+    def page_count(self) -> int:
+        return (max(self.pages) + 1) if self.pages else 0
+
+    def to_text(self) -> str:
+        """Render the layout as plain text in the same format OCR has always returned."""
+        if not self.paginated:
+            return "\n".join(self.lines)
+
+        page_lines: Dict[int, List[str]] = {}
+        for text, page in zip(self.lines, self.pages):
+            page_lines.setdefault(page, []).append(text)
+        return "\n\n".join(
+            f"--- Page {page+1} ---\n" + "\n".join(lines)
+            for page, lines in sorted(page_lines.items())
+            if lines
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a compact JSON-friendly dict."""
+        return {
+            "paginated": self.paginated,
+            "lines": self.lines,
+            "boxes": self.boxes.tolist(),
+            "scores": [round(score, 3) for score in self.scores],
+            "pages": self.pages.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["OCRLayout"]:
+        """Rebuild a layout from `to_dict` output. Returns None for empty input."""
+        if not data or not data.get("lines"):
+            return None
+        layout = cls(paginated=data.get("paginated", False))
+        layout.lines = list(data["lines"])
+        layout.boxes = array('i', data.get("boxes") or [0] * (4 * len(layout.lines)))
+        layout.scores = array('f', data.get("scores") or [1.0] * len(layout.lines))
+        layout.pages = array('H', data.get("pages") or [0] * len(layout.lines))
+        return layout
+
+
+def polygon_to_box(points: Any) -> Tuple[int, int, int, int]:
+    """
+    Convert a detection polygon ([[x, y], ...]) or an (x0, y0, x1, y1) box to an int box.
+    """
+    values = [float(v) for v in _flatten(points)]
+    if len(values) == 4:
+        x0, y0, x1, y1 = values
+        return int(x0), int(y0), int(x1), int(y1)
+    xs, ys = values[0::2], values[1::2]
+    return int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))
+
+
+def _flatten(points: Any) -> Iterator[Any]:
+    if hasattr(points, "tolist"):
+        points = points.tolist()
+    for item in points:
+        if isinstance(item, (list, tuple)) or hasattr(item, "tolist"):
+            yield from _flatten(item)
+        else:
+            yield item
+
+
+def merge_tile_layouts(parts: List[OCRLayout], overlap_threshold: float = 0.7) -> OCRLayout:
+    """
+    Merge layouts OCRed from overlapping tiles of one page.
+
+    Lines seen twice in an overlap region, or cut by a tile edge and seen whole in
+    the neighbouring tile, are collapsed: when most of one box lies inside another,
+    the line with the longer text (then higher confidence) is kept. The result is
+    sorted into reading order (top to bottom, then left to right).
+
+    Args:
+        parts: Tile layouts with boxes already in page coordinates
+        overlap_threshold: Share of the smaller box that must be covered to count as a duplicate
+
+    Returns:
+        Single layout for the page
+    """
+    kept: List[Tuple[str, Tuple[int, int, int, int], float, int]] = []
+    for part in parts:
+        for line in part:
+            text, box, score, _ = line
+            duplicate = None
+            for k, kept_line in enumerate(kept):
+                if _containment(box, kept_line[1]) >= overlap_threshold:
+                    duplicate = k
+                    break
+            if duplicate is None:
+                kept.append(line)
+            elif (len(text), score) > (len(kept[duplicate][0]), kept[duplicate][2]):
+                kept[duplicate] = line
+
+    heights = sorted(box[3] - box[1] for _, box, _, _ in kept) or [1]
+    row_height = max(heights[len(heights) // 2], 1)
+    kept.sort(key=lambda line: (round(((line[1][1] + line[1][3]) / 2) / row_height), line[1][0]))
+
+    merged = OCRLayout(paginated=parts[0].paginated if parts else False)
+    for text, box, score, page in kept:
+        merged.append(text, box, score, page)
+    return merged
+
+
+def _containment(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Share of the smaller of two boxes covered by their intersection."""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return (width * height) / max(smaller, 1)
@@ -2,12 +2,20 @@
 PaddleOCR integration for extracting text from PDFs and images.
 """
 from paddleocr import PaddleOCR
+from concurrent.futures import Future
 from pathlib import Path
-from typing import List, Dict, Optional
+from collections import deque
+from typing import List, Dict, Optional, Any, Tuple, Iterable
 import logging
 import os
+import queue
+import threading
 import time
 
+from config import settings
+from ocr.layout import OCRLayout, polygon_to_box, merge_tile_layouts
+from ocr.preprocess import get_preset, preprocess_page
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,146 +26,496 @@ logger = logging.getLogger(__name__)
 ocr_engine = PaddleOCR(use_angle_cls=True, lang='en')
 
 
+class OCRBatcher:
+    """
+    Groups pending page images into batched PaddleOCR calls.
+
+    Pages from any file or request are submitted through `submit`, which returns a
+    Future resolved with the raw OCR result for that image. A single worker thread
+    drains the queue and waits up to `max_wait` seconds to fill a batch of
+    `batch_size` images, so detection and recognition see several pages at once.
+    """
+
+    def __init__(self, engine, batch_size: int = 4, max_wait: float = 0.05):
+        self.engine = engine
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Engines without list input support fall back to per-image calls
+        self._supports_batch = True
+        # Throughput stats keyed by batch size: {size: [images, seconds]}
+        self._stats: Dict[int, List[float]] = {}
+
+    def submit(self, image: Any, use_cls: bool = True) -> Future:
+        """
+        Queue an image (path or numpy array) for OCR.
+
+        Args:
+            image: Image path or decoded image array
+            use_cls: Run the text line angle classifier for this image
+
+        Returns:
+            Future resolved with the raw OCR result for the image
+        """
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((image, future, use_cls))
+        return future
+
+    def map(self, images: List[Any], use_cls: bool = True) -> List[Any]:
+        """Submit several images and wait for all results, preserving order."""
+        futures = [self.submit(image, use_cls) for image in images]
+        return [future.result() for future in futures]
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """
+        Report throughput for every batch size seen so far.
+
+        Returns:
+            Mapping of batch size to images processed, seconds spent and images/sec
+        """
+        with self._lock:
+            snapshot = {size: list(values) for size, values in self._stats.items()}
+        return {
+            size: {
+                "images": int(images),
+                "seconds": round(seconds, 3),
+                "images_per_second": round(images / seconds, 2) if seconds else 0.0
+            }
+            for size, (images, seconds) in sorted(snapshot.items())
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def close(self):
+        """Stop the worker thread once the queued images are done."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+            self._thread = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ocr-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Re-queue the stop signal so it is handled after this batch
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: list):
+        # Drop futures that were cancelled while waiting in the queue
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+
+        # Images with and without angle classification need separate engine calls
+        for use_cls in (False, True):
+            group = [(image, future) for image, future, item_cls in batch if item_cls == use_cls]
+            if group:
+                self._run_group(group, use_cls)
+
+    def _run_group(self, batch: list, use_cls: bool):
+        images = [image for image, _ in batch]
+        start = time.perf_counter()
+        outcomes = self._predict(images, use_cls)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            entry = self._stats.setdefault(len(images), [0, 0.0])
+            entry[0] += len(images)
+            entry[1] += elapsed
+        logger.info(f"[TIMING] OCR batch of {len(images)} image(s) took {elapsed:.2f}s")
+
+        # Batches mix pages of different requests: a failed image only fails its own future
+        for (_, future), outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    def _predict(self, images: List[Any], use_cls: bool = True) -> List[Any]:
+        """
+        Run OCR on a batch and return one raw result per image, or the exception
+        raised for that image.
+
+        Each result has the same shape as `engine.ocr(image)` for a single image.
+        Batching is turned off only when the engine rejects list input; any other
+        failure of a batched call (a corrupt page, running out of memory) is
+        retried image by image so the other images still get their results.
+        """
+        if len(images) > 1 and self._supports_batch:
+            try:
+                # PaddleOCR 3.x / PaddleX pipelines accept a list and return one result per image
+                results = self._ocr(images, use_cls)
+            except TypeError as e:
+                logger.warning(f"OCR engine does not support batched input ({e}). Falling back to per-image OCR.")
+                self._supports_batch = False
+            except Exception as e:
+                logger.warning(f"OCR batch of {len(images)} image(s) failed ({e}), retrying per image")
+            else:
+                if isinstance(results, list) and len(results) == len(images):
+                    return [[result] for result in results]
+                logger.warning("OCR engine returned an unexpected batch shape. Falling back to per-image OCR.")
+                self._supports_batch = False
+
+        return [self._ocr_one(image, use_cls) for image in images]
+
+    def _ocr_one(self, image: Any, use_cls: bool) -> Any:
+        """OCR a single image, returning the exception instead of raising it."""
+        try:
+            return self._ocr(image, use_cls)
+        except Exception as e:
+            logger.error(f"OCR of one image failed: {e}")
+            return e
+
+    def _ocr(self, images: Any, use_cls: bool) -> Any:
+        # PaddleOCR 3.x forwards ocr() to predict(), where the classifier switch is named differently
+        if hasattr(self.engine, "predict"):
+            return self.engine.ocr(images, use_textline_orientation=use_cls)
+        return self.engine.ocr(images, cls=use_cls)
+
+
 class OCRProcessor:
     """Handles OCR processing for documents."""
-    
-    def __init__(self):
+
+    def __init__(self, preset: Optional[str] = None):
         self.ocr = ocr_engine
-    
+        self.preset = get_preset(preset or settings.OCR_PREPROCESS_PRESET)
+        self.batcher = OCRBatcher(
+            self.ocr,
+            batch_size=settings.OCR_BATCH_SIZE,
+            max_wait=settings.OCR_BATCH_WAIT_MS / 1000
+        )
+
     def process_document(self, file_path: str) -> str:
         """
         Process a document (PDF or image) and extract text.
         Uses mock data if USE_MOCK_OCR is enabled.
-        
+
         Args:
             file_path: Path to document
-            
+
         Returns:
             Extracted text
         """
-        from config import settings
-        
+        text, _ = self.process_document_with_layout(file_path)
+        return text
+
+    def process_document_with_layout(self, file_path: str) -> Tuple[Any, Optional[OCRLayout]]:
+        """
+        Process a document and return both its text and its OCR layout.
+
+        Args:
+            file_path: Path to document
+
+        Returns:
+            Tuple of (extracted text, OCRLayout). The layout is None for mock OCR
+            and unsupported file types.
+        """
         # Check if mock OCR is enabled
         if settings.USE_MOCK_OCR:
             from ocr.mock_ocr_data import mock_ocr_data
             filename = Path(file_path).name
             logger.info(f"🚀 USING MOCK OCR for {filename}")
-            
+
             # Simulate processing delay
             # time.sleep(2)
-            
-            return mock_ocr_data(filename)
-        
+
+            return mock_ocr_data(filename), None
+
         # Otherwise use real OCR
         path = Path(file_path)
         extension = path.suffix.lower()
-        
+
         if extension == '.pdf':
-            return self.extract_text_from_pdf(file_path)
-        elif extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
-            return self.extract_text_from_image(file_path)
+            layout = self.extract_layout_from_pdf(file_path)
+        elif extension in ['.tiff', '.tif']:
+            layout = self.extract_layout_from_tiff(file_path)
+        elif extension in ['.jpg', '.jpeg', '.png', '.bmp']:
+            layout = self.extract_layout_from_image(file_path)
         else:
             logger.error(f"Unsupported file type: {extension}")
-            return ""
-    
+            return "", None
+
+        return layout.to_text(), layout
+
     def extract_text_from_image(self, image_path: str) -> str:
         """
         Extract text from a single image file.
-        
+
         Args:
             image_path: Path to image file (jpg, png, etc.)
-            
+
         Returns:
             Extracted text as a single string
         """
+        return self.extract_layout_from_image(image_path).to_text()
+
+    def extract_layout_from_image(self, image_path: str) -> OCRLayout:
+        """
+        Extract text lines, boxes and confidences from a single image file.
+
+        Args:
+            image_path: Path to image file (jpg, png, etc.)
+
+        Returns:
+            OCRLayout for the image (empty on failure)
+        """
+        start_time = time.time()
+        logger.info(f"Processing image: {image_path}")
+        layout = self._ocr_pages([image_path], image_path, paginated=False)
+
+        elapsed = time.time() - start_time
+        logger.info(f"[TIMING] Image OCR took {elapsed:.2f}s, extracted {len(layout)} lines from {image_path}")
+        return layout
+
+    def extract_layout_from_tiff(self, tiff_path: str) -> OCRLayout:
+        """
+        Extract the OCR layout of every frame of a (multi-page) TIFF.
+        Frames are decoded one at a time and fed through the page pipeline.
+
+        Args:
+            tiff_path: Path to TIFF file
+
+        Returns:
+            OCRLayout, paginated when the TIFF has more than one frame (empty on failure)
+        """
+        start_time = time.time()
         try:
-            start_time = time.time()
-            logger.info(f"Processing image: {image_path}")
-            result = self.ocr.ocr(image_path)
-            
-            # Debug: Print raw result to understand what is being detected
-            print(f"DEBUG: Raw OCR result for {os.path.basename(image_path)}: {result}")
-            
-            if not result or result[0] is None:
-                logger.warning(f"No text found in {image_path}")
-                return ""
-            
-            # Extract text from OCR result
-            text_lines = []
-            
-            # Check for new PaddleOCR/PaddleX format (list of dicts)
-            if isinstance(result, list) and len(result) > 0 and isinstance(result[0], dict):
-                # The log shows 'rec_texts' key contains the text lines
-                if 'rec_texts' in result[0]:
-                    text_lines = result[0]['rec_texts']
-                    logger.info(f"Detected PaddleX format. Found {len(text_lines)} lines.")
-            
-            # Fallback for standard PaddleOCR format: [[[bbox], (text, confidence)], ...]
-            elif isinstance(result, list) and len(result) > 0 and isinstance(result[0], list):
-                for line in result[0]:
-                    if len(line) >= 2:
-                        text = line[1][0]  # Get text from (text, confidence) tuple
-                        text_lines.append(text)
-            
-            full_text = "\n".join(text_lines)
+            from PIL import Image, ImageSequence
+
+            with Image.open(tiff_path) as tiff:
+                frame_count = getattr(tiff, "n_frames", 1)
+                logger.info(f"Processing TIFF: {tiff_path} ({frame_count} frame(s))")
+                frames = (frame.copy() for frame in ImageSequence.Iterator(tiff))
+                layout = self._ocr_pages(frames, tiff_path, paginated=frame_count > 1)
+
             elapsed = time.time() - start_time
-            logger.info(f"[TIMING] Image OCR took {elapsed:.2f}s, extracted {len(text_lines)} lines from {image_path}")
-            return full_text
-            
+            logger.info(f"[TIMING] TIFF OCR took {elapsed:.2f}s for {frame_count} frame(s)")
+            return layout
+
         except Exception as e:
-            logger.error(f"Error processing image {image_path}: {str(e)}")
-            return ""
-    
+            logger.error(f"Error processing TIFF {tiff_path}: {str(e)}")
+            return OCRLayout()
+
+    def _ocr_pages(self, pages: Iterable[Any], source: str, paginated: bool = True) -> OCRLayout:
+        """
+        Page-parallel OCR pipeline.
+
+        Each page is preprocessed, split into tiles when it is very large and queued
+        on the batcher. At most `max_in_flight` pages are pending at once so only a
+        bounded number of decoded pages is held in memory.
+
+        Args:
+            pages: Image paths or PIL images, in page order
+            source: Document path, used for logging
+            paginated: Whether the resulting layout renders page headers
+
+        Returns:
+            OCRLayout with lines from every page that could be processed
+        """
+        layout = OCRLayout(paginated=paginated)
+        pending: deque = deque()
+        max_in_flight = max(2 * self.batcher.batch_size, 2)
+
+        def collect_oldest():
+            index, scale, tile_futures = pending.popleft()
+            try:
+                layout.extend(self._collect_page(index, scale, tile_futures, source))
+            except Exception as e:
+                logger.error(f"Error processing page {index+1} of {source}: {str(e)}")
+
+        for index, image in enumerate(pages):
+            try:
+                scale, tile_futures = self._submit_page(image)
+            except Exception as e:
+                logger.error(f"Error preparing page {index+1} of {source}: {str(e)}")
+                continue
+            pending.append((index, scale, tile_futures))
+            while len(pending) >= max_in_flight:
+                collect_oldest()
+
+        while pending:
+            collect_oldest()
+        return layout
+
+    def _submit_page(self, image: Any) -> Tuple[float, List[Tuple[Tuple[int, int], Future]]]:
+        """Preprocess one page and queue its tiles. Returns the resize scale and (offset, future) pairs."""
+        page = preprocess_page(image, self.preset, settings.OCR_TILE_SIZE, settings.OCR_TILE_OVERLAP)
+        if len(page.tiles) > 1:
+            logger.info(f"Large page {page.size[0]}x{page.size[1]} split into {len(page.tiles)} tiles")
+        return page.scale, [(offset, self.batcher.submit(tile, page.use_cls)) for offset, tile in page.tiles]
+
+    def _collect_page(self, index: int, scale: float, tile_futures: list, source: str) -> OCRLayout:
+        """Wait for a page's tiles and merge them into one page layout."""
+        label = f"{source} page {index+1}"
+        parts = [
+            self._result_to_layout(future.result(), label, page=index, scale=scale, offset=offset)
+            for offset, future in tile_futures
+        ]
+        return parts[0] if len(parts) == 1 else merge_tile_layouts(parts)
+
+    def _result_to_layout(
+        self,
+        result: Any,
+        source: str,
+        page: int = 0,
+        scale: float = 1.0,
+        offset: Tuple[int, int] = (0, 0)
+    ) -> OCRLayout:
+        """
+        Convert a raw PaddleOCR result for one image into an OCRLayout.
+
+        Args:
+            result: Raw result as returned by `ocr(image)`
+            source: Image path or label, used for logging
+            page: Page index assigned to the lines
+            scale: Resize factor applied during preprocessing; boxes are mapped back
+            offset: (x, y) position of the tile within the page
+
+        Returns:
+            OCRLayout with one entry per recognized line
+        """
+        # Debug: Print raw result to understand what is being detected
+        print(f"DEBUG: Raw OCR result for {os.path.basename(str(source))}: {result}")
+
+        def to_box(points):
+            x0, y0, x1, y1 = polygon_to_box(points)
+            dx, dy = offset
+            return tuple(int(v / scale) for v in (x0 + dx, y0 + dy, x1 + dx, y1 + dy))
+
+        layout = OCRLayout()
+        if not result or result[0] is None:
+            logger.warning(f"No text found in {source}")
+            return layout
+
+        # Check for new PaddleOCR/PaddleX format (list of dicts)
+        if isinstance(result, list) and len(result) > 0 and isinstance(result[0], dict):
+            # The log shows 'rec_texts' key contains the text lines
+            page_result = result[0]
+            if 'rec_texts' in page_result:
+                texts = list(page_result['rec_texts'])
+                scores = page_result.get('rec_scores')
+                boxes = page_result.get('rec_boxes')
+                if boxes is None:
+                    boxes = page_result.get('rec_polys')
+                for i, text in enumerate(texts):
+                    box = to_box(boxes[i]) if boxes is not None and i < len(boxes) else None
+                    score = scores[i] if scores is not None and i < len(scores) else 1.0
+                    layout.append(text, box, score, page)
+                logger.info(f"Detected PaddleX format. Found {len(texts)} lines.")
+
+        # Fallback for standard PaddleOCR format: [[[bbox], (text, confidence)], ...]
+        elif isinstance(result, list) and len(result) > 0 and isinstance(result[0], list):
+            for line in result[0]:
+                if len(line) >= 2:
+                    text, score = line[1][0], line[1][1]  # (text, confidence) tuple
+                    layout.append(text, to_box(line[0]), score, page)
+
+        return layout
+
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """
         Extract text from PDF by converting to images first.
-        
+
         Args:
             pdf_path: Path to PDF file
-            
+
         Returns:
             Extracted text from all pages
         """
+        return self.extract_layout_from_pdf(pdf_path).to_text()
+
+    def extract_layout_from_pdf(self, pdf_path: str) -> OCRLayout:
+        """
+        Extract the OCR layout of every PDF page.
+        Pages go through the page-parallel pipeline so they share OCR batches.
+
+        Args:
+            pdf_path: Path to PDF file
+
+        Returns:
+            Paginated OCRLayout covering all pages (empty on failure)
+        """
         total_start = time.time()
         try:
             from pdf2image import convert_from_path
             import tempfile
-            import os
-            
+
             logger.info(f"Processing PDF: {pdf_path}")
-            
+
             # Convert PDF to images
             convert_start = time.time()
             with tempfile.TemporaryDirectory() as tmp_dir:
                 logger.info(f"[TIMING] Converting PDF to images...")
-                images = convert_from_path(pdf_path, output_folder=tmp_dir)
+                # Pages are rendered to files in tmp_dir and only their paths are kept: the
+                # pipeline opens each page when it is submitted and drops it once tiled, so
+                # at most max_in_flight pages are decoded at a time whatever the page count
+                images = convert_from_path(
+                    pdf_path, dpi=self.preset.pdf_dpi, output_folder=tmp_dir, paths_only=True
+                )
                 convert_elapsed = time.time() - convert_start
                 logger.info(f"[TIMING] PDF conversion took {convert_elapsed:.2f}s, generated {len(images)} image(s)")
-                
-                all_text = []
-                for i, image in enumerate(images):
-                    page_start = time.time()
-                    # Save image temporarily
-                    img_path = os.path.join(tmp_dir, f"page_{i}.jpg")
-                    image.save(img_path, 'JPEG')
-                    
-                    # Extract text from image
-                    page_text = self.extract_text_from_image(img_path)
-                    page_elapsed = time.time() - page_start
-                    logger.info(f"[TIMING] Page {i+1} processing took {page_elapsed:.2f}s")
-                    
-                    if page_text:
-                        all_text.append(f"--- Page {i+1} ---\n{page_text}")
-                
-                full_text = "\n\n".join(all_text)
+
+                layout = self._ocr_pages(images, pdf_path, paginated=True)
+
                 total_elapsed = time.time() - total_start
                 logger.info(f"[TIMING] Total PDF processing took {total_elapsed:.2f}s for {len(images)} page(s)")
-                return full_text
-                
+                return layout
+
         except Exception as e:
             error_msg = f"Error processing PDF {pdf_path}: {str(e)}"
             logger.error(error_msg)
-            return ""
+            return OCRLayout(paginated=True)
+
+    def benchmark_batch_sizes(self, image_paths: List[str], batch_sizes: List[int] = (1, 2, 4, 8)) -> Dict[int, Dict[str, float]]:
+        """
+        Measure OCR throughput (images per second) for each batch size.
+
+        Args:
+            image_paths: Images to OCR on every run
+            batch_sizes: Batch sizes to compare
+
+        Returns:
+            Mapping of batch size to throughput stats
+        """
+        report = {}
+        for size in batch_sizes:
+            batcher = OCRBatcher(self.ocr, batch_size=size, max_wait=1.0)
+            start = time.perf_counter()
+            batcher.map(list(image_paths))
+            elapsed = time.perf_counter() - start
+            batcher.close()
+            report[size] = {
+                "images": len(image_paths),
+                "seconds": round(elapsed, 3),
+                "images_per_second": round(len(image_paths) / elapsed, 2) if elapsed else 0.0,
+                "batches": batcher.stats()
+            }
+            logger.info(f"[BENCH] batch_size={size}: {report[size]['images_per_second']} images/s")
+        return report
 
 
 # Global OCR processor instance
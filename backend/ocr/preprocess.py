@@ -0,0 +1,263 @@
+"""
+Image preprocessing ahead of OCR.
+Normalizes resolution, converts to grayscale and runs a cheap orientation/skew
+check so the angle classifier can be skipped for pages whose text lines are
+horizontal. That check cannot tell an upside-down page from an upright one, so
+the presets that use it are opt-in; the default ("off") leaves pages untouched.
+"""
+from pathlib import Path
+from typing import NamedTuple, Optional, Union, List, Tuple
+import logging
+
+import numpy as np
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+class PreprocessPreset(NamedTuple):
+    """Preprocessing options for one speed/accuracy trade-off."""
+    max_side: Optional[int]  # Downscale so the longest side fits (None = keep full resolution)
+    grayscale: bool  # Drop color before OCR
+    detect_orientation: bool  # Skip the angle classifier when text lines are horizontal
+    deskew: bool  # Estimate and correct small skew angles
+    pdf_dpi: int  # Rasterization DPI for PDF pages
+
+
+PRESETS = {
+    # Default and original behaviour: full resolution, color, angle classifier always on
+    "off": PreprocessPreset(max_side=None, grayscale=False, detect_orientation=False, deskew=False, pdf_dpi=200),
+    "fast": PreprocessPreset(max_side=1280, grayscale=True, detect_orientation=True, deskew=False, pdf_dpi=150),
+    "balanced": PreprocessPreset(max_side=1800, grayscale=True, detect_orientation=True, deskew=True, pdf_dpi=200),
+    "accurate": PreprocessPreset(max_side=2600, grayscale=False, detect_orientation=False, deskew=True, pdf_dpi=300),
+}
+
+# Longest side of the thumbnail used for orientation and skew estimation
+PROBE_SIDE = 400
+
+# Row/column projection variance ratio above which text lines are considered horizontal
+UPRIGHT_RATIO = 2.0
+
+# Skew search range and step (degrees); smaller angles are left alone
+MAX_SKEW = 5.0
+SKEW_STEP = 0.5
+
+
+class PreprocessedImage(NamedTuple):
+    """Preprocessed page ready for the OCR engine."""
+    image: np.ndarray  # HxWx3 uint8 in BGR order, as PaddleOCR expects for arrays
+    scale: float  # Resize factor applied (OCR boxes divide by this to map back)
+    skew_angle: float  # Degrees the page was rotated to deskew it
+    use_cls: bool  # Whether the angle classifier still needs to run
+
+
+def get_preset(name: str) -> PreprocessPreset:
+    """Look up a preset by name, falling back to 'off' for unknown names."""
+    preset = PRESETS.get((name or "").lower())
+    if preset is None:
+        logger.warning(f"Unknown OCR preprocessing preset '{name}', using 'off'")
+        preset = PRESETS["off"]
+    return preset
+
+
+def preprocess_image(image: Union[str, Path, Image.Image], preset: PreprocessPreset) -> PreprocessedImage:
+    """
+    Prepare an image for OCR according to a preset.
+
+    Args:
+        image: Image path or PIL image
+        preset: Preprocessing options
+
+    Returns:
+        PreprocessedImage with the array to OCR and how it was transformed
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    # Phone photos carry their rotation in EXIF rather than in the pixels
+    image = ImageOps.exif_transpose(image).convert("RGB")
+
+    scale = 1.0
+    if preset.max_side and max(image.size) > preset.max_side:
+        scale = preset.max_side / max(image.size)
+        new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(new_size, Image.LANCZOS)
+
+    if preset.grayscale:
+        image = image.convert("L")
+
+    skew_angle = 0.0
+    use_cls = True
+    if preset.detect_orientation or preset.deskew:
+        probe = _ink_probe(image)
+        if preset.deskew:
+            skew_angle = estimate_skew(probe)
+            if skew_angle:
+                fill = 255 if image.mode == "L" else (255, 255, 255)
+                image = image.rotate(skew_angle, resample=Image.BILINEAR, expand=True, fillcolor=fill)
+                probe = _ink_probe(image)
+        if preset.detect_orientation:
+            use_cls = not is_upright(probe)
+
+    array = np.asarray(image.convert("RGB"))[:, :, ::-1]
+    return PreprocessedImage(np.ascontiguousarray(array), scale, skew_angle, use_cls)
+
+
+def _ink_probe(image: Image.Image) -> np.ndarray:
+    """Small binary ink mask (1.0 = dark pixel) used for the cheap geometry checks."""
+    probe = image.convert("L")
+    probe.thumbnail((PROBE_SIDE, PROBE_SIDE))
+    pixels = np.asarray(probe, dtype=np.float32)
+    threshold = min(pixels.mean() - pixels.std() * 0.5, 200.0)
+    return (pixels < threshold).astype(np.float32)
+
+
+def _row_profile_score(ink: np.ndarray) -> float:
+    """Variance of the horizontal projection: high when ink is organized in text rows."""
+    return float(ink.sum(axis=1).var())
+
+
+def is_upright(ink: np.ndarray) -> bool:
+    """
+    Check whether text lines run horizontally.
+
+    Horizontal lines give a peaky row projection and a flat column projection;
+    pages rotated by 90 degrees show the opposite. Upside-down pages cannot be told
+    apart this way, so only the opt-in fast/balanced presets rely on it; a scan
+    source that may produce flipped pages should stay on "off" or "accurate".
+    """
+    if ink.sum() == 0:
+        return False
+    row_var = _row_profile_score(ink)
+    col_var = float(ink.sum(axis=0).var())
+    return row_var >= UPRIGHT_RATIO * max(col_var, 1e-6)
+
+
+def estimate_skew(ink: np.ndarray) -> float:
+    """
+    Estimate small page skew by maximizing the row projection variance.
+
+    Args:
+        ink: Binary ink mask from `_ink_probe`
+
+    Returns:
+        Rotation angle in degrees that straightens the page (0.0 if already straight)
+    """
+    if ink.sum() == 0:
+        return 0.0
+    probe = Image.fromarray((ink * 255).astype(np.uint8))
+    best_angle, best_score = 0.0, _row_profile_score(ink)
+    steps = int(MAX_SKEW / SKEW_STEP)
+    for i in range(-steps, steps + 1):
+        angle = i * SKEW_STEP
+        if angle == 0:
+            continue
+        rotated = np.asarray(probe.rotate(angle, resample=Image.NEAREST), dtype=np.float32) / 255.0
+        score = _row_profile_score(rotated)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def _tile_starts(length: int, tile_size: int, step: int) -> List[int]:
+    if length <= tile_size:
+        return [0]
+    positions = list(range(0, length - tile_size, step))
+    positions.append(length - tile_size)
+    return positions
+
+
+class PreprocessedPage(NamedTuple):
+    """A page as OCR input: one or more tiles and how they were transformed."""
+    tiles: List[Tuple[Tuple[int, int], np.ndarray]]  # ((x, y) offset in the resized page, BGR array)
+    scale: float
+    skew_angle: float
+    use_cls: bool
+    size: Tuple[int, int]  # (width, height) of the resized page
+
+
+def preprocess_page(
+    image: Union[str, Path, Image.Image],
+    preset: PreprocessPreset,
+    tile_size: int,
+    overlap: int
+) -> PreprocessedPage:
+    """
+    Prepare a page for OCR, tiling it when it is larger than tile_size after the
+    preset's resize.
+
+    The decision is made from the source dimensions, which PIL reads without
+    decoding pixels. A page that needs tiling is never converted, resized or
+    copied as a whole: each tile is cropped from the source, resized and converted
+    on its own, so the only full-page buffer is the decoded source. Tiles are not
+    deskewed (a page-wide rotation would need the whole page) and keep the angle
+    classifier on. Photos with an EXIF rotation take the whole-page path.
+
+    Args:
+        image: Image path or PIL image
+        preset: Preprocessing options
+        tile_size: Maximum tile side in pixels (0 disables tiling)
+        overlap: Pixels shared by neighbouring tiles
+
+    Returns:
+        PreprocessedPage with the tiles to OCR
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    width, height = image.size
+    scale = 1.0
+    if preset.max_side and max(width, height) > preset.max_side:
+        scale = preset.max_side / max(width, height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    rotated = image.getexif().get(0x0112, 1) not in (None, 1)
+
+    if not tile_size or rotated or (size[0] <= tile_size and size[1] <= tile_size):
+        page = preprocess_image(image, preset)
+        tiles = split_into_tiles(page.image, tile_size, overlap)
+        return PreprocessedPage(tiles, page.scale, page.skew_angle, page.use_cls, (page.image.shape[1], page.image.shape[0]))
+
+    step = max(tile_size - overlap, 1)
+    tiles = []
+    for y in _tile_starts(size[1], tile_size, step):
+        for x in _tile_starts(size[0], tile_size, step):
+            tile_w, tile_h = min(tile_size, size[0] - x), min(tile_size, size[1] - y)
+            source_box = (
+                round(x / scale), round(y / scale),
+                min(width, round((x + tile_w) / scale)), min(height, round((y + tile_h) / scale))
+            )
+            tile = image.crop(source_box).convert("RGB")
+            if tile.size != (tile_w, tile_h):
+                tile = tile.resize((tile_w, tile_h), Image.LANCZOS)
+            if preset.grayscale:
+                tile = tile.convert("L")
+            array = np.asarray(tile.convert("RGB"))[:, :, ::-1]
+            tiles.append(((x, y), np.ascontiguousarray(array)))
+    return PreprocessedPage(tiles, scale, 0.0, True, size)
+
+
+def split_into_tiles(image: np.ndarray, tile_size: int, overlap: int) -> List[Tuple[Tuple[int, int], np.ndarray]]:
+    """
+    Split a large page into overlapping tiles.
+
+    Pages whose sides both fit in `tile_size` are returned whole. Otherwise tiles
+    of `tile_size` pixels step by `tile_size - overlap`, with the last row and
+    column aligned to the page edge, so every text line fits entirely in at least
+    one tile as long as it is shorter than `overlap`.
+
+    Args:
+        image: HxWxC page array
+        tile_size: Maximum tile side in pixels
+        overlap: Pixels shared by neighbouring tiles
+
+    Returns:
+        List of ((x, y) offset, tile array) pairs
+    """
+    height, width = image.shape[:2]
+    if not tile_size or (height <= tile_size and width <= tile_size):
+        return [((0, 0), image)]
+
+    step = max(tile_size - overlap, 1)
+    return [
+        ((x, y), np.ascontiguousarray(image[y:y + tile_size, x:x + tile_size]))
+        for y in _tile_starts(height, tile_size, step)
+        for x in _tile_starts(width, tile_size, step)
+    ]
@@ -0,0 +1,242 @@
+"""
+Shared OCR service.
+
+Runs OCRProcessor in a standalone process that API workers reach over a local
+Unix socket, so PaddleOCR models are loaded once per OCR worker instead of once
+per uvicorn worker.
+
+Start the service (from the backend directory):
+    python -m ocr.service --socket /tmp/denialshield-ocr.sock --workers 2
+
+and point the API at it with OCR_SERVICE_SOCKET=/tmp/denialshield-ocr.sock.
+Messages are length-prefixed JSON. Files are passed by path, so the service and
+the API workers must share the upload folder.
+"""
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+
+from config import settings
+from ocr.layout import OCRLayout
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 4-byte big-endian length prefix in front of every JSON message
+_HEADER = struct.Struct(">I")
+
+
+class OCRServiceError(RuntimeError):
+    """Raised when the OCR service is unreachable or reports a failure."""
+
+
+def _send_message(sock: socket.socket, message: Dict[str, Any]):
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """Read one message. Returns None when the peer closed the connection."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exactly(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload.decode("utf-8"))
+
+
+class OCRServiceClient:
+    """
+    Thin OCR client used by API workers.
+    Exposes the same document methods as OCRProcessor, backed by the OCR service.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 300.0):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+
+    def _call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                _send_message(sock, request)
+                response = _recv_message(sock)
+        except OSError as e:
+            raise OCRServiceError(f"OCR service at {self.socket_path} unavailable: {e}") from e
+
+        if response is None:
+            raise OCRServiceError("OCR service closed the connection")
+        if not response.get("ok"):
+            raise OCRServiceError(response.get("error", "Unknown OCR service error"))
+        return response
+
+    def process_document(self, file_path: str) -> Any:
+        text, _ = self.process_document_with_layout(file_path)
+        return text
+
+    def process_document_with_layout(self, file_path: str) -> Tuple[Any, Optional[OCRLayout]]:
+        response = self._call({"op": "process", "path": str(Path(file_path).resolve())})
+        return response.get("text", ""), OCRLayout.from_dict(response.get("layout"))
+
+    def ping(self) -> bool:
+        try:
+            return bool(self._call({"op": "ping"}).get("ok"))
+        except OCRServiceError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return self._call({"op": "stats"})
+
+
+_processor = None
+
+
+def get_ocr_processor():
+    """
+    Return the OCR processor for this process.
+
+    With OCR_SERVICE_SOCKET set this is a client for the shared OCR service and
+    PaddleOCR is never imported here; otherwise models are loaded in-process.
+    """
+    global _processor
+    if _processor is None:
+        if settings.OCR_SERVICE_SOCKET:
+            logger.info(f"Using shared OCR service at {settings.OCR_SERVICE_SOCKET}")
+            _processor = OCRServiceClient(settings.OCR_SERVICE_SOCKET, settings.OCR_SERVICE_TIMEOUT)
+        else:
+            from ocr.paddle_ocr import ocr_processor
+            _processor = ocr_processor
+    return _processor
+
+
+class _OCRRequestHandler(socketserver.BaseRequestHandler):
+    """Serves requests on one client connection until the client disconnects."""
+
+    def handle(self):
+        while True:
+            try:
+                request = _recv_message(self.request)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping OCR client connection: {e}")
+                return
+            if request is None:
+                return
+            _send_message(self.request, self.server.dispatch(request))
+
+
+class _OCRServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, listener: socket.socket, processor):
+        super().__init__(listener.getsockname(), _OCRRequestHandler, bind_and_activate=False)
+        # Serve on the listening socket created (and possibly shared) by the parent
+        self.socket.close()
+        self.socket = listener
+        self.processor = processor
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        try:
+            if op == "process":
+                text, layout = self.processor.process_document_with_layout(request["path"])
+                return {"ok": True, "text": text, "layout": layout.to_dict() if layout else None}
+            if op == "ping":
+                return {"ok": True, "pid": os.getpid()}
+            if op == "stats":
+                return {"ok": True, "pid": os.getpid(), "batches": self.processor.batcher.stats()}
+            return {"ok": False, "error": f"Unknown op: {op}"}
+        except Exception as e:
+            logger.error(f"OCR service failed on {op} request: {e}")
+            return {"ok": False, "error": str(e)}
+
+
+def _run_worker(listener: socket.socket):
+    # Models are loaded here, after any fork, so each worker owns one copy
+    from ocr.paddle_ocr import ocr_processor
+
+    server = _OCRServer(listener, ocr_processor)
+    logger.info(f"OCR worker {os.getpid()} ready")
+    server.serve_forever()
+
+
+def serve(socket_path: str, workers: int = 1):
+    """
+    Bind the Unix socket and serve OCR requests.
+
+    With more than one worker the parent forks that many processes which all
+    accept on the same listening socket; the parent only supervises them.
+    """
+    path = Path(socket_path)
+    if path.exists():
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    os.chmod(path, 0o660)
+    listener.listen(128)
+    logger.info(f"OCR service listening on {path} with {workers} worker(s)")
+
+    try:
+        if workers <= 1:
+            _run_worker(listener)
+            return
+
+        children = []
+        for _ in range(workers):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    _run_worker(listener)
+                finally:
+                    os._exit(0)
+            children.append(pid)
+
+        def stop(signum, frame):
+            for child in children:
+                try:
+                    os.kill(child, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for child in children:
+            os.waitpid(child, 0)
+    finally:
+        listener.close()
+        if path.exists():
+            path.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared OCR service")
+    parser.add_argument("--socket", default=settings.OCR_SERVICE_SOCKET or "/tmp/denialshield-ocr.sock")
+    parser.add_argument("--workers", type=int, default=settings.OCR_SERVICE_WORKERS)
+    args = parser.parse_args()
+    serve(args.socket, args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+Denial analytics endpoint, served from incrementally maintained rollups.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from database import get_async_db
+from utils.analytics import get_analytics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/analytics")
+async def get_denial_analytics(
+    limit: int = Query(10, ge=1, le=100, description="Entries per top-N list"),
+    weeks: int = Query(12, ge=1, le=104, description="Number of recent weeks"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get denial trends: counts by insurer, denial code and week, the average
+    pre-claim risk score and the most common missing requirements/documents.
+
+    Reads only the rollup rows, so the cost does not grow with history.
+
+    Returns:
+        Totals, top-N lists and weekly series
+    """
+    try:
+        return {"success": True, **(await db.run_sync(get_analytics, limit, weeks))}
+
+    except Exception as e:
+        logger.error(f"Error retrieving analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -11,8 +11,12 @@ import logging
 
 from database import get_db, UploadedDocument, AnalysisSession, ExtractedData, ReasoningResult
 from llm.extract_llm8b import extractor_llm
+from ocr.layout import OCRLayout
 from llm.reasoning_llm70b import reasoning_llm
 from utils.memory_graph import get_pattern_suggestions
+from utils.analytics import analysis_increments, apply_increments
+from utils.ingestion import ingestion
+from utils.rules_registry import rules_registry
 from config import settings
 
 logging.basicConfig(level=logging.INFO)
@@ -51,6 +55,9 @@ async def analyze_documents(
         # Create new analysis session
         session_id = str(uuid.uuid4())
         
+        # Documents uploaded moments ago may still be in the OCR ingestion stage
+        await ingestion.wait_for(request.document_ids, timeout=settings.OCR_WAIT_TIMEOUT)
+        
         # Retrieve documents from database
         documents = db.query(UploadedDocument).filter(
             UploadedDocument.id.in_(request.document_ids)
@@ -68,16 +75,12 @@ async def analyze_documents(
                 continue
             
             # Classification Logic
-            # Optimization: If file is in 'Denial' folder, force type to 'denial_letter'
-            # Check for path separators specifically to avoid partial matches
-            file_path_str = str(doc.file_path)
-            # Standardize separators for Windows/Linux compatibility check
-            norm_path = file_path_str.replace("\\", "/")
-            
-            if "/Denial/" in norm_path or "/UserData/Denial" in norm_path:
+            # Optimization: If file was uploaded to the 'Denial' category, force type to 'denial_letter'
+            # (the category column, not the path: uploads live in the content-addressed blob store)
+            if doc.category == "Denial":
                 doc_type = "denial_letter"
-                logger.info(f"Optimization: Document {doc.id} forced as 'denial_letter' based on folder location.")
-                print(f"DEBUG: Document {doc.id} ({doc.filename}) forced as: denial_letter (Location Based)")
+                logger.info(f"Optimization: Document {doc.id} forced as 'denial_letter' based on upload category.")
+                print(f"DEBUG: Document {doc.id} ({doc.filename}) forced as: denial_letter (Category Based)")
             else:
                 # LLM Classification fallback
                 doc_type = extractor_llm.classify_document(doc.ocr_text)
@@ -85,7 +88,9 @@ async def analyze_documents(
                 print(f"DEBUG: Document {doc.id} ({doc.filename}) classified as: {doc_type}")
             
             # Extract fields based on type
-            extracted_fields = extractor_llm.extract_fields(doc.ocr_text, doc_type)
+            extracted_fields = extractor_llm.extract_fields(
+                doc.ocr_text, doc_type, OCRLayout.from_dict(doc.ocr_layout)
+            )
             
             # Store extracted data
             extracted_data_record = ExtractedData(
@@ -106,13 +111,9 @@ async def analyze_documents(
         db.commit()
         
         # Load insurance rules if plan is specified
-        insurance_rules = None
-        if request.insurance_plan:
-            rules_file = settings.INSURANCE_RULES_DIR / f"{request.insurance_plan.lower().replace(' ', '_')}.json"
-            if rules_file.exists():
-                with open(rules_file, 'r') as f:
-                    insurance_rules = json.load(f)
-                logger.info(f"Loaded insurance rules: {request.insurance_plan}")
+        insurance_rules = rules_registry.rules_for(request.insurance_plan)
+        if insurance_rules is not None:
+            logger.info(f"Loaded insurance rules: {request.insurance_plan}")
         
         # Step 3: Reasoning based on analysis type
         reasoning_result = None
@@ -175,7 +176,11 @@ async def analyze_documents(
         reasoning_record = ReasoningResult(
             session_id=session_id,
             reasoning_type=request.analysis_type,
-            input_data={"documents": extracted_documents, "insurance_plan": request.insurance_plan},
+            # The extracted fields are already stored per document in ExtractedData for this session
+            input_data={
+                "document_ids": [d["document_id"] for d in extracted_documents],
+                "insurance_plan": request.insurance_plan
+            },
             output_data=reasoning_result,
             denial_risk_score=denial_risk_score,
             missing_requirements=missing_requirements
@@ -190,6 +195,8 @@ async def analyze_documents(
             document_ids=request.document_ids
         )
         db.add(analysis_session)
+        # Dashboard rollups are updated in the same transaction
+        apply_increments(db, analysis_increments(request.analysis_type, denial_risk_score, missing_requirements))
         db.commit()
         
         logger.info(f"Analysis complete for session: {session_id}")
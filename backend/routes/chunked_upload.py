@@ -0,0 +1,159 @@
+"""
+Resumable chunked upload endpoints.
+
+1. POST /upload/chunked/init with filename, total_size, category and optional sha256
+2. PUT /upload/chunked/{upload_id}?offset=N with the raw chunk bytes as the body
+   (optionally X-Chunk-SHA256); after a failure, GET /upload/chunked/{upload_id}
+   returns the offset to resume from
+3. POST /upload/chunked/{upload_id}/finalize files the upload in the blob store,
+   records the document and queues OCR
+"""
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from pathlib import Path
+from typing import Optional
+import asyncio
+import logging
+
+from database import get_async_db, UploadedDocument
+from config import settings
+from utils.chunked_uploads import chunked_uploads, ChunkedUploadError
+from utils.upload_storage import ALLOWED_EXTENSIONS, safe_category_name
+from utils.ingestion import ingestion
+from utils.upload_manifest import upload_manifest
+from utils.blob_store import blob_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class ChunkedUploadInit(BaseModel):
+    filename: str
+    total_size: int
+    category: str = "PreClaim"
+    sha256: Optional[str] = None  # Whole-file digest, verified on finalize
+
+
+def _progress(meta: dict) -> dict:
+    return {
+        "upload_id": meta["upload_id"],
+        "filename": meta["filename"],
+        "offset": meta["offset"],
+        "total_size": meta["total_size"],
+        "complete": meta["offset"] == meta["total_size"]
+    }
+
+
+@router.post("/upload/chunked/init")
+async def init_chunked_upload(request: ChunkedUploadInit):
+    """
+    Start a resumable upload.
+
+    Returns:
+        upload_id and the recommended chunk size
+    """
+    filename = Path(request.filename).name
+    if Path(filename).suffix.lower() not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {request.filename}")
+
+    try:
+        meta = await chunked_uploads.init(
+            filename, safe_category_name(request.category), request.total_size, request.sha256
+        )
+        logger.info(f"Started chunked upload {meta['upload_id']} for {filename} ({request.total_size} bytes)")
+        return {"success": True, **_progress(meta), "chunk_size": settings.UPLOAD_CHUNK_SIZE}
+    except ChunkedUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.get("/upload/chunked/{upload_id}")
+async def get_chunked_upload(upload_id: str):
+    """Get an upload's progress; `offset` is where the next chunk must start."""
+    try:
+        return {"success": True, **_progress(await chunked_uploads.status(upload_id))}
+    except ChunkedUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.put("/upload/chunked/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    x_chunk_sha256: Optional[str] = Header(None)
+):
+    """
+    Upload one chunk as the raw request body.
+    The offset must match the bytes received so far (409 otherwise, with the
+    expected offset available from GET /upload/chunked/{upload_id}).
+    """
+    try:
+        meta = await chunked_uploads.write_chunk(upload_id, offset, request.stream(), x_chunk_sha256)
+        return {"success": True, **_progress(meta)}
+    except ChunkedUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error writing chunk for upload {upload_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error writing chunk: {str(e)}")
+
+
+@router.post("/upload/chunked/{upload_id}/finalize")
+async def finalize_chunked_upload(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Verify a completed upload, store it like a regular upload and queue it for OCR.
+    """
+    try:
+        meta = await chunked_uploads.status(upload_id)
+        extension = Path(meta["filename"]).suffix.lower()
+
+        temp_path = blob_store.temp_path(extension)
+        meta, sha256 = await chunked_uploads.finalize(upload_id, temp_path)
+        file_path, _ = await asyncio.to_thread(blob_store.commit, temp_path, sha256, extension)
+        upload_manifest.forget(file_path.parent)
+
+        db_document = UploadedDocument(
+            filename=meta["filename"],
+            file_path=str(file_path),
+            category=meta["category"],
+            file_type=extension.replace('.', ''),
+            file_size=meta["total_size"],
+            content_hash=sha256,
+            ocr_completed=0,
+            ocr_status="queued"
+        )
+        db.add(db_document)
+        await db.commit()
+        ingestion.enqueue(db_document.id, str(file_path))
+
+        logger.info(f"Finalized chunked upload {upload_id} as document {db_document.id}")
+        return {
+            "success": True,
+            "file": {
+                "id": db_document.id,
+                "filename": db_document.filename,
+                "file_type": db_document.file_type,
+                "file_size": db_document.file_size,
+                "sha256": sha256,
+                "ocr_completed": False,
+                "ocr_status": "queued"
+            }
+        }
+    except ChunkedUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error finalizing upload {upload_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error finalizing upload: {str(e)}")
+
+
+@router.delete("/upload/chunked/{upload_id}")
+async def abort_chunked_upload(upload_id: str):
+    """Discard an in-progress upload."""
+    try:
+        await chunked_uploads.status(upload_id)
+        await chunked_uploads.abort(upload_id)
+        return {"success": True}
+    except ChunkedUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
@@ -8,7 +8,6 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List
 import uuid
-import json
 import logging
 import asyncio
 
@@ -16,6 +15,7 @@ from database import get_db, UploadedDocument, GeneratedAppeal
 from ocr.mock_ocr_data import mock_ocr_data
 from agents.orchestrator import run_appeal_workflow
 from utils.pdf_generator import create_appeal_pdf
+from utils.rules_registry import rules_registry
 from config import settings
 from typing import Optional
 
@@ -63,12 +63,7 @@ async def generate_appeal_letter(
                 combined_ocr_data[doc.filename] = mock_data
 
         # 2. Load Rules
-        insurance_rules = {}
-        if request.insurance_plan:
-            rules_file = settings.INSURANCE_RULES_DIR / f"{request.insurance_plan.lower().replace(' ', '_')}.json"
-            if rules_file.exists():
-                with open(rules_file, 'r') as f:
-                    insurance_rules = json.load(f)
+        insurance_rules = rules_registry.rules_for(request.insurance_plan) or {}
 
         # 3. RUN MULTI-AGENT WORKFLOW
         # Running synchronously because LangGraph in this setup is sync, but wrapping in async handler.
@@ -5,14 +5,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
-import json
 import logging
 import asyncio
 
 from database import get_db, UploadedDocument
 from ocr.mock_ocr_data import mock_ocr_data
 from agents.orchestrator import run_appeal_workflow
-from config import settings
+from utils.rules_registry import rules_registry
 
 logger = logging.getLogger(__name__)
 
@@ -56,12 +55,7 @@ async def run_claim_simulation(
                 combined_ocr_data[doc.filename] = mock_data
 
         # 2. Load Rules
-        insurance_rules = {}
-        if request.insurance_plan:
-            rules_file = settings.INSURANCE_RULES_DIR / f"{request.insurance_plan.lower().replace(' ', '_')}.json"
-            if rules_file.exists():
-                with open(rules_file, 'r') as f:
-                    insurance_rules = json.load(f)
+        insurance_rules = rules_registry.rules_for(request.insurance_plan) or {}
 
         # 3. RUN AGENTS
         logger.info(f"Running Claim Simulation...")
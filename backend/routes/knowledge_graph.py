@@ -0,0 +1,79 @@
+"""
+Knowledge graph query endpoints.
+"""
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+import asyncio
+import logging
+
+from database import SessionLocal
+from utils.knowledge_graph import KINDS, knowledge_graph
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _refreshed_graph():
+    db = SessionLocal()
+    try:
+        knowledge_graph.ensure_fresh(db)
+    finally:
+        db.close()
+
+
+@router.get("/knowledge-graph/query")
+async def query_knowledge_graph(
+    target: str = Query(..., description=f"Node kind to rank: {', '.join(KINDS)}"),
+    insurer: Optional[List[str]] = Query(None),
+    denial_code: Optional[List[str]] = Query(None),
+    cpt: Optional[List[str]] = Query(None),
+    procedure: Optional[List[str]] = Query(None),
+    missing_doc: Optional[List[str]] = Query(None),
+    resolution: Optional[List[str]] = Query(None),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Rank entities linked to past denial patterns that match the filters.
+
+    Repeat a filter to accept several values; different filters must all match.
+    Insurer names are normalized, so insurer=BlueCross covers every BlueCross plan.
+
+    Examples:
+        ?target=missing_doc&cpt=72148 (most common missing docs for CPT 72148, all payers)
+        ?target=resolution&denial_code=CO-50&insurer=BlueCross
+
+    Returns:
+        Matching pattern count, total weight and the ranked results
+    """
+    try:
+        await asyncio.to_thread(_refreshed_graph)
+        filters = {
+            "insurer": insurer, "denial_code": denial_code, "cpt": cpt, "procedure": procedure,
+            "missing_doc": missing_doc, "resolution": resolution
+        }
+        return knowledge_graph.query(target, {k: v for k, v in filters.items() if v}, limit)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Knowledge graph query failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/knowledge-graph/stats")
+async def knowledge_graph_stats():
+    """
+    Get the size of the knowledge graph and query timings.
+
+    Returns:
+        Node counts per kind, edge count and load/query timings
+    """
+    try:
+        await asyncio.to_thread(_refreshed_graph)
+        return knowledge_graph.metrics()
+
+    except Exception as e:
+        logger.error(f"Error retrieving knowledge graph stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
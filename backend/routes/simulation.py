@@ -2,12 +2,13 @@
 Simulation endpoint for running counterfactual claim analysis.
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List
 import logging
 
-from database import get_db, UploadedDocument
+from database import get_async_db, UploadedDocument
 from ocr.mock_ocr_data import mock_ocr_data
 from agents.simulator_agent import run_simulator_agent
 from config import settings
@@ -25,16 +26,16 @@ class SimulationRequest(BaseModel):
 @router.post("/simulation/run")
 async def run_simulation(
     request: SimulationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Run claim outcome simulation with counterfactual analysis.
     """
     try:
         # 1. Retrieve & Prepare Data
-        documents = db.query(UploadedDocument).filter(
-            UploadedDocument.id.in_(request.document_ids)
-        ).all()
+        documents = (await db.execute(
+            select(UploadedDocument.filename).where(UploadedDocument.id.in_(request.document_ids))
+        )).all()
         
         if not documents:
             raise HTTPException(status_code=400, detail="No documents found")
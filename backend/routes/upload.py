@@ -1,15 +1,23 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from pathlib import Path
-import uuid
-import shutil
+from dataclasses import asdict
 import logging
 import json
+import asyncio
 
-from database import get_db, UploadedDocument
+from database import get_async_db, SessionLocal, UploadedDocument
 from config import settings
-from ocr.paddle_ocr import ocr_processor
+from utils.upload_storage import (
+    stream_upload_to_disk, FileTooLargeError, UnsupportedFileTypeError, ALLOWED_EXTENSIONS, safe_category_name
+)
+from utils.ingestion import ingestion, document_statuses, TERMINAL_STATUSES
+from utils.upload_manifest import upload_manifest
+from utils.retention import retention
+from utils.blob_store import blob_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,175 +25,266 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+async def _store_upload(file: UploadFile, safe_category: str) -> UploadedDocument:
+    """Stream one upload into the blob store and build its (unsaved) document row."""
+    file_extension = Path(file.filename).suffix.lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
+        raise UnsupportedFileTypeError(file.filename)
+
+    # Stream file to disk (async writes, hashed on the fly, size limit enforced),
+    # then file it under its content hash; identical content is stored only once
+    temp_path = blob_store.temp_path(file_extension)
+    stored = await stream_upload_to_disk(file, temp_path, settings.MAX_FILE_SIZE)
+    file_path, deduplicated = await asyncio.to_thread(blob_store.commit, temp_path, stored.sha256, file_extension)
+    upload_manifest.forget(file_path.parent)
+    logger.info(f"File saved: {file.filename} -> {file_path} ({stored.size} bytes{', deduplicated' if deduplicated else ''})")
+
+    # OCR runs in the background ingestion stage
+    return UploadedDocument(
+        filename=file.filename,
+        file_path=str(file_path),
+        category=safe_category,
+        file_type=file_extension.replace('.', ''),
+        file_size=stored.size,
+        content_hash=stored.sha256,
+        ocr_completed=0,
+        ocr_status="queued"
+    )
+
+
+def _upload_error(file: UploadFile, error: BaseException) -> dict:
+    if isinstance(error, FileTooLargeError):
+        status_code = 413
+    elif isinstance(error, UnsupportedFileTypeError):
+        status_code = 415
+    else:
+        status_code = 500
+    logger.warning(f"Upload of {file.filename} failed: {error}")
+    return {"filename": file.filename, "status_code": status_code, "error": str(error)}
+
+
 @router.post("/upload")
 async def upload_files(
     files: List[UploadFile] = File(...),
     category: str = Form("PreClaim"), # Expects form data
-    db: Session = Depends(get_db)
+    wait: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Upload multiple files (PDFs or images) and perform OCR.
-    Files are saved in subfolders based on 'category'.
+    Upload multiple files (PDFs or images) and queue them for OCR.
+    Files are saved concurrently to the content-addressed blob store, tagged with
+    'category', and recorded in a single commit. A file that fails is reported under 'errors' without
+    discarding the others. The response returns as soon as the files are stored
+    (OCR progress is reported by /upload/status), or, with wait=true, once OCR of
+    every file has finished.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
-    
+
+    safe_category = safe_category_name(category)
+
+    results = await asyncio.gather(
+        *(_store_upload(file, safe_category) for file in files),
+        return_exceptions=True
+    )
+
+    documents = []
+    errors = []
+    for file, result in zip(files, results):
+        if isinstance(result, BaseException):
+            errors.append(_upload_error(file, result))
+        else:
+            documents.append(result)
+
+    stored_errors = [e for e in errors if e["status_code"] != 415]
+    if not documents and stored_errors:
+        # Nothing was stored: report a single status like a one-file upload would
+        status_code = stored_errors[0]["status_code"] if len({e["status_code"] for e in stored_errors}) == 1 else 400
+        raise HTTPException(status_code=status_code, detail="; ".join(e["error"] for e in stored_errors))
+
     uploaded_files_info = []
-    
-    for file in files:
-        try:
-            # Validate file type
-            file_extension = Path(file.filename).suffix.lower()
-            allowed_extensions = ['.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff']
-            
-            if file_extension not in allowed_extensions:
-                logger.warning(f"Unsupported file type: {file.filename}")
-                continue
-            
-            # Use category subdirectory
-            # Sanitize category to prevent traversal
-            safe_category = "".join([c for c in category if c.isalnum()])
-            if not safe_category:
-                safe_category = "general"
-                
-            upload_dir = settings.UPLOAD_FOLDER / safe_category
-            upload_dir.mkdir(parents=True, exist_ok=True)
-
-            # Generate unique filename
-            unique_filename = f"{uuid.uuid4()}_{file.filename}"
-            file_path = upload_dir / unique_filename
-            
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            logger.info(f"File saved: {file_path}")
-            
-            print(f"Start processing file: {file.filename}...")
-            # Perform OCR
-            ocr_text = ocr_processor.process_document(str(file_path))
-            print(f"Finished processing file: {file.filename}")
-            print(f"--- OCR Extracted Text ({file.filename}) ---\n{ocr_text}\n---------------------------------------------")
-            
-            # Store in database
-            db_document = UploadedDocument(
-                filename=file.filename,
-                file_path=str(file_path),
-                file_type=file_extension.replace('.', ''),
-                ocr_text=json.dumps(ocr_text) if isinstance(ocr_text, dict) else ocr_text,
-                ocr_completed=1 if ocr_text else 0
-            )
-            db.add(db_document)
-            db.commit()
-            db.refresh(db_document)
-            
-            uploaded_files_info.append({
-                "id": db_document.id,
-                "filename": file.filename,
-                "file_type": db_document.file_type,
-                "ocr_completed": bool(db_document.ocr_completed),
-                "ocr_text_length": len(ocr_text) if ocr_text else 0
-            })
-            
-            logger.info(f"OCR completed for {file.filename}, text length: {len(ocr_text)}")
-            
-        except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
-    
+    try:
+        db.add_all(documents)
+        await db.flush()  # Assign ids without re-loading every row after the commit
+        uploaded_files_info = [
+            {
+                "id": document.id,
+                "filename": document.filename,
+                "file_type": document.file_type,
+                "file_size": document.file_size,
+                "sha256": document.content_hash,
+                "ocr_completed": False,
+                "ocr_status": "queued"
+            }
+            for document in documents
+        ]
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        # Blobs that other documents already reference are kept
+        file_paths = [document.file_path for document in documents]
+        for path in await db.run_sync(blob_store.release, file_paths):
+            path.unlink(missing_ok=True)
+        logger.error(f"Error saving uploaded documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error saving uploaded documents: {str(e)}")
+
+    for info, document in zip(uploaded_files_info, documents):
+        ingestion.enqueue(info["id"], document.file_path)
+
+    if wait and uploaded_files_info:
+        # OCR of the files runs concurrently on the ingestion pool, so this takes
+        # as long as the slowest file
+        document_ids = [info["id"] for info in uploaded_files_info]
+        await ingestion.wait_for(document_ids, timeout=settings.OCR_WAIT_TIMEOUT)
+        statuses = {status["id"]: status for status in await db.run_sync(document_statuses, document_ids)}
+        for info in uploaded_files_info:
+            status = statuses.get(info["id"])
+            if status:
+                info["ocr_completed"] = status["ocr_completed"]
+                info["ocr_status"] = status["status"]
+
     return {
         "success": True,
         "files_uploaded": len(uploaded_files_info),
-        "files": uploaded_files_info
+        "files": uploaded_files_info,
+        "errors": errors
     }
 
 
+def _parse_ids(ids: str) -> List[int]:
+    try:
+        return [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of document IDs")
+
+
+@router.get("/upload/status")
+async def get_upload_status(ids: str = Query(..., description="Comma-separated document IDs"), db: AsyncSession = Depends(get_async_db)):
+    """
+    Get OCR ingestion progress for uploaded documents.
+    Status is one of queued, processing, completed or failed.
+    """
+    document_ids = _parse_ids(ids)
+    return {"success": True, "documents": await db.run_sync(document_statuses, document_ids)}
+
+
+@router.get("/upload/status/stream")
+async def stream_upload_status(ids: str = Query(..., description="Comma-separated document IDs")):
+    """
+    Server-Sent Events feed of OCR ingestion progress.
+    Emits a 'document' event whenever a document's status changes and a final
+    'done' event once every document is completed or failed.
+    """
+    document_ids = _parse_ids(ids)
+
+    def load_statuses():
+        with SessionLocal() as db:
+            return document_statuses(db, document_ids)
+
+    async def events():
+        last_seen = {}
+        while True:
+            statuses = await asyncio.to_thread(load_statuses)
+            for status in statuses:
+                if last_seen.get(status["id"]) != status:
+                    last_seen[status["id"]] = status
+                    yield f"event: document\ndata: {json.dumps(status)}\n\n"
+            if all(status["status"] in TERMINAL_STATUSES for status in statuses):
+                yield f"event: done\ndata: {json.dumps({'documents': len(statuses)})}\n\n"
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @router.post("/upload/clear")
 async def clear_uploads(category: str = None):
     """
-    Clear files in the upload directory.
-    If category is provided, clears only that subdirectory.
+    Clear uploaded files and their database rows.
+    If category is provided, clears only that subdirectory. Runs off the event loop.
     """
     try:
-        folder = settings.UPLOAD_FOLDER
-        if not folder.exists():
+        if not settings.UPLOAD_FOLDER.exists():
             return {"success": True, "message": "Nothing to clear"}
 
-        if category:
-            safe_category = "".join([c for c in category if c.isalnum()])
-            target_dir = folder / safe_category
-            if target_dir.exists():
-                shutil.rmtree(target_dir)
-                target_dir.mkdir(parents=True, exist_ok=True)
-                logger.info(f"Cleared upload/category directory: {target_dir}")
-        else:
-            # Remove the directory and all its contents (legacy behavior or full reset)
-            shutil.rmtree(folder)
-            # Recreate the empty directory
-            folder.mkdir(parents=True, exist_ok=True)
-            logger.info(f"Cleared full upload directory: {folder}")
-            
-        return {"success": True, "message": "Upload directory cleared"}
+        safe_category = safe_category_name(category) if category else None
+        result = await asyncio.to_thread(retention.clear, safe_category)
+        logger.info(f"Cleared uploads ({safe_category or 'all'}): {result}")
+
+        return {
+            "success": True,
+            "message": "Upload directory cleared",
+            "files_deleted": result.files_deleted,
+            "rows_deleted": result.rows_deleted,
+            "bytes_reclaimed": result.bytes_reclaimed
+        }
     except Exception as e:
         logger.error(f"Error clearing upload directory: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error clearing uploads: {str(e)}")
 
 
+@router.get("/upload/retention")
+async def get_retention_metrics():
+    """Retention settings and sweeper metrics (runs, duration, files/rows/bytes reclaimed)."""
+    return {"success": True, "retention": retention.metrics_dict()}
+
+
+@router.post("/upload/retention/sweep")
+async def run_retention_sweep():
+    """Run a retention sweep now instead of waiting for the next scheduled one."""
+    result = await asyncio.to_thread(retention.sweep_once)
+    return {"success": True, "result": asdict(result), "retention": retention.metrics_dict()}
+
+
 @router.get("/upload/documents")
-async def get_documents(category: str = None, db: Session = Depends(get_db)):
+async def get_documents(
+    category: str = None,
+    limit: int = Query(200, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="Last (oldest) document id of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get list of files currently in the upload directory.
-    Recursively scans subfolders or specific category.
+    Get list of uploaded documents whose files are still on disk, newest first.
+    Served from a single indexed query with keyset pagination (pass the returned
+    next_cursor to get the following, older page), so a caller that only reads the
+    first page sees the latest uploads; file existence comes from the cached
+    upload manifest instead of a directory walk.
     """
     try:
-        folder = settings.UPLOAD_FOLDER
-        if not folder.exists():
-            return {"success": True, "files": []}
-            
-        # Helper to get files recursively
-        physical_files = []
-        # Using rglob to find all files in subfolders
-        # We need relative paths for checking against filename if logic preserved, 
-        # or simplified approach: just list everything.
-        
-        target_dirs = [folder]
+        query = select(
+            UploadedDocument.id,
+            UploadedDocument.filename,
+            UploadedDocument.file_path,
+            UploadedDocument.file_type,
+            UploadedDocument.ocr_completed
+        )
         if category:
-             safe_category = "".join([c for c in category if c.isalnum()])
-             target_dirs = [folder / safe_category]
-        
-        found_files = []
-        for d in target_dirs:
-            if d.exists():
-                # If checking root (recursive)
-                if d == folder:
-                     for f in d.rglob("*"):
-                         if f.is_file() and not f.name.endswith('.json'): # Skip session json
-                             found_files.append(f)
-                else:
-                     for f in d.glob("*"):
-                         if f.is_file() and not f.name.endswith('.json'):
-                            found_files.append(f)
-
-        if not found_files:
-            return {"success": True, "files": []}
-            
-        physical_filenames = [f.name for f in found_files]
-            
-        # Get metadata from DB for these files
-        documents = db.query(UploadedDocument).all()
-        
-        existing_docs = []
-        for doc in documents:
-            doc_path = Path(doc.file_path)
-            if doc_path.name in physical_filenames:
-                existing_docs.append({
-                    "id": doc.id,
-                    "filename": doc.filename,
-                    "file_type": doc.file_type,
-                    "ocr_completed": bool(doc.ocr_completed)
-                })
-                
-        return {"success": True, "files": existing_docs}
+            safe_category = safe_category_name(category)
+            query = query.where(UploadedDocument.category == safe_category)
+        if cursor is not None:
+            query = query.where(UploadedDocument.id < cursor)
+
+        rows = (await db.execute(query.order_by(UploadedDocument.id.desc()).limit(limit + 1))).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        on_disk = upload_manifest.existing(row.file_path for row in rows)
+        existing_docs = [
+            {
+                "id": row.id,
+                "filename": row.filename,
+                "file_type": row.file_type,
+                "ocr_completed": bool(row.ocr_completed)
+            }
+            for row in rows
+            if row.file_path in on_disk
+        ]
+
+        return {
+            "success": True,
+            "files": existing_docs,
+            "next_cursor": rows[-1].id if has_more else None
+        }
         
     except Exception as e:
         logger.error(f"Error listing documents: {str(e)}")
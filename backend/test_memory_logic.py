@@ -4,6 +4,14 @@ import os
 # Add backend directory to path so we can import modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import tempfile
+
+# Run against a throwaway database (TEST_DATABASE_URL to pick one): recording patterns
+# also adds to the analytics rollups, which deleting the test patterns doesn't undo
+_TEST_DIR = tempfile.mkdtemp(prefix="denial_tests_")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}")
+os.environ["PATTERN_INDEX_SIGNAL_FILE"] = os.path.join(_TEST_DIR, "pattern_index.signal")
+
 from database import SessionLocal, init_db, DenialPattern
 from utils.memory_graph import record_denial_pattern, get_pattern_suggestions
 import uuid
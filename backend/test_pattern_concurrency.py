@@ -0,0 +1,143 @@
+import sys
+import os
+
+# Add backend directory to path so we can import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+
+# Run against a throwaway database (TEST_DATABASE_URL to pick one): recording patterns
+# also adds to the analytics rollups, which deleting the test patterns doesn't undo
+_TEST_DIR = tempfile.mkdtemp(prefix="denial_tests_")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}")
+os.environ["PATTERN_INDEX_SIGNAL_FILE"] = os.path.join(_TEST_DIR, "pattern_index.signal")
+
+from concurrent.futures import ThreadPoolExecutor
+from database import SessionLocal, init_db, DenialPattern
+from utils.memory_graph import record_denial_pattern
+from utils.pattern_writer import PatternWriter
+import uuid
+
+WORKERS = 8
+RECORDS_PER_WORKER = 25
+
+
+def test_pattern_concurrency():
+    print("\n🧪 TESTING CONCURRENT DENIAL PATTERN RECORDING 🧪")
+    print("===========================================")
+
+    # 1. Setup DB
+    init_db()
+
+    # Generate random ID to avoid conflicts with existing real data
+    unique_id = str(uuid.uuid4())[:6]
+    test_insurance = f"TestIns_{unique_id}"
+    test_procedure = "MRI Lumbar"
+    test_denial = "CO-50"
+    expected = WORKERS * RECORDS_PER_WORKER
+
+    print(f"📝 {WORKERS} workers x {RECORDS_PER_WORKER} appeals for {test_insurance}/{test_denial}")
+
+    # 2. Every worker records the same pattern with its own session, as parallel appeals do
+    def worker(n):
+        db = SessionLocal()
+        try:
+            for i in range(RECORDS_PER_WORKER):
+                record_denial_pattern(
+                    db,
+                    insurance=test_insurance,
+                    procedure=test_procedure,
+                    cpt_code="72148",
+                    denial_code=test_denial,
+                    missing_docs=["PT Notes", f"Worker {n} Note"],
+                    resolved_by=["Added Neuro Exam"] if i % 2 else ["Peer Review"]
+                )
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(worker, range(WORKERS)))
+
+    # 3. Verify nothing was lost
+    db = SessionLocal()
+    rows = db.query(DenialPattern).filter(DenialPattern.insurance == test_insurance).all()
+    passed = True
+
+    if len(rows) != 1:
+        print(f"\n❌ FAILED. Expected 1 pattern row, found {len(rows)}")
+        passed = False
+    else:
+        pattern = rows[0]
+        expected_docs = {"PT Notes"} | {f"Worker {n} Note" for n in range(WORKERS)}
+        print(f"   Occurrence count: {pattern.occurrence_count} (expected {expected})")
+        print(f"   Missing docs: {len(pattern.missing_docs)} unique (expected {len(expected_docs)})")
+        print(f"   Resolved by: {sorted(pattern.resolved_by)}")
+        if pattern.occurrence_count != expected:
+            print(f"\n❌ FAILED. Lost {expected - pattern.occurrence_count} updates")
+            passed = False
+        if set(pattern.missing_docs) != expected_docs or len(pattern.missing_docs) != len(expected_docs):
+            print("\n❌ FAILED. Missing docs were not merged correctly")
+            passed = False
+        if set(pattern.resolved_by) != {"Added Neuro Exam", "Peer Review"}:
+            print("\n❌ FAILED. Resolutions were not merged correctly")
+            passed = False
+
+    if passed:
+        print("\n🎉 SUCCESS! No lost updates.")
+
+    # 4. Cleanup
+    print("\nCleanup")
+    db.query(DenialPattern).filter(DenialPattern.insurance == test_insurance).delete()
+    db.commit()
+    db.close()
+    print("   Test data removed.")
+    print("===========================================")
+    assert passed
+
+
+def test_pattern_writer():
+    print("\n🧪 TESTING WRITE-BEHIND PATTERN WRITER 🧪")
+    print("===========================================")
+    init_db()
+
+    test_insurance = f"TestIns_{str(uuid.uuid4())[:6]}"
+    expected = WORKERS * RECORDS_PER_WORKER
+    writer = PatternWriter(flush_interval=0.2, batch_size=50)
+
+    # Submitting only queues; the writer thread batches the upserts
+    def worker(n):
+        for i in range(RECORDS_PER_WORKER):
+            writer.submit(
+                insurance=test_insurance,
+                procedure="MRI Lumbar" if i % 2 else "CT Abdomen",
+                cpt_code="72148",
+                denial_code="CO-50",
+                missing_docs=[f"Worker {n} Note"],
+                resolved_by=["Peer Review"]
+            )
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(worker, range(WORKERS)))
+    drained = writer.flush(timeout=30)
+    writer.stop()
+    metrics = writer.metrics()
+    print(f"   Batches: {metrics['batches']}   avg flush {metrics['avg_flush_ms']}ms   queue depth {metrics['queue_depth']}")
+
+    db = SessionLocal()
+    rows = db.query(DenialPattern).filter(DenialPattern.insurance == test_insurance).all()
+    total = sum(row.occurrence_count for row in rows)
+    print(f"   Patterns: {len(rows)} (expected 2)   Occurrences: {total} (expected {expected})")
+    passed = drained and len(rows) == 2 and total == expected and metrics["written"] == expected
+    print("\n🎉 SUCCESS! Every queued observation was written." if passed else "\n❌ FAILED. Observations were lost")
+
+    db.query(DenialPattern).filter(DenialPattern.insurance == test_insurance).delete()
+    db.commit()
+    db.close()
+    print("   Test data removed.")
+    print("===========================================")
+    assert passed
+
+
+if __name__ == "__main__":
+    test_pattern_concurrency()
+    test_pattern_writer()
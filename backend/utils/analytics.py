@@ -0,0 +1,251 @@
+"""
+Incrementally maintained analytics rollups.
+
+Writers add to running totals in the analytics_rollups table inside their own
+transaction: denial pattern observations (utils/memory_graph.py) and analysis
+results (routes/analyze.py). The dashboard reads a bounded number of rollup rows
+instead of scanning denial_patterns or reasoning_results, so it costs the same
+however much history there is.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import AnalyticsRollup, DenialPattern, ReasoningResult
+
+logger = logging.getLogger(__name__)
+
+# Rollup metrics (AnalyticsRollup.metric)
+DENIALS_TOTAL = "denials_total"
+DENIALS_BY_INSURER = "denials_by_insurer"
+DENIALS_BY_CODE = "denials_by_code"
+DENIALS_BY_WEEK = "denials_by_week"
+MISSING_DOCS = "missing_docs"
+ANALYSES_BY_TYPE = "analyses_by_type"
+ANALYSES_BY_WEEK = "analyses_by_week"
+RISK_TOTAL = "risk_total"
+RISK_BY_WEEK = "risk_by_week"
+MISSING_REQUIREMENTS = "missing_requirements"
+# Marker row claimed by the worker that seeds rollups from history (see backfill_rollups)
+ROLLUPS_SEEDED = "rollups_seeded"
+
+ALL = "all"
+MAX_BUCKET_LENGTH = 200
+
+# (metric, bucket) -> (count, value_sum)
+Increments = Dict[Tuple[str, str], Tuple[int, float]]
+
+
+def week_bucket(when: Optional[datetime]) -> str:
+    """ISO week label, e.g. 2024-W35 (sorts chronologically)."""
+    year, week, _ = (when or datetime.utcnow()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _label(value) -> Optional[str]:
+    if isinstance(value, dict):
+        value = value.get("requirement") or value.get("item") or value.get("name") or value.get("description")
+    text = " ".join(str(value).split()) if value is not None else ""
+    return text[:MAX_BUCKET_LENGTH] or None
+
+
+def _add(increments: Increments, metric: str, bucket, count: int = 1, value: float = 0.0):
+    label = _label(bucket)
+    if label is None:
+        return
+    current_count, current_value = increments.get((metric, label), (0, 0.0))
+    increments[(metric, label)] = (current_count + count, current_value + value)
+
+
+def denial_increments(observations: Iterable[dict]) -> Increments:
+    """Rollup increments for denial pattern observations (utils.memory_graph.pattern_values dicts)."""
+    increments: Increments = {}
+    for values in observations:
+        count = values.get("occurrence_count", 1)
+        _add(increments, DENIALS_TOTAL, ALL, count)
+        _add(increments, DENIALS_BY_INSURER, values["insurance"], count)
+        _add(increments, DENIALS_BY_CODE, values["denial_code"], count)
+        _add(increments, DENIALS_BY_WEEK, week_bucket(values.get("last_seen")), count)
+        for doc in values.get("missing_docs") or ():
+            _add(increments, MISSING_DOCS, doc, count)
+    return increments
+
+
+def analysis_increments(
+    analysis_type: str,
+    risk_score,
+    missing_requirements: Iterable,
+    when: Optional[datetime] = None
+) -> Increments:
+    """Rollup increments for one stored analysis (ReasoningResult)."""
+    increments: Increments = {}
+    week = week_bucket(when)
+    _add(increments, ANALYSES_BY_TYPE, analysis_type or "unknown")
+    _add(increments, ANALYSES_BY_WEEK, week)
+    # Only pre-claim analyses produce a risk score; others store 0
+    if analysis_type == "pre_claim":
+        try:
+            score = float(risk_score)
+        except (TypeError, ValueError):
+            score = None
+        if score is not None:
+            _add(increments, RISK_TOTAL, ALL, 1, score)
+            _add(increments, RISK_BY_WEEK, week, 1, score)
+    for requirement in missing_requirements or ():
+        _add(increments, MISSING_REQUIREMENTS, requirement)
+    return increments
+
+
+def apply_increments(db: Session, increments: Increments):
+    """
+    Add increments to the rollup rows in the caller's transaction (not committed
+    here). Uses INSERT ... ON CONFLICT DO UPDATE so concurrent writers add up.
+    """
+    if not increments:
+        return
+    now = datetime.utcnow()
+    # Sorted so concurrent writers lock rows in the same order
+    rows = [
+        {"metric": metric, "bucket": bucket, "count": count, "value_sum": value, "updated_at": now}
+        for (metric, bucket), (count, value) in sorted(increments.items())
+    ]
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name in ("sqlite", "postgresql"):
+        if dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        # Chunked so each statement stays under the bound parameter limit
+        for start in range(0, len(rows), 500):
+            stmt = insert(AnalyticsRollup).values(rows[start:start + 500])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[AnalyticsRollup.metric, AnalyticsRollup.bucket],
+                set_={
+                    "count": AnalyticsRollup.count + stmt.excluded.count,
+                    "value_sum": AnalyticsRollup.value_sum + stmt.excluded.value_sum,
+                    "updated_at": stmt.excluded.updated_at,
+                }
+            )
+            db.execute(stmt)
+        return
+
+    for row in rows:
+        existing = db.query(AnalyticsRollup).filter(
+            AnalyticsRollup.metric == row["metric"], AnalyticsRollup.bucket == row["bucket"]
+        ).with_for_update().first()
+        if existing is None:
+            db.add(AnalyticsRollup(**row))
+        else:
+            existing.count += row["count"]
+            existing.value_sum += row["value_sum"]
+            existing.updated_at = now
+    db.flush()
+
+
+def _top(db: Session, metric: str, limit: int) -> List[dict]:
+    rows = db.query(AnalyticsRollup.bucket, AnalyticsRollup.count).filter(
+        AnalyticsRollup.metric == metric
+    ).order_by(AnalyticsRollup.count.desc(), AnalyticsRollup.bucket).limit(limit).all()
+    return [{"name": bucket, "count": count} for bucket, count in rows]
+
+
+def _recent(db: Session, metric: str, weeks: int) -> Dict[str, Tuple[int, float]]:
+    rows = db.query(AnalyticsRollup.bucket, AnalyticsRollup.count, AnalyticsRollup.value_sum).filter(
+        AnalyticsRollup.metric == metric
+    ).order_by(AnalyticsRollup.bucket.desc()).limit(weeks).all()
+    return {bucket: (count, value) for bucket, count, value in rows}
+
+
+def _single(db: Session, metric: str) -> Tuple[int, float]:
+    row = db.query(AnalyticsRollup.count, AnalyticsRollup.value_sum).filter(
+        AnalyticsRollup.metric == metric, AnalyticsRollup.bucket == ALL
+    ).first()
+    return (row.count, row.value_sum) if row else (0, 0.0)
+
+
+def get_analytics(db: Session, limit: int = 10, weeks: int = 12) -> dict:
+    """
+    Dashboard view of the rollups: totals, top insurers/codes/missing items and
+    the last `weeks` weeks. Reads at most a fixed number of rollup rows.
+    """
+    denials, _ = _single(db, DENIALS_TOTAL)
+    risk_count, risk_sum = _single(db, RISK_TOTAL)
+
+    denial_weeks = _recent(db, DENIALS_BY_WEEK, weeks)
+    analysis_weeks = _recent(db, ANALYSES_BY_WEEK, weeks)
+    risk_weeks = _recent(db, RISK_BY_WEEK, weeks)
+    by_week = []
+    for week in sorted(set(denial_weeks) | set(analysis_weeks), reverse=True)[:weeks]:
+        scored, score_sum = risk_weeks.get(week, (0, 0.0))
+        by_week.append({
+            "week": week,
+            "denials": denial_weeks.get(week, (0, 0.0))[0],
+            "analyses": analysis_weeks.get(week, (0, 0.0))[0],
+            "average_risk_score": round(score_sum / scored, 2) if scored else None
+        })
+
+    analyses_by_type = {row["name"]: row["count"] for row in _top(db, ANALYSES_BY_TYPE, limit)}
+    return {
+        "totals": {
+            "denials": denials,
+            "analyses": sum(analyses_by_type.values()),
+            "average_risk_score": round(risk_sum / risk_count, 2) if risk_count else None
+        },
+        "analyses_by_type": analyses_by_type,
+        "by_insurer": _top(db, DENIALS_BY_INSURER, limit),
+        "by_denial_code": _top(db, DENIALS_BY_CODE, limit),
+        "by_week": by_week,
+        "top_missing_requirements": _top(db, MISSING_REQUIREMENTS, limit),
+        "top_missing_docs": _top(db, MISSING_DOCS, limit),
+    }
+
+
+def backfill_rollups(db: Session) -> bool:
+    """
+    Seed empty rollups from existing history (once, for databases created before
+    rollups existed). Pattern rows only keep their last_seen, so their whole count
+    lands in that week.
+
+    Workers starting together would each add the history; the seed is claimed by
+    inserting a marker row in the same transaction, and the unique (metric, bucket)
+    index lets only one worker's insert succeed.
+
+    Returns:
+        True if rollups were seeded
+    """
+    if db.query(AnalyticsRollup.id).first() is not None:
+        return False
+    try:
+        db.add(AnalyticsRollup(metric=ROLLUPS_SEEDED, bucket=ALL, count=1, value_sum=0.0))
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        logger.info("Analytics rollups are being seeded by another worker")
+        return False
+    increments: Increments = {}
+    for row in db.query(
+        DenialPattern.insurance, DenialPattern.denial_code, DenialPattern.missing_docs,
+        DenialPattern.occurrence_count, DenialPattern.last_seen
+    ).yield_per(1000):
+        for key, (count, value) in denial_increments([row._asdict()]).items():
+            current = increments.get(key, (0, 0.0))
+            increments[key] = (current[0] + count, current[1] + value)
+    for row in db.query(
+        ReasoningResult.reasoning_type, ReasoningResult.denial_risk_score,
+        ReasoningResult.missing_requirements, ReasoningResult.created_at
+    ).yield_per(1000):
+        for key, (count, value) in analysis_increments(
+            row.reasoning_type, row.denial_risk_score, row.missing_requirements, row.created_at
+        ).items():
+            current = increments.get(key, (0, 0.0))
+            increments[key] = (current[0] + count, current[1] + value)
+    if not increments:
+        db.rollback()
+        return False
+    apply_increments(db, increments)
+    db.commit()
+    logger.info(f"Seeded {len(increments)} analytics rollup rows from history")
+    return True
@@ -0,0 +1,133 @@
+"""
+Content-addressed storage for uploaded files.
+
+Files are stored once per content under UPLOAD_FOLDER/.blobs/ab/cd/<sha256><ext>
+(two levels of hash sharding keep every directory small). Identical uploads share
+one blob and UploadedDocument.file_path points at it; the rows referencing a blob
+act as its reference count, so a blob is only deleted with its last row. Old
+blobs may be archived as <name>.zst/.gz (see utils/retention.py); readers go
+through BlobStore.readable().
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+import logging
+import os
+import time
+import uuid
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import UploadedDocument
+from utils.compression import archive_path, decompress_file, original_path
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """Hash-sharded blob directory with reference-counted deletes."""
+
+    def __init__(self, root: Path, grace_seconds: float = 3600):
+        self.root = root
+        self.tmp_dir = root / "tmp"
+        # Blobs written or reused this recently may be about to gain a reference
+        # from an upload whose row is not committed yet, so deletes skip them
+        self.grace_seconds = grace_seconds
+
+    def path_for(self, sha256: str, extension: str) -> Path:
+        """Blob path for a content hash. The extension is kept because OCR dispatches on it."""
+        return self.root / sha256[:2] / sha256[2:4] / f"{sha256}{extension.lower()}"
+
+    def temp_path(self, extension: str = "") -> Path:
+        """Fresh path to stream an upload into before its hash is known (same filesystem as the blobs)."""
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        return self.tmp_dir / f"{uuid.uuid4().hex}{extension.lower()}"
+
+    def commit(self, temp_file: Path, sha256: str, extension: str) -> Tuple[Path, bool]:
+        """
+        Move a fully written temp file into the store.
+
+        Returns:
+            Tuple of (blob path, True if an identical blob already existed and was reused)
+        """
+        blob = self.path_for(sha256, extension)
+        existing = blob if blob.exists() else archive_path(blob)
+        if existing is not None:
+            temp_file.unlink(missing_ok=True)
+            # Touch so orphan collection does not race a new reference to an old blob
+            os.utime(existing)
+            return blob, True
+
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_file, blob)
+        return blob, False
+
+    def is_blob(self, file_path: str) -> bool:
+        return Path(file_path).is_relative_to(self.root)
+
+    def release(self, db: Session, file_paths: Iterable[str]) -> List[Path]:
+        """
+        Return the paths that can be deleted now that their rows are gone: legacy
+        per-upload files always, blobs only when no remaining row references them
+        (recently used blobs are left for orphan collection). Archived files are
+        reported under their original name.
+        """
+        file_paths = {str(original_path(Path(path))) for path in file_paths}
+        blobs = {path for path in file_paths if self.is_blob(path)}
+        referenced = set()
+        if blobs:
+            # The blob name is the content hash, so this is served by the content_hash index
+            hashes = [Path(path).name.split(".")[0] for path in blobs]
+            referenced = {row.file_path for row in db.query(UploadedDocument.file_path).filter(
+                UploadedDocument.content_hash.in_(hashes),
+                UploadedDocument.file_path.in_(blobs)
+            )}
+        recent = time.time() - self.grace_seconds
+        releasable = []
+        for path in file_paths:
+            if path in referenced:
+                continue
+            if path in blobs:
+                current = Path(path) if os.path.exists(path) else archive_path(Path(path))
+                if current is None or current.stat().st_mtime >= recent:
+                    continue
+            releasable.append(Path(path))
+        return releasable
+
+    @contextmanager
+    def readable(self, file_path: str) -> Iterator[str]:
+        """
+        Yield a path with the file's original content, decompressing an archived
+        file to a temporary copy (removed afterwards) when needed.
+        """
+        path = Path(file_path)
+        archived = None if path.exists() else archive_path(path)
+        if archived is None:
+            yield file_path
+            return
+
+        temp_file = self.temp_path(path.suffix)
+        try:
+            decompress_file(archived, temp_file)
+            yield str(temp_file)
+        finally:
+            temp_file.unlink(missing_ok=True)
+
+    def iter_stale(self) -> Iterable[Path]:
+        """Yield blob (and leftover temp) files not written or reused within the grace period."""
+        if not self.root.exists():
+            return
+        cutoff = time.time() - self.grace_seconds
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = Path(directory) / name
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        yield path
+                except FileNotFoundError:
+                    continue
+
+
+# Global blob store instance
+blob_store = BlobStore(settings.UPLOAD_FOLDER / ".blobs", settings.BLOB_GRACE_SECONDS)
@@ -0,0 +1,213 @@
+"""
+Resumable chunked uploads.
+
+Protocol: init -> PUT chunk at offset (repeat, resuming from the stored offset
+after a failure) -> finalize. Chunks are written in place into a .part file
+under UPLOAD_FOLDER/.chunked and hashed as they arrive, so finalizing only
+moves the file to the given destination (the blob store's temp area, from which
+routes/chunked_upload.py commits it like a regular upload) without re-reading it.
+"""
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+import aiofiles
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkedUploadError(Exception):
+    """Protocol error, carrying the HTTP status code to report."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ChunkedUploadStore:
+    """Keeps in-progress uploads on disk with a small JSON metadata file each."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        # upload_id -> (offset, running sha256); rebuilt from the .part file when missing
+        self._hashes: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _part_path(self, upload_id: str) -> Path:
+        return self.root / f"{upload_id}.part"
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.root / f"{upload_id}.json"
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(upload_id, asyncio.Lock())
+
+    async def _save_meta(self, meta: dict):
+        tmp_path = self._meta_path(meta["upload_id"]).with_suffix(".json.tmp")
+        async with aiofiles.open(tmp_path, "w") as f:
+            await f.write(json.dumps(meta))
+        os.replace(tmp_path, self._meta_path(meta["upload_id"]))
+
+    async def status(self, upload_id: str) -> dict:
+        """Return the upload's metadata, including the offset to resume from."""
+        # upload ids are hex uuids; anything else cannot name a file in the store
+        if not upload_id.isalnum():
+            raise ChunkedUploadError("Unknown upload id", 404)
+        try:
+            async with aiofiles.open(self._meta_path(upload_id), "r") as f:
+                return json.loads(await f.read())
+        except FileNotFoundError:
+            raise ChunkedUploadError("Unknown upload id", 404)
+
+    async def init(self, filename: str, category: str, total_size: int, sha256: Optional[str] = None) -> dict:
+        """Start a new upload and create its empty .part file."""
+        if total_size <= 0:
+            raise ChunkedUploadError("total_size must be positive")
+        if total_size > settings.MAX_CHUNKED_UPLOAD_SIZE:
+            raise ChunkedUploadError(
+                f"File exceeds the maximum size of {settings.MAX_CHUNKED_UPLOAD_SIZE // (1024 * 1024)}MB", 413
+            )
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        meta = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "category": category,
+            "total_size": total_size,
+            "sha256": sha256.lower() if sha256 else None,
+            "offset": 0,
+            "created_at": time.time()
+        }
+        async with aiofiles.open(self._part_path(upload_id), "wb"):
+            pass
+        await self._save_meta(meta)
+        self._hashes[upload_id] = (0, hashlib.sha256())
+        return meta
+
+    async def _running_hash(self, upload_id: str, offset: int) -> "hashlib._Hash":
+        cached = self._hashes.get(upload_id)
+        if cached is not None and cached[0] == offset:
+            return cached[1]
+
+        # Resumed after a restart (or on another worker): hash what was received so far once
+        def rehash():
+            digest = hashlib.sha256()
+            remaining = offset
+            with open(self._part_path(upload_id), "rb") as f:
+                while remaining:
+                    block = f.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        break
+                    digest.update(block)
+                    remaining -= len(block)
+            return digest
+
+        logger.info(f"Rebuilding running hash for chunked upload {upload_id} at offset {offset}")
+        return await asyncio.to_thread(rehash)
+
+    async def write_chunk(
+        self,
+        upload_id: str,
+        offset: int,
+        body: AsyncIterator[bytes],
+        chunk_sha256: Optional[str] = None
+    ) -> dict:
+        """
+        Write one chunk at `offset`, which must equal the bytes received so far.
+
+        The chunk is buffered (bounded by MAX_UPLOAD_CHUNK_SIZE) and verified against
+        chunk_sha256, if given, before anything is written.
+        """
+        async with self._lock(upload_id):
+            meta = await self.status(upload_id)
+            if offset != meta["offset"]:
+                raise ChunkedUploadError(f"Expected offset {meta['offset']}, got {offset}", 409)
+
+            data = bytearray()
+            async for piece in body:
+                data.extend(piece)
+                if len(data) > settings.MAX_UPLOAD_CHUNK_SIZE:
+                    raise ChunkedUploadError(
+                        f"Chunk exceeds the maximum chunk size of {settings.MAX_UPLOAD_CHUNK_SIZE // (1024 * 1024)}MB", 413
+                    )
+                if offset + len(data) > meta["total_size"]:
+                    raise ChunkedUploadError("Chunk extends past the declared total_size", 413)
+            if not data:
+                raise ChunkedUploadError("Empty chunk")
+            if chunk_sha256 and hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+                raise ChunkedUploadError("Chunk checksum mismatch", 422)
+
+            running = await self._running_hash(upload_id, offset)
+            async with aiofiles.open(self._part_path(upload_id), "r+b") as out:
+                await out.seek(offset)
+                await out.write(bytes(data))
+                # Drop anything left past this chunk by an earlier interrupted write
+                await out.truncate(offset + len(data))
+
+            running.update(data)
+            meta["offset"] = offset + len(data)
+            self._hashes[upload_id] = (meta["offset"], running)
+            await self._save_meta(meta)
+            return meta
+
+    async def finalize(self, upload_id: str, destination: Path) -> Tuple[dict, str]:
+        """
+        Complete an upload and move its file to `destination`.
+
+        Returns:
+            Tuple of (metadata, sha256 hex digest of the whole file)
+        """
+        async with self._lock(upload_id):
+            meta = await self.status(upload_id)
+            if meta["offset"] != meta["total_size"]:
+                raise ChunkedUploadError(
+                    f"Upload incomplete: {meta['offset']} of {meta['total_size']} bytes received", 409
+                )
+
+            digest = (await self._running_hash(upload_id, meta["offset"])).hexdigest()
+            if meta["sha256"] and digest != meta["sha256"]:
+                await self.abort(upload_id)
+                raise ChunkedUploadError("File checksum mismatch; upload discarded", 422)
+
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._part_path(upload_id), destination)
+            self._meta_path(upload_id).unlink(missing_ok=True)
+            self._hashes.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+        return meta, digest
+
+    async def abort(self, upload_id: str):
+        """Discard an in-progress upload."""
+        self._part_path(upload_id).unlink(missing_ok=True)
+        self._meta_path(upload_id).unlink(missing_ok=True)
+        self._hashes.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+
+    def purge_stale(self, max_age_seconds: float) -> int:
+        """Remove uploads that were started more than max_age_seconds ago. Returns the count."""
+        if not self.root.exists():
+            return 0
+        cutoff = time.time() - max_age_seconds
+        purged = 0
+        for meta_path in self.root.glob("*.json"):
+            if meta_path.stat().st_mtime < cutoff:
+                upload_id = meta_path.stem
+                self._part_path(upload_id).unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+                self._hashes.pop(upload_id, None)
+                self._locks.pop(upload_id, None)
+                purged += 1
+        return purged
+
+
+# Global chunked upload store
+chunked_uploads = ChunkedUploadStore(settings.UPLOAD_FOLDER / ".chunked")
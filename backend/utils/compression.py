@@ -0,0 +1,128 @@
+"""
+Compression helpers for stored text, JSON and archived files.
+
+zstd is used when the optional `zstandard` package is installed, zlib otherwise.
+Compressed column values are tagged with a marker naming the codec, so values
+written before compression (or with the other codec) still decode on read.
+"""
+from pathlib import Path
+from typing import Optional
+import base64
+import gzip
+import logging
+import shutil
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Column values: MARKER + codec id + base64 payload. The record separator control
+# character never starts OCR text or JSON, so untagged values are plain.
+MARKER = "\x1e"
+ZLIB, ZSTD = "z", "s"
+
+ARCHIVE_SUFFIXES = (".zst", ".gz")
+# Formats that are compressed already; archiving them would read them only to keep them
+INCOMPRESSIBLE_EXTENSIONS = frozenset({".pdf", ".jpg", ".jpeg", ".png", ".tif", ".tiff", ".gif", ".webp", ".zip"})
+
+
+def default_codec() -> str:
+    return ZSTD if zstandard is not None else ZLIB
+
+
+def compress_bytes(data: bytes, codec: Optional[str] = None) -> bytes:
+    codec = codec or default_codec()
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decompress_bytes(data: bytes, codec: str) -> bytes:
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Value was compressed with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def is_compressed(value) -> bool:
+    return isinstance(value, str) and value.startswith(MARKER)
+
+
+def compress_text(text: str, min_size: int = 0) -> str:
+    """
+    Compress text into a tagged string. Values shorter than min_size bytes, or that
+    do not shrink, are returned unchanged.
+    """
+    raw = text.encode("utf-8")
+    if len(raw) < min_size:
+        return text
+    codec = default_codec()
+    packed = MARKER + codec + base64.b64encode(compress_bytes(raw, codec)).decode("ascii")
+    return packed if len(packed) < len(raw) else text
+
+
+def decompress_text(value: str) -> str:
+    """Decode a value produced by compress_text; untagged values are returned as-is."""
+    if not is_compressed(value):
+        return value
+    return decompress_bytes(base64.b64decode(value[2:]), value[1]).decode("utf-8")
+
+
+def original_path(path: Path) -> Path:
+    """The uncompressed name of a possibly archived file."""
+    for suffix in ARCHIVE_SUFFIXES:
+        if path.name.endswith(suffix):
+            return path.with_name(path.name[:-len(suffix)])
+    return path
+
+
+def archive_path(path: Path) -> Optional[Path]:
+    """The compressed sibling of a file, if one exists."""
+    for suffix in ARCHIVE_SUFFIXES:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def compress_file(path: Path, min_ratio: float = 0.9) -> Optional[Path]:
+    """
+    Replace a file with a compressed copy (<name>.zst or <name>.gz) when that saves
+    enough space; already-compressed formats such as most PDFs and JPEGs usually don't
+    (callers skip INCOMPRESSIBLE_EXTENSIONS without reading them).
+
+    Returns:
+        Path of the compressed file, or None if the original was kept
+    """
+    data = path.read_bytes()
+    if zstandard is not None:
+        packed, target = compress_bytes(data, ZSTD), path.with_name(path.name + ".zst")
+    else:
+        packed, target = gzip.compress(data, 6), path.with_name(path.name + ".gz")
+    if not data or len(packed) > len(data) * min_ratio:
+        return None
+
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(packed)
+    # Keep the original timestamps so age-based retention is unaffected
+    shutil.copystat(path, tmp)
+    tmp.replace(target)
+    path.unlink()
+    return target
+
+
+def decompress_file(archived: Path, destination: Path):
+    """Write the original content of an archived file to destination."""
+    if archived.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"{archived} is zstd-compressed but the zstandard package is not installed")
+        with open(archived, "rb") as src, open(destination, "wb") as dst:
+            zstandard.ZstdDecompressor().copy_stream(src, dst)
+    else:
+        with gzip.open(archived, "rb") as src, open(destination, "wb") as dst:
+            shutil.copyfileobj(src, dst)
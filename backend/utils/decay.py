@@ -0,0 +1,46 @@
+"""
+Exponentially time-decayed pattern scores.
+
+A pattern's score is the sum over its observations of 2 ** (-age / half-life),
+so last week's denials outweigh a payer policy from two years ago. Decaying every
+row on every write (or on a timer) would rewrite the whole table; instead each
+row stores its decay_weight relative to a fixed epoch ("forward decay"):
+
+    decay_weight = sum of 2 ** ((observed_at - DECAY_EPOCH) / half_life)
+    score(now)   = decay_weight * 2 ** (-(now - DECAY_EPOCH) / half_life)
+
+An observation only ever adds to decay_weight, which the upsert does in SQL, and
+all rows are scaled by the same factor at read time, so ordering by decay_weight
+is ordering by decayed score. "Score below x" is the indexed range
+decay_weight < x * 2 ** ((now - DECAY_EPOCH) / half_life).
+
+With a 90-day half-life the weights stay inside float range for about 250 years
+past the epoch (shorter half-lives shorten that proportionally).
+"""
+from datetime import datetime
+from typing import Optional
+
+from config import settings
+
+DECAY_EPOCH = datetime(2024, 1, 1)
+SECONDS_PER_DAY = 86400
+
+
+def _half_lives(when: datetime, half_life_days: Optional[float] = None) -> float:
+    half_life = (half_life_days or settings.PATTERN_HALF_LIFE_DAYS) * SECONDS_PER_DAY
+    return (when - DECAY_EPOCH).total_seconds() / half_life
+
+
+def decay_weight(count: float, when: Optional[datetime] = None, half_life_days: Optional[float] = None) -> float:
+    """Stored weight of `count` observations made at `when` (default now)."""
+    return count * 2.0 ** _half_lives(when or datetime.utcnow(), half_life_days)
+
+
+def decayed_score(weight: Optional[float], now: Optional[datetime] = None, half_life_days: Optional[float] = None) -> float:
+    """Decayed score at `now` of a stored weight (1.0 = one observation made just now)."""
+    return (weight or 0.0) * 2.0 ** -_half_lives(now or datetime.utcnow(), half_life_days)
+
+
+def weight_cutoff(min_score: float, now: Optional[datetime] = None, half_life_days: Optional[float] = None) -> float:
+    """Stored weight below which a pattern's decayed score is under min_score."""
+    return decay_weight(min_score, now, half_life_days)
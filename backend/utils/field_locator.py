@@ -0,0 +1,168 @@
+"""
+Key-value region locator for OCR output.
+Finds the lines around field labels (e.g. "Denial Code", "CPT", "Amount") so the
+extractor prompt only carries the parts of a document that hold the fields.
+"""
+import re
+from typing import List, Dict, Optional, Tuple
+
+from ocr.layout import OCRLayout
+
+# Field name -> (label patterns, extra lines to keep after the label line)
+# Narrative fields keep a few following lines; key-value fields only need the value next to the label.
+# Patterns are listed from the most to the least specific: a line matching an earlier
+# pattern is a better place to look for the field, and is kept first when text runs short.
+FIELD_LABELS: Dict[str, Tuple[List[str], int]] = {
+    "patient_name": ([r"\bpatient name\b", r"\bmember( name)?\s*:", r"\bpatient\s*:", r"\bname\s*:"], 1),
+    "provider": ([r"\bprovider( name)?\s*:", r"\b(rendering|treating|attending) (provider|physician)\b", r"\bclinic\b", r"\bhospital\b", r"\bphysician\b"], 1),
+    "date_of_service": ([r"date of service", r"\bdos\b", r"service date"], 1),
+    "dates": ([r"date of (service|denial|notice|visit|admission|birth)", r"\b(service|letter|notice|claim|visit|admission|denial|appeal) date\b", r"\bdate\s*:"], 1),
+    "cpt_code": ([r"\bcpt\b", r"procedure code", r"\bhcpcs\b"], 1),
+    "procedure": ([r"\bprocedure( name)?\s*:", r"\bservice( description)?\s*:", r"\bprocedure\b", r"\bservice\b"], 1),
+    "procedure_name": ([r"\bprocedure( name)?\s*:", r"\bservice( description)?\s*:", r"\bdescription\s*:", r"\bprocedure\b", r"\bservice\b"], 1),
+    "recommended_procedure": ([r"\brecommend", r"\bplan\b", r"\bordered\b", r"\breferral\b"], 2),
+    "amount_charged": ([r"\b(total )?charges?\s*:", r"\b(billed|charged|total) amount\b", r"\bamount (charged|billed|due)\b", r"\bamount\s*:", r"\b(total|balance)( due)?\s*[:$]"], 1),
+    "amount_billed": ([r"\b(billed|charged) amount\b", r"\bamount (billed|charged)\b", r"\bbilled\b", r"\bamount\s*:", r"\bcharges?\s*:"], 1),
+    "allowed_amount": ([r"\ballowed\b"], 1),
+    "paid_amount": ([r"\bpaid\b", r"\bpayment\b"], 1),
+    "patient_responsibility": ([r"patient responsibility", r"you (may )?owe", r"\bdeductible\b", r"\bco-?pay\b", r"\bcoinsurance\b"], 1),
+    "adjustment_code": ([r"\badjustment\b", r"\bcarc\b", r"group code", r"\b(?:CO|PR|OA|PI|CR)-?\s?\d{1,3}\b"], 1),
+    "denial_code": ([r"denial code", r"reason code", r"\bcarc\b", r"\b(?:CO|PR|OA|PI|CR)-?\s?\d{1,3}\b"], 1),
+    "denial_reason": ([r"\breason\b", r"\bdenied\b", r"\bdenial\b", r"not (been )?approved", r"medically necessary"], 3),
+    "policy_excerpt": ([r"\bpolicy\b", r"\bguideline", r"\bcriteria\b", r"\bcoverage\b"], 3),
+    "missing_documentation": ([
+        r"\bmissing\b",
+        r"\b(documentation|records?|information|notes)\b.{0,30}\b(required|needed|not (been )?(received|provided|submitted))\b",
+        r"\b(submit|provide)\b.{0,40}\b(documentation|records?|notes|reports?)\b",
+        r"\bdocumentation\b"
+    ], 3),
+    "appeal_deadline": ([r"\bappeal\b", r"\bdeadline\b", r"within \d+ days"], 1),
+    "diagnosis": ([r"\bdiagnos", r"\bimpression\b", r"\bassessment\b"], 2),
+    "icd_code": ([r"\bicd\b", r"diagnosis code", r"\b[A-Z]\d{2}\.\d{1,4}\b"], 1),
+    "symptoms": ([r"\bsymptom", r"chief complaint", r"\bhistory\b", r"\bpresents?\b"], 3),
+    "conservative_treatments": ([r"\bconservative\b", r"physical therapy", r"\bpt\b", r"\bmedication", r"\bnsaid", r"\binjection"], 3),
+}
+
+# Lines at the top of the first page usually name the issuer (insurer, clinic) and are always kept
+HEADER_LINES = 5
+
+# Two boxes are on the same row if their vertical overlap covers this share of the shorter box
+SAME_ROW_OVERLAP = 0.5
+
+
+def locate_field_regions(
+    ocr_text: str,
+    fields: List[str],
+    layout: Optional[OCRLayout] = None,
+    max_chars: int = 3000
+) -> str:
+    """
+    Select the OCR lines that are likely to hold the given fields.
+
+    With a layout, values are found geometrically: lines on the same row to the
+    right of a label and the line directly below it. Without one, the lines that
+    follow the label in reading order are used.
+
+    The text budget is shared between the fields: each field's regions are ranked
+    by how specific the matching label is, and fields take turns adding their next
+    best region, so a long document can't spend max_chars on the first fields'
+    labels and leave nothing for the rest.
+
+    Args:
+        ocr_text: Plain OCR text (used when no layout is available)
+        fields: Field names to locate (keys of FIELD_LABELS)
+        layout: OCR layout with boxes, if available
+        max_chars: Upper bound on the returned text length
+
+    Returns:
+        Selected lines in document order, or "" if no label was found
+    """
+    if layout is None or not len(layout):
+        layout = OCRLayout()
+        for line in (ocr_text or "").splitlines():
+            if line.strip():
+                layout.append(line.strip())
+
+    field_patterns = {
+        field: [re.compile(label, re.IGNORECASE) for label in FIELD_LABELS[field][0]]
+        for field in fields if field in FIELD_LABELS
+    }
+    if not field_patterns or not len(layout):
+        return ""
+
+    # (label rank, line index) of every label line, per field
+    candidates: Dict[str, List[Tuple[int, int]]] = {field: [] for field in field_patterns}
+    for i, text in enumerate(layout.lines):
+        for field, patterns in field_patterns.items():
+            rank = next((rank for rank, pattern in enumerate(patterns) if pattern.search(text)), None)
+            if rank is not None:
+                candidates[field].append((rank, i))
+    candidates = {field: sorted(found) for field, found in candidates.items() if found}
+    if not candidates:
+        return ""
+
+    geometric = layout.has_geometry()
+    selected, total = set(), 0
+
+    def take(lines: List[int]) -> bool:
+        nonlocal total
+        new = [i for i in dict.fromkeys(lines) if i not in selected]
+        cost = sum(len(layout.lines[i]) + 1 for i in new)
+        if total + cost > max_chars:
+            return False
+        selected.update(new)
+        total += cost
+        return True
+
+    # Keep the document header for issuer/provider context
+    for i in range(min(HEADER_LINES, len(layout))):
+        if layout.pages[i] == 0:
+            take([i])
+
+    # Fields take turns: every field's best label line, then every field's second, ...
+    turns = (
+        (field, found[round_index][1])
+        for round_index in range(max(len(found) for found in candidates.values()))
+        for field, found in candidates.items() if round_index < len(found)
+    )
+    shortest = min(len(line) + 1 for line in layout.lines)
+    for field, i in turns:
+        if max_chars - total < shortest:
+            break  # Budget spent: no line fits any more
+        # Skip the neighbour scan when not even the label line fits
+        if i not in selected and total + len(layout.lines[i]) + 1 > max_chars:
+            continue
+        after = FIELD_LABELS[field][1]
+        if geometric:
+            region = [i] + _neighbours(layout, i, after)
+        else:
+            region = list(range(i, min(i + 1 + after, len(layout))))
+        # A region that doesn't fit still contributes its label line if that does
+        if not take(region):
+            take([i])
+
+    return "\n".join(layout.lines[i] for i in sorted(selected))
+
+
+def _neighbours(layout: OCRLayout, index: int, below: int) -> List[int]:
+    """
+    Indices of lines holding the value for the label at `index`: lines on the same
+    row to its right, plus up to `below` lines underneath that overlap it horizontally.
+    """
+    x0, y0, x1, y1 = layout.box(index)
+    page = layout.pages[index]
+    height = max(y1 - y0, 1)
+    same_row, under = [], []
+
+    for j in range(len(layout)):
+        if j == index or layout.pages[j] != page:
+            continue
+        bx0, by0, bx1, by1 = layout.box(j)
+        overlap = min(y1, by1) - max(y0, by0)
+        if overlap >= SAME_ROW_OVERLAP * min(height, max(by1 - by0, 1)) and bx0 >= x0:
+            same_row.append(j)
+        elif by0 >= y1 - height * 0.2 and by0 - y1 <= height * 2.5 * below and min(x1, bx1) > max(x0, bx0):
+            under.append((by0, j))
+
+    under.sort()
+    return same_row + [j for _, j in under[:below]]
@@ -0,0 +1,192 @@
+"""
+Normalization, alias tables and trigram similarity for insurer, procedure and
+denial code names.
+
+The same payer or procedure is spelled differently across documents (the denial
+letter says "BlueCross BlueShield", the bill "BlueCross PPO"; "CT Abdomen" vs
+"Abdominal CT"). canonical_* map such spellings onto one form; TrigramIndex finds
+the closest known names for the ones the tables don't cover.
+"""
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+import re
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Plan types and corporate suffixes that don't identify the payer. Words like
+# "health" or "plan" stay: they are part of names ("Health Net", "Texas Health
+# Plan"), and product names after a known payer are dropped by the alias prefix
+# match instead ("UnitedHealthcare Choice Plus" -> "unitedhealthcare")
+INSURER_STOPWORDS = frozenset({
+    "ppo", "hmo", "epo", "pos", "hdhp", "company", "co", "inc", "corp", "llc", "of", "the",
+})
+
+# Normalized insurer name (after dropping stopwords) -> canonical payer
+INSURER_ALIASES = {
+    "bluecross": "bluecross blueshield",
+    "blue cross": "bluecross blueshield",
+    "bluecross blueshield": "bluecross blueshield",
+    "blue cross blue shield": "bluecross blueshield",
+    "bluecross blue shield": "bluecross blueshield",
+    "blue cross blueshield": "bluecross blueshield",
+    "blueshield": "bluecross blueshield",
+    "blue shield": "bluecross blueshield",
+    "bcbs": "bluecross blueshield",
+    "anthem bluecross": "anthem",
+    "anthem blue cross": "anthem",
+    "anthem bcbs": "anthem",
+    "united": "unitedhealthcare",
+    "unitedhealthcare": "unitedhealthcare",
+    "united healthcare": "unitedhealthcare",
+    "unitedhealth": "unitedhealthcare",
+    "united health": "unitedhealthcare",
+    "uhc": "unitedhealthcare",
+    "cigna": "cigna",
+    "cigna healthspring": "cigna",
+    "aetna": "aetna",
+    "aetna cvs": "aetna",
+    "medicare": "medicare",
+    "medicare part a": "medicare",
+    "medicare part b": "medicare",
+    "cms": "medicare",
+    "humana": "humana",
+    "kaiser": "kaiser permanente",
+    "kaiser permanente": "kaiser permanente",
+}
+
+# Words that carry no meaning for matching procedures
+PROCEDURE_STOPWORDS = frozenset({"of", "the", "and", "a", "an", "w", "wo", "for", "to", "on", "procedure", "service"})
+
+# Procedure word (or phrase) -> canonical word(s); phrases are replaced before words
+PROCEDURE_PHRASES = {
+    "magnetic resonance imaging": "mri",
+    "magnetic resonance": "mri",
+    "computed tomography": "ct",
+    "cat scan": "ct",
+    "ct scan": "ct",
+    "mri scan": "mri",
+    "x ray": "xray",
+    "l spine": "lumbar spine",
+    "c spine": "cervical spine",
+    "t spine": "thoracic spine",
+    "pt": "physical therapy",
+    "ekg": "electrocardiogram",
+    "ecg": "electrocardiogram",
+    "egd": "upper endoscopy",
+    "er": "emergency department",
+    "ed": "emergency department",
+}
+PROCEDURE_WORDS = {
+    "abdominal": "abdomen",
+    "abd": "abdomen",
+    "lumbosacral": "lumbar",
+    "cranial": "brain",
+    "head": "brain",
+    "pelvic": "pelvis",
+    "knees": "knee",
+    "shoulders": "shoulder",
+    "therapeutic": "therapy",
+    "therapies": "therapy",
+    "xrays": "xray",
+    "radiograph": "xray",
+}
+
+
+def _words(value: str) -> List[str]:
+    return _WORD.findall(str(value).casefold())
+
+
+def _replace_phrases(text: str, phrases: Dict[str, str]) -> str:
+    padded = f" {text} "
+    for phrase in sorted(phrases, key=len, reverse=True):
+        padded = padded.replace(f" {phrase} ", f" {phrases[phrase]} ")
+    return padded.strip()
+
+
+@lru_cache(maxsize=65536)
+def canonical_insurer(value: str) -> str:
+    """Map an insurer name onto its canonical payer name ("BlueCross PPO" -> "bluecross blueshield")."""
+    words = [w for w in _words(value or "") if w not in INSURER_STOPWORDS]
+    name = " ".join(words)
+    if name in INSURER_ALIASES:
+        return INSURER_ALIASES[name]
+    # Longest alias the name starts with ("aetna better health" -> "aetna")
+    for size in range(len(words) - 1, 0, -1):
+        prefix = " ".join(words[:size])
+        if prefix in INSURER_ALIASES:
+            return INSURER_ALIASES[prefix]
+    return name
+
+
+@lru_cache(maxsize=65536)
+def canonical_procedure(value: str) -> str:
+    """
+    Canonical, word-order independent procedure name, so "CT Abdomen",
+    "Abdominal CT" and "CT scan of the abdomen" all become "abdomen ct".
+    """
+    text = _replace_phrases(" ".join(_words(value or "")), PROCEDURE_PHRASES)
+    words = {PROCEDURE_WORDS.get(w, w) for w in text.split() if w not in PROCEDURE_STOPWORDS}
+    return " ".join(sorted(words))
+
+
+@lru_cache(maxsize=65536)
+def canonical_denial_code(value: str) -> str:
+    """Denial codes compare without case, spaces or dashes ("co-50", "CO 50" -> "CO50")."""
+    return "".join(_words(value or "")).upper()
+
+
+@lru_cache(maxsize=65536)
+def trigrams(value: str) -> FrozenSet[str]:
+    """Character trigrams of each word, padded so short words and word starts count."""
+    grams = set()
+    for word in value.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(a: str, b: str) -> float:
+    """Dice coefficient of the trigram sets of two canonical names (1.0 = identical)."""
+    if a == b:
+        return 1.0
+    ga, gb = trigrams(a), trigrams(b)
+    if not ga or not gb:
+        return 0.0
+    return 2 * len(ga & gb) / (len(ga) + len(gb))
+
+
+class TrigramIndex:
+    """Inverted index from trigram to names, for finding the names closest to a query."""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self._postings: Dict[str, Set[str]] = {}
+        self._values: Set[str] = set()
+        for value in values:
+            self.add(value)
+
+    def add(self, value: str):
+        if not value or value in self._values:
+            return
+        self._values.add(value)
+        for gram in trigrams(value):
+            self._postings.setdefault(gram, set()).add(value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def search(self, query: str, min_score: float = 0.0, limit: int = 10) -> List[Tuple[str, float]]:
+        """Names sharing trigrams with the query, best first, as (name, dice score)."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for value in self._postings.get(gram, ()):
+                shared[value] = shared.get(value, 0) + 1
+        scored = [
+            (value, 2 * count / (len(query_grams) + len(trigrams(value))))
+            for value, count in shared.items()
+        ]
+        scored = [item for item in scored if item[1] >= min_score]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
@@ -0,0 +1,253 @@
+"""
+Background OCR ingestion for uploaded documents.
+
+Uploads are acknowledged as soon as the files are on disk. OCR then runs here on
+a worker pool and each document moves through the statuses
+queued -> processing -> completed | failed, stored on UploadedDocument so every
+API worker (and the status endpoints) can see progress.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, UploadedDocument
+from ocr.service import get_ocr_processor
+from utils.blob_store import blob_store
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ("queued", "processing")
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class IngestionManager:
+    """Runs OCR for uploaded documents off the request path."""
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-ingest")
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._recovery_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, document_id: int, file_path: str) -> Future:
+        """
+        Schedule OCR for a document whose row is already committed with status 'queued'.
+
+        Returns:
+            Future resolved with the final status once OCR is done
+        """
+        with self._lock:
+            existing = self._futures.get(document_id)
+            if existing is not None and not existing.done():
+                return existing
+            future = self._executor.submit(self._ingest, document_id, file_path)
+            self._futures[document_id] = future
+        future.add_done_callback(lambda f: self._forget(document_id, f))
+        return future
+
+    def _forget(self, document_id: int, future: Future):
+        with self._lock:
+            if self._futures.get(document_id) is future:
+                del self._futures[document_id]
+
+    def _claim(self, document_id: int) -> bool:
+        """Atomically move a document from queued to processing so only one worker runs it."""
+        with SessionLocal() as db:
+            claimed = db.query(UploadedDocument).filter(
+                UploadedDocument.id == document_id,
+                UploadedDocument.ocr_status == "queued"
+            ).update(
+                {"ocr_status": "processing", "processing_started_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        return claimed == 1
+
+    def _reuse_ocr(self, document_id: int) -> Optional[Tuple[str, Optional[dict]]]:
+        """OCR text and layout of an already processed upload with identical content, if any."""
+        with SessionLocal() as db:
+            content_hash = db.query(UploadedDocument.content_hash).filter(
+                UploadedDocument.id == document_id
+            ).scalar()
+            if not content_hash:
+                return None
+            previous = db.query(UploadedDocument.id, UploadedDocument.ocr_text, UploadedDocument.ocr_layout).filter(
+                UploadedDocument.content_hash == content_hash,
+                UploadedDocument.id != document_id,
+                UploadedDocument.ocr_status == "completed",
+                UploadedDocument.ocr_completed == 1
+            ).order_by(UploadedDocument.id.desc()).first()
+        if previous is None:
+            return None
+        logger.info(f"Document {document_id} has the same content as document {previous.id}, reusing its OCR")
+        return previous.ocr_text, previous.ocr_layout
+
+    def _ingest(self, document_id: int, file_path: str) -> Optional[str]:
+        if not self._claim(document_id):
+            logger.info(f"Document {document_id} already claimed or removed, skipping OCR")
+            return None
+
+        start = time.time()
+        error = None
+        reused = self._reuse_ocr(document_id)
+        if reused is not None:
+            ocr_text, ocr_layout = reused
+        else:
+            try:
+                with blob_store.readable(file_path) as readable_path:
+                    ocr_text, ocr_layout = get_ocr_processor().process_document_with_layout(readable_path)
+                ocr_text = json.dumps(ocr_text) if isinstance(ocr_text, dict) else ocr_text
+                ocr_layout = ocr_layout.to_dict() if ocr_layout else None
+            except Exception as e:
+                logger.error(f"OCR failed for document {document_id}: {e}")
+                ocr_text, ocr_layout, error = "", None, str(e)
+
+        status = "failed" if error else "completed"
+        with SessionLocal() as db:
+            doc = db.get(UploadedDocument, document_id)
+            if doc is None:
+                return None
+            doc.ocr_text = ocr_text
+            doc.ocr_layout = ocr_layout
+            doc.ocr_completed = 1 if ocr_text else 0
+            doc.ocr_status = status
+            doc.ocr_error = error
+            db.commit()
+
+        logger.info(f"[TIMING] Ingestion of document {document_id} {status} in {time.time() - start:.2f}s")
+        return status
+
+    async def wait_for(self, document_ids: List[int], timeout: float) -> bool:
+        """
+        Wait until none of the documents is pending OCR.
+
+        Documents ingested in this process are awaited directly; documents handled by
+        other workers are tracked through their stored status.
+
+        Returns:
+            True if all documents finished within the timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        with self._lock:
+            local = [future for doc_id, future in self._futures.items() if doc_id in set(document_ids)]
+        if local:
+            await asyncio.wait([asyncio.wrap_future(future) for future in local], timeout=timeout)
+
+        while True:
+            pending = await asyncio.to_thread(self._pending_ids, document_ids)
+            if not pending:
+                return True
+            if loop.time() >= deadline:
+                logger.warning(f"Timed out waiting for OCR of documents {pending}")
+                return False
+            await asyncio.sleep(0.5)
+
+    def _pending_ids(self, document_ids: List[int]) -> List[int]:
+        with SessionLocal() as db:
+            rows = db.query(UploadedDocument.id).filter(
+                UploadedDocument.id.in_(document_ids),
+                UploadedDocument.ocr_status.in_(PENDING_STATUSES)
+            ).all()
+        return [row.id for row in rows]
+
+    def recover_pending(self, only_stale: bool = False):
+        """
+        Re-queue documents left pending by a previous run (e.g. a restart mid-OCR).
+        Documents claimed for OCR more than OCR_STALE_AFTER_SECONDS ago and still
+        'processing' are reset first; a document that waited in the queue before a
+        worker picked it up is not stale until its OCR itself has run that long.
+
+        Args:
+            only_stale: Re-queue only documents uploaded more than OCR_STALE_AFTER_SECONDS
+                ago (the periodic check; at startup every queued document is re-queued).
+                A document another worker still has queued is claimed by only one of them.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.OCR_STALE_AFTER_SECONDS)
+        with SessionLocal() as db:
+            db.query(UploadedDocument).filter(
+                UploadedDocument.ocr_status == "processing",
+                or_(
+                    UploadedDocument.processing_started_at < stale_before,
+                    # Claimed before the start time was stored
+                    and_(
+                        UploadedDocument.processing_started_at.is_(None),
+                        UploadedDocument.upload_timestamp < stale_before
+                    )
+                )
+            ).update({"ocr_status": "queued"}, synchronize_session=False)
+            db.commit()
+            query = db.query(UploadedDocument.id, UploadedDocument.file_path).filter(
+                UploadedDocument.ocr_status == "queued"
+            )
+            if only_stale:
+                query = query.filter(UploadedDocument.upload_timestamp < stale_before)
+            queued = query.all()
+
+        for row in queued:
+            self.enqueue(row.id, row.file_path)
+        if queued:
+            logger.info(f"Re-queued {len(queued)} document(s) for OCR")
+
+    async def _recover_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.recover_pending, True)
+            except Exception as e:
+                logger.error(f"Recovering stale OCR documents failed: {e}")
+
+    def start_recovery(self, interval: float):
+        """
+        Re-check for stale documents every `interval` seconds on the running event loop,
+        so documents left 'processing' by a worker that crashed shortly before the last
+        restart are recovered once they pass OCR_STALE_AFTER_SECONDS.
+        """
+        if self._recovery_task is None or self._recovery_task.done():
+            self._recovery_task = asyncio.get_running_loop().create_task(self._recover_periodically(interval))
+
+    async def stop_recovery(self):
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+            try:
+                await self._recovery_task
+            except asyncio.CancelledError:
+                pass
+            self._recovery_task = None
+
+
+def document_statuses(db: Session, document_ids: List[int]) -> List[dict]:
+    """Per-document ingestion progress for the status endpoints."""
+    documents = db.query(
+        UploadedDocument.id,
+        UploadedDocument.filename,
+        UploadedDocument.ocr_status,
+        UploadedDocument.ocr_completed,
+        UploadedDocument.ocr_error
+    ).filter(UploadedDocument.id.in_(document_ids)).all()
+
+    return [
+        {
+            "id": doc.id,
+            "filename": doc.filename,
+            # Rows created before background ingestion have no status but were OCRed inline
+            "status": doc.ocr_status or "completed",
+            "ocr_completed": bool(doc.ocr_completed),
+            "error": doc.ocr_error
+        }
+        for doc in documents
+    ]
+
+
+# Global ingestion manager instance
+ingestion = IngestionManager(max_workers=settings.OCR_INGEST_WORKERS)
@@ -0,0 +1,335 @@
+"""
+In-memory denial knowledge graph.
+
+Each DenialPattern row becomes a hub linked to its insurer, denial code, CPT code,
+procedure, missing documents and resolutions, weighted by how often the pattern
+occurred. Node names are normalized per kind (insurers through the alias table,
+so "BlueCross PPO" and "Blue Cross Blue Shield of Texas" are one payer).
+
+Multi-hop aggregate queries such as "most common missing docs for CPT 72148
+across all payers" walk filter nodes -> patterns -> target nodes. The walk
+intersects the pattern sets of the filters, then sums pattern weights per
+target node.
+
+The graph is built once (at startup) and then kept current incrementally: writes
+in this process are applied as they commit, and writes or archiving by other
+processes are picked up as deltas when the pattern index reloads.
+"""
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, DenialPattern
+from utils.fuzzy_match import canonical_denial_code, canonical_insurer, canonical_procedure
+from utils.pattern_index import SYNC_OVERLAP, normalize_part, pattern_index
+
+logger = logging.getLogger(__name__)
+
+# Node kinds, in the order their adjacency lists are kept
+KINDS = ("insurer", "denial_code", "cpt", "procedure", "missing_doc", "resolution")
+_KIND_INDEX = {kind: i for i, kind in enumerate(KINDS)}
+
+_GRAPH_COLUMNS = (
+    DenialPattern.id, DenialPattern.insurance, DenialPattern.denial_code, DenialPattern.cpt_code,
+    DenialPattern.procedure, DenialPattern.missing_docs, DenialPattern.resolved_by,
+    DenialPattern.occurrence_count
+)
+
+_NORMALIZERS = {
+    "insurer": canonical_insurer,
+    "denial_code": canonical_denial_code,
+    "cpt": lambda value: normalize_part(value).upper(),
+    "procedure": canonical_procedure,
+    "missing_doc": normalize_part,
+    "resolution": normalize_part,
+}
+
+
+def node_key(kind: str, value: str) -> str:
+    """Normalized name of a node of the given kind."""
+    return _NORMALIZERS[kind](value or "")
+
+
+@dataclass
+class GraphResult:
+    """One aggregated target node of a query."""
+    kind: str
+    name: str
+    weight: int  # Sum of occurrence counts of the patterns that link to it
+    patterns: int  # Number of distinct patterns that link to it
+    share: float  # weight / total weight of the matching patterns
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind, "name": self.name, "weight": self.weight,
+            "patterns": self.patterns, "share": round(self.share, 4)
+        }
+
+
+class KnowledgeGraph:
+    """Adjacency between pattern hubs and typed entity nodes, updated incrementally."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._reset()
+        self._generation: Optional[int] = None  # pattern_index generation we last caught up with
+        self._synced_at: Optional[datetime] = None
+        self.stats = {"loads": 0, "syncs": 0, "queries": 0, "last_load_ms": 0.0, "last_query_ms": 0.0}
+
+    def _reset(self):
+        self._node_ids: Dict[Tuple[int, str], int] = {}  # (kind, normalized name) -> node id
+        self._node_kind = array("b")
+        self._node_label: List[str] = []  # Display name (first spelling seen)
+        # Pattern -> node ids per kind (forward edges) and node -> patterns (reverse edges)
+        self._forward: Dict[int, Tuple[array, ...]] = {}
+        self._reverse: List[Set[int]] = []
+        self._weight: Dict[int, int] = {}
+        # Running totals for unfiltered queries: weight per node and over all patterns
+        self._node_weight = array("q")
+        self._total_weight = 0
+        self._edges = 0
+
+    # Building
+
+    def _node(self, kind_index: int, value: str) -> Optional[int]:
+        name = node_key(KINDS[kind_index], value)
+        if not name or name == "unknown":
+            return None
+        key = (kind_index, name)
+        node = self._node_ids.get(key)
+        if node is None:
+            node = len(self._node_label)
+            self._node_ids[key] = node
+            self._node_kind.append(kind_index)
+            self._node_label.append(str(value).strip())
+            self._reverse.append(set())
+            self._node_weight.append(0)
+        return node
+
+    def _add_pattern(self, row):
+        values = (
+            [row.insurance], [row.denial_code], [row.cpt_code], [row.procedure],
+            row.missing_docs or [], row.resolved_by or []
+        )
+        weight = row.occurrence_count or 0
+        adjacency = []
+        for kind_index, names in enumerate(values):
+            nodes = array("i", dict.fromkeys(
+                node for node in (self._node(kind_index, name) for name in names) if node is not None
+            ))
+            for node in nodes:
+                self._reverse[node].add(row.id)
+                self._node_weight[node] += weight
+            self._edges += len(nodes)
+            adjacency.append(nodes)
+        self._forward[row.id] = tuple(adjacency)
+        self._weight[row.id] = weight
+        self._total_weight += weight
+
+    def _remove_pattern(self, pattern_id: int):
+        adjacency = self._forward.pop(pattern_id, None)
+        if adjacency is None:
+            return
+        weight = self._weight.pop(pattern_id)
+        for nodes in adjacency:
+            for node in nodes:
+                self._reverse[node].discard(pattern_id)
+                self._node_weight[node] -= weight
+            self._edges -= len(nodes)
+        self._total_weight -= weight
+
+    def load(self, db: Optional[Session] = None):
+        """Build the graph from the denial_patterns table."""
+        start = time.perf_counter()
+        generation = pattern_index.generation
+        synced_at = datetime.utcnow()
+        local = db is None
+        db = db or SessionLocal()
+        try:
+            rows = db.query(*_GRAPH_COLUMNS).all()
+        finally:
+            if local:
+                db.close()
+        self.build(rows, generation)
+        self._synced_at = synced_at
+        self.stats["last_load_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        logger.info(f"Knowledge graph loaded: {len(self._node_label)} nodes, {self._edges} edges "
+                    f"in {self.stats['last_load_ms']}ms")
+
+    def build(self, rows: Iterable, generation: int = 0):
+        """Replace the graph with the given pattern rows."""
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add_pattern(row)
+            self._generation = generation
+            self.stats["loads"] += 1
+
+    def apply(self, rows: Iterable):
+        """Insert or replace patterns that were just written."""
+        with self._lock:
+            if self._generation is None:
+                return
+            for row in rows:
+                self._remove_pattern(row.id)
+                self._add_pattern(row)
+
+    def remove(self, pattern_ids: Iterable[int]):
+        """Drop patterns deleted or archived from the table."""
+        with self._lock:
+            for pattern_id in pattern_ids:
+                self._remove_pattern(pattern_id)
+
+    def sync(self, db: Optional[Session] = None):
+        """
+        Apply patterns written or archived by other processes since the last load or sync.
+
+        Only patterns seen since then are re-read (plus the list of ids, to drop the
+        ones that are gone), so the graph is never rebuilt on the request path. A
+        sync already running in another thread is not repeated.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            generation = pattern_index.generation
+            synced_at = datetime.utcnow()
+            local = db is None
+            db = db or SessionLocal()
+            try:
+                rows = db.query(*_GRAPH_COLUMNS).filter(
+                    DenialPattern.last_seen >= self._synced_at - SYNC_OVERLAP
+                ).all()
+                current = {pattern_id for (pattern_id,) in db.query(DenialPattern.id)}
+            finally:
+                if local:
+                    db.close()
+            with self._lock:
+                for pattern_id in set(self._forward) - current:
+                    self._remove_pattern(pattern_id)
+                for row in rows:
+                    self._remove_pattern(row.id)
+                    self._add_pattern(row)
+                self._generation = generation
+                self._synced_at = synced_at
+                self.stats["syncs"] += 1
+        finally:
+            self._sync_lock.release()
+
+    def ensure_fresh(self, db: Optional[Session] = None):
+        """Catch up when the pattern index reloaded (e.g. another process wrote patterns)."""
+        pattern_index.refresh(db)
+        if self._generation is None or self._synced_at is None:
+            self.load(db)
+        elif self._generation != pattern_index.generation:
+            self.sync(db)
+
+    # Queries
+
+    def _matching_patterns(self, filters: Dict[str, List[str]]) -> Optional[Set[int]]:
+        """Patterns linked to any of the given values for every filtered kind (None = no filter)."""
+        if not filters:
+            return None
+        # One group of pattern sets per filtered kind (any set in the group may match)
+        groups = []
+        for kind, values in filters.items():
+            sets = []
+            for value in values:
+                node = self._node_ids.get((_KIND_INDEX[kind], node_key(kind, value)))
+                if node is not None and self._reverse[node]:
+                    sets.append(self._reverse[node])
+            if not sets:
+                return set()
+            groups.append(sets)
+        # Start from the most selective group and only probe the others, so large
+        # sets (a payer with every plan) are never copied
+        groups.sort(key=lambda sets: sum(len(s) for s in sets))
+        first = groups[0]
+        matched = set(first[0]).union(*first[1:]) if len(first) > 1 else set(first[0])
+        for sets in groups[1:]:
+            matched = {p for p in matched if any(p in s for s in sets)}
+            if not matched:
+                break
+        return matched
+
+    def query(self, target: str, filters: Dict[str, List[str]], limit: int = 10) -> dict:
+        """
+        Aggregate target nodes over the patterns matching all filters.
+
+        Args:
+            target: Node kind to rank (e.g. "missing_doc")
+            filters: Node kind -> accepted values; values of one kind are OR-ed,
+                kinds are AND-ed (e.g. {"cpt": ["72148"]})
+            limit: Number of results
+
+        Returns:
+            Dict with the matching pattern count, their total weight and ranked results
+        """
+        if target not in _KIND_INDEX:
+            raise ValueError(f"Unknown node kind '{target}', expected one of {', '.join(KINDS)}")
+        unknown = [kind for kind in filters if kind not in _KIND_INDEX]
+        if unknown:
+            raise ValueError(f"Unknown filter kind(s): {', '.join(unknown)}")
+
+        start = time.perf_counter()
+        target_index = _KIND_INDEX[target]
+        with self._lock:
+            patterns = self._matching_patterns({k: v for k, v in filters.items() if v})
+            weights: Dict[int, int] = {}
+            counts: Dict[int, int] = {}
+            if patterns is None:
+                # No filters: read the running per-node totals
+                for node, kind_index in enumerate(self._node_kind):
+                    if kind_index == target_index and self._reverse[node]:
+                        weights[node] = self._node_weight[node]
+                        counts[node] = len(self._reverse[node])
+                total, matched = self._total_weight, len(self._forward)
+            else:
+                total = 0
+                for pattern_id in patterns:
+                    weight = self._weight[pattern_id]
+                    total += weight
+                    for node in self._forward[pattern_id][target_index]:
+                        weights[node] = weights.get(node, 0) + weight
+                        counts[node] = counts.get(node, 0) + 1
+                matched = len(patterns)
+            ranked = sorted(weights, key=lambda node: (-weights[node], -counts[node], node))[:limit]
+            results = [
+                GraphResult(target, self._node_label[node], weights[node], counts[node],
+                            weights[node] / total if total else 0.0)
+                for node in ranked
+            ]
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stats["queries"] += 1
+        self.stats["last_query_ms"] = round(elapsed, 3)
+        return {
+            "target": target,
+            "filters": filters,
+            "matched_patterns": matched,
+            "total_weight": total,
+            "results": [result.to_dict() for result in results],
+            "query_ms": round(elapsed, 3)
+        }
+
+    def metrics(self) -> dict:
+        with self._lock:
+            nodes_by_kind = {kind: 0 for kind in KINDS}
+            for kind_index in self._node_kind:
+                nodes_by_kind[KINDS[kind_index]] += 1
+            return {
+                **self.stats,
+                "patterns": len(self._forward),
+                "nodes": len(self._node_label),
+                "edges": self._edges,
+                "nodes_by_kind": nodes_by_kind,
+            }
+
+
+# Global knowledge graph instance
+knowledge_graph = KnowledgeGraph()
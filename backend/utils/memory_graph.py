@@ -1,10 +1,154 @@
+from sqlalchemy import delete, func, insert, literal_column
 from sqlalchemy.orm import Session
 from datetime import datetime
-from database import DenialPattern
+from typing import List
+from database import DenialPattern, DenialPatternArchive
+from config import settings
+from utils.decay import decay_weight, weight_cutoff
+from utils.pattern_index import pattern_index
+from utils.analytics import apply_increments, denial_increments
+from utils.knowledge_graph import knowledge_graph
+from utils.similar_cases import embed_pattern, similar_cases, store_embeddings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# SQL that unions the stored JSON array with the incoming one, without duplicates.
+# Used inside ON CONFLICT DO UPDATE, where "excluded" is the row that failed to insert.
+_MERGE_JSON_ARRAY = {
+    "sqlite": (
+        "(SELECT json_group_array(value) FROM ("
+        "SELECT value FROM json_each(denial_patterns.{column}) "
+        "UNION SELECT value FROM json_each(excluded.{column})))"
+    ),
+    "postgresql": (
+        "(SELECT coalesce(json_agg(value), '[]'::json) FROM ("
+        "SELECT json_array_elements_text(coalesce(denial_patterns.{column}, '[]'::json)) AS value "
+        "UNION SELECT json_array_elements_text(excluded.{column}) AS value) merged)"
+    ),
+}
+
+
+_INDEX_COLUMNS = (
+    DenialPattern.id, DenialPattern.insurance, DenialPattern.denial_code, DenialPattern.procedure,
+    DenialPattern.occurrence_count, DenialPattern.missing_docs, DenialPattern.resolved_by,
+    DenialPattern.last_seen, DenialPattern.denial_reason, DenialPattern.cpt_code, DenialPattern.decay_weight
+)
+
+# Copied into denial_patterns_archive when a pattern goes cold
+_ARCHIVE_COLUMNS = (
+    DenialPattern.id, DenialPattern.insurance, DenialPattern.procedure, DenialPattern.cpt_code,
+    DenialPattern.denial_code, DenialPattern.missing_docs, DenialPattern.resolved_by,
+    DenialPattern.occurrence_count, DenialPattern.last_seen, DenialPattern.denial_reason,
+    DenialPattern.decay_weight
+)
+
+
+def _upsert_statement(dialect_name: str, values: dict):
+    """INSERT ... ON CONFLICT DO UPDATE that adds the count and merges lists in a single statement."""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+
+    stmt = insert(DenialPattern).values(**values)
+    merge = _MERGE_JSON_ARRAY[dialect_name]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DenialPattern.insurance, DenialPattern.denial_code, DenialPattern.procedure],
+        set_={
+            "occurrence_count": DenialPattern.occurrence_count + stmt.excluded.occurrence_count,
+            "decay_weight": func.coalesce(DenialPattern.decay_weight, 0.0) + stmt.excluded.decay_weight,
+            "last_seen": stmt.excluded.last_seen,
+            "missing_docs": literal_column(merge.format(column="missing_docs")),
+            "resolved_by": literal_column(merge.format(column="resolved_by")),
+            "denial_reason": func.coalesce(stmt.excluded.denial_reason, DenialPattern.denial_reason),
+        }
+    )
+    # The stored row after the update, for the in-process pattern index
+    return stmt.returning(*_INDEX_COLUMNS)
+
+
+def pattern_values(
+    insurance: str,
+    procedure: str,
+    cpt_code: str,
+    denial_code: str,
+    missing_docs: list,
+    resolved_by: list,
+    denial_reason: str = None,
+    last_seen: datetime = None
+) -> dict:
+    """Normalize one observed denial into DenialPattern column values."""
+    last_seen = last_seen or datetime.utcnow()
+    return {
+        "insurance": insurance or "Unknown",
+        "procedure": procedure or "Unknown",
+        "cpt_code": cpt_code or "Unknown",
+        "denial_code": denial_code or "Unknown",
+        "missing_docs": list(dict.fromkeys(missing_docs or [])),
+        "resolved_by": list(dict.fromkeys(resolved_by or [])),
+        "denial_reason": denial_reason or None,
+        "occurrence_count": 1,
+        "decay_weight": decay_weight(1, last_seen),
+        "last_seen": last_seen
+    }
+
+
+def coalesce_patterns(batch: List[dict]) -> List[dict]:
+    """Fold observations of the same pattern into one row: counts summed, lists merged."""
+    merged = {}
+    for values in batch:
+        key = (values["insurance"], values["denial_code"], values["procedure"])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(values)
+            continue
+        current["occurrence_count"] += values["occurrence_count"]
+        current["decay_weight"] += values["decay_weight"]
+        current["last_seen"] = max(current["last_seen"], values["last_seen"])
+        current["denial_reason"] = values["denial_reason"] or current["denial_reason"]
+        current["missing_docs"] = list(dict.fromkeys(current["missing_docs"] + values["missing_docs"]))
+        current["resolved_by"] = list(dict.fromkeys(current["resolved_by"] + values["resolved_by"]))
+    return list(merged.values())
+
+
+def write_denial_patterns(db: Session, batch: List[dict]) -> int:
+    """
+    Upsert a batch of pattern observations (pattern_values dicts) in one
+    transaction, refresh their case embeddings, and update the in-process
+    indexes after commit.
+
+    Returns:
+        Number of distinct patterns written
+
+    Raises:
+        Exception: if the transaction fails (it is rolled back)
+    """
+    rows = coalesce_patterns(batch)
+    dialect_name = db.get_bind().dialect.name
+    try:
+        stored = []
+        for values in rows:
+            if dialect_name in _MERGE_JSON_ARRAY:
+                stored.append(db.execute(_upsert_statement(dialect_name, values)).one())
+            else:
+                stored.append(_record_with_row_lock(db, values))
+        # Embeddings cover the merged missing-docs lists, so they are computed from the stored rows
+        vectors = {row.id: embed_pattern(row) for row in stored}
+        store_embeddings(db, vectors)
+        apply_increments(db, denial_increments(batch))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # Write-through so lookups in this process see the update immediately
+    pattern_index.apply(stored)
+    similar_cases.add(vectors)
+    knowledge_graph.apply(stored)
+    return len(stored)
+
+
 def record_denial_pattern(
     db: Session,
     insurance: str,
@@ -12,59 +156,104 @@ def record_denial_pattern(
     cpt_code: str,
     denial_code: str,
     missing_docs: list,
-    resolved_by: list
+    resolved_by: list,
+    denial_reason: str = None
 ):
     """
     Store or update a denial pattern in the knowledge graph (database).
+
+    Patterns are keyed on Insurance + Denial Code + Procedure (unique index). The
+    count is incremented and the document lists merged by the database in one
+    statement, so concurrent appeals for the same pattern never lose updates.
+
+    This writes synchronously; request handlers queue observations on
+    utils.pattern_writer.pattern_writer instead.
     """
-    # Normalize inputs
-    insurance = insurance or "Unknown"
-    procedure = procedure or "Unknown"
-    cpt_code = cpt_code or "Unknown"
-    denial_code = denial_code or "Unknown"
-    
-    # Try to find existing pattern
-    # We match on Insurance + Denial Code + Procedure combination
-    existing = db.query(DenialPattern).filter(
-        DenialPattern.insurance == insurance,
-        DenialPattern.denial_code == denial_code,
-        DenialPattern.procedure == procedure
-    ).first()
-    
-    if existing:
-        existing.occurrence_count += 1
-        existing.last_seen = datetime.utcnow()
-        
-        # Merge missing_docs (unique)
-        current_missing = set(existing.missing_docs or [])
-        current_missing.update(missing_docs or [])
-        existing.missing_docs = list(current_missing)
-        
-        # Merge resolved_by (unique)
-        current_resolved = set(existing.resolved_by or [])
-        current_resolved.update(resolved_by or [])
-        existing.resolved_by = list(current_resolved)
-        
-        logger.info(f"Updated denial pattern. Count: {existing.occurrence_count}")
-    else:
-        new_pattern = DenialPattern(
-            insurance=insurance,
-            procedure=procedure,
-            cpt_code=cpt_code,
-            denial_code=denial_code,
-            missing_docs=missing_docs or [],
-            resolved_by=resolved_by or [],
-            occurrence_count=1,
-            last_seen=datetime.utcnow()
-        )
-        db.add(new_pattern)
-        logger.info("Created new denial pattern.")
-    
+    values = pattern_values(insurance, procedure, cpt_code, denial_code, missing_docs, resolved_by, denial_reason)
     try:
-        db.commit()
+        write_denial_patterns(db, [values])
+        logger.info(f"Recorded denial pattern {values['insurance']}/{values['denial_code']}/{values['procedure']}")
     except Exception as e:
         logger.error(f"Failed to commit denial pattern: {e}")
-        db.rollback()
+
+
+def _record_with_row_lock(db: Session, values: dict) -> DenialPattern:
+    """Fallback for databases without ON CONFLICT: read-modify-write under SELECT ... FOR UPDATE."""
+    existing = db.query(DenialPattern).filter(
+        DenialPattern.insurance == values["insurance"],
+        DenialPattern.denial_code == values["denial_code"],
+        DenialPattern.procedure == values["procedure"]
+    ).with_for_update().first()
+
+    if existing is None:
+        pattern = DenialPattern(**values)
+        db.add(pattern)
+        db.flush()
+        return pattern
+    existing.occurrence_count += values["occurrence_count"]
+    existing.decay_weight = (existing.decay_weight or 0.0) + values["decay_weight"]
+    existing.last_seen = values["last_seen"]
+    existing.denial_reason = values["denial_reason"] or existing.denial_reason
+    existing.missing_docs = list(dict.fromkeys((existing.missing_docs or []) + values["missing_docs"]))
+    existing.resolved_by = list(dict.fromkeys((existing.resolved_by or []) + values["resolved_by"]))
+    db.flush()
+    return existing
+
+
+def _archive_values(row, archived_at: datetime) -> dict:
+    values = row._asdict()
+    values["pattern_id"] = values.pop("id")
+    values["archived_at"] = archived_at
+    return values
+
+
+def archive_cold_patterns(db: Session, min_score: float, batch_size: int = 500, now: datetime = None) -> int:
+    """
+    Move patterns whose decayed score fell below min_score to denial_patterns_archive,
+    in batches of batch_size, and drop them from the in-process indexes. A pattern seen
+    again after archiving starts a new live row; its history stays in the archive.
+
+    Returns:
+        Number of patterns archived
+    """
+    now = now or datetime.utcnow()
+    cutoff = weight_cutoff(min_score, now)
+    archived = 0
+    while True:
+        # Range scan on ix_denial_patterns_decay_weight
+        ids = [row.id for row in db.query(DenialPattern.id).filter(
+            DenialPattern.decay_weight < cutoff
+        ).order_by(DenialPattern.decay_weight).limit(batch_size)]
+        if not ids:
+            return archived
+        # The weight is checked again by the DELETE, so a pattern observed since the
+        # SELECT stays live instead of losing that observation
+        stmt = delete(DenialPattern).where(DenialPattern.id.in_(ids), DenialPattern.decay_weight < cutoff)
+        try:
+            if db.get_bind().dialect.delete_returning:
+                rows = db.execute(stmt.returning(*_ARCHIVE_COLUMNS)).all()
+            else:
+                rows = db.query(*_ARCHIVE_COLUMNS).filter(
+                    DenialPattern.id.in_(ids), DenialPattern.decay_weight < cutoff
+                ).with_for_update().all()
+                db.execute(stmt)
+            if rows:
+                db.execute(insert(DenialPatternArchive.__table__), [_archive_values(row, now) for row in rows])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        moved = [row.id for row in rows]
+        if moved:
+            pattern_index.remove(moved)
+            similar_cases.remove(moved)
+            knowledge_graph.remove(moved)
+            archived += len(moved)
+            logger.info(f"Archived {len(moved)} cold denial patterns")
+        if len(ids) < batch_size:
+            return archived
+
 
 def get_pattern_suggestions(
     db: Session, 
@@ -75,24 +264,45 @@ def get_pattern_suggestions(
 ) -> dict:
     """
     Retrieve suggestions based on past resolved cases if occurrence threshold is met.
+    Served from the in-process pattern index (db is only used to load it).
+
+    An exact (case/whitespace-insensitive) match is preferred; otherwise the best
+    fuzzy match for the same denial code is used, e.g. a "BlueCross PPO" bill
+    matching patterns learned from "BlueCross BlueShield" denial letters. Among
+    patterns that match equally well, the one with the highest time-decayed
+    score (recent occurrences) wins.
     """
-    query = db.query(DenialPattern).filter(
-        DenialPattern.insurance == insurance,
-        DenialPattern.denial_code == denial_code
-    )
-    
-    if procedure:
-        query = query.filter(DenialPattern.procedure == procedure)
-        
-    pattern = query.first()
+    pattern = pattern_index.lookup(insurance, denial_code, procedure, db=db)
+    match_type, score, candidates = "exact", 1.0, []
+
+    if not pattern or pattern.occurrence_count < threshold:
+        matches = pattern_index.search(
+            insurance, denial_code, procedure, min_score=settings.PATTERN_FUZZY_MIN_SCORE, db=db
+        )
+        candidates = [m.to_dict() for m in matches]
+        best = next((m for m in matches if m.entry.occurrence_count >= threshold), None)
+        if best is not None:
+            pattern, match_type, score = best.entry, "fuzzy", best.score
+            logger.info(
+                f"Fuzzy pattern match {insurance}/{denial_code}/{procedure} -> "
+                f"{pattern.insurance}/{pattern.denial_code}/{pattern.procedure} ({score:.2f})"
+            )
     
     if pattern and pattern.occurrence_count >= threshold:
         return {
             "found": True,
             "occurrence_count": pattern.occurrence_count,
-            "suggested_solution": pattern.resolved_by,
-            "common_missing_docs": pattern.missing_docs,
+            "decayed_score": round(pattern.score, 3),
+            "suggested_solution": list(pattern.resolved_by),
+            "common_missing_docs": list(pattern.missing_docs),
+            "match_type": match_type,
+            "match_score": round(score, 3),
+            "matched_pattern": {
+                "insurance": pattern.insurance,
+                "denial_code": pattern.denial_code,
+                "procedure": pattern.procedure
+            },
             "message": f"This denial pattern has occurred {pattern.occurrence_count} times. The most successful fix was: {', '.join(pattern.resolved_by)}"
         }
     
-    return {"found": False}
+    return {"found": False, "candidates": candidates}
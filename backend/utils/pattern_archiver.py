@@ -0,0 +1,86 @@
+"""
+Periodic archiving of cold denial patterns.
+
+Patterns whose decayed score fell below PATTERN_ARCHIVE_MIN_SCORE are moved to
+denial_patterns_archive every PATTERN_ARCHIVE_INTERVAL_SECONDS (see
+utils.memory_graph.archive_cold_patterns). This runs on its own schedule, enabled
+by PATTERN_ARCHIVE_ENABLED, so the pattern table stays small whether or not the
+upload retention sweeper is running. Archiving is idempotent, so several API
+workers may run it.
+"""
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+import time
+
+from config import settings
+from database import SessionLocal
+from utils.memory_graph import archive_cold_patterns
+
+logger = logging.getLogger(__name__)
+
+
+class PatternArchiver:
+    """Background task that archives cold denial patterns."""
+
+    def __init__(self, min_score: float, batch_size: int):
+        self.min_score = min_score
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "runs": 0, "archived": 0, "last_run_at": None, "last_archived": 0,
+            "last_duration_seconds": 0.0, "last_error": None
+        }
+
+    def run_once(self) -> int:
+        """Archive cold patterns (blocking; call from a thread). Returns the number archived."""
+        start = time.time()
+        archived = 0
+        try:
+            with SessionLocal() as db:
+                archived = archive_cold_patterns(db, self.min_score, self.batch_size)
+            self.stats["last_error"] = None
+        except Exception as e:
+            logger.error(f"Pattern archiving failed: {e}")
+            self.stats["last_error"] = str(e)
+
+        self.stats["runs"] += 1
+        self.stats["archived"] += archived
+        self.stats["last_archived"] = archived
+        self.stats["last_run_at"] = datetime.utcnow().isoformat()
+        self.stats["last_duration_seconds"] = round(time.time() - start, 3)
+        return archived
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.to_thread(self.run_once)
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float):
+        """Start periodic archiving on the running event loop (no-op when min_score is 0)."""
+        if self.min_score <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(interval))
+            logger.info(f"Pattern archiver started (every {interval:.0f}s, min score {self.min_score})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "running": self._task is not None and not self._task.done(),
+            "min_score": self.min_score,
+        }
+
+
+# Global pattern archiver instance
+pattern_archiver = PatternArchiver(settings.PATTERN_ARCHIVE_MIN_SCORE, settings.PATTERN_ARCHIVE_BATCH_SIZE)
@@ -0,0 +1,364 @@
+"""
+In-process index of denial patterns.
+
+The DenialPattern table is small and read on every appeal and denial explanation,
+so lookups are served from memory. The index is loaded on first use (or at
+startup), updated write-through by record_denial_pattern, and reloaded when
+another process signals a change by touching PATTERN_INDEX_SIGNAL_FILE.
+
+Besides exact lookups, search() ranks patterns of the same payer (after alias
+normalization in utils/fuzzy_match.py) whose procedure only resembles the query.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, DenialPattern
+from utils.decay import decayed_score
+from utils.fuzzy_match import canonical_denial_code, canonical_insurer, canonical_procedure, similarity
+
+logger = logging.getLogger(__name__)
+
+PatternKey = Tuple[str, str, str]
+
+# Indexes derived from this one catch up by re-reading patterns whose last_seen is
+# newer than their previous sync minus this overlap, which covers write-behind
+# delay and clock skew between workers (re-reading a pattern is harmless)
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def normalize_part(value: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of one key part."""
+    return " ".join(str(value).split()).casefold() if value else ""
+
+
+def pattern_key(insurance: Optional[str], denial_code: Optional[str], procedure: Optional[str]) -> PatternKey:
+    return normalize_part(insurance), normalize_part(denial_code), normalize_part(procedure)
+
+
+@dataclass(frozen=True)
+class PatternEntry:
+    """Immutable view of one pattern (rows that normalize to the same key are merged)."""
+    id: int
+    insurance: str
+    denial_code: str
+    procedure: str
+    occurrence_count: int
+    missing_docs: Tuple[str, ...]
+    resolved_by: Tuple[str, ...]
+    last_seen: Optional[datetime]
+    decay_weight: float = 0.0  # See utils/decay.py; higher means more (and more recent) occurrences
+
+    @property
+    def score(self) -> float:
+        """Time-decayed occurrence score as of now."""
+        return decayed_score(self.decay_weight)
+
+
+@dataclass(frozen=True)
+class PatternMatch:
+    """A fuzzy search result: the pattern and how closely it matched (0..1)."""
+    entry: PatternEntry
+    score: float  # Procedure similarity (1.0 when the query names no procedure)
+    procedure_score: Optional[float]
+
+    def to_dict(self) -> dict:
+        return {
+            "insurance": self.entry.insurance,
+            "denial_code": self.entry.denial_code,
+            "procedure": self.entry.procedure,
+            "occurrence_count": self.entry.occurrence_count,
+            "decayed_score": round(self.entry.score, 3),
+            "score": round(self.score, 3),
+        }
+
+
+def _entry_from_row(row) -> PatternEntry:
+    return PatternEntry(
+        id=row.id,
+        insurance=row.insurance,
+        denial_code=row.denial_code,
+        procedure=row.procedure,
+        occurrence_count=row.occurrence_count or 0,
+        missing_docs=tuple(row.missing_docs or ()),
+        resolved_by=tuple(row.resolved_by or ()),
+        last_seen=row.last_seen,
+        decay_weight=row.decay_weight or 0.0
+    )
+
+
+def _merge(entries: List[PatternEntry]) -> PatternEntry:
+    if len(entries) == 1:
+        return entries[0]
+    entries = sorted(entries, key=lambda e: e.id)
+    first = entries[0]
+    return PatternEntry(
+        id=first.id,
+        insurance=first.insurance,
+        denial_code=first.denial_code,
+        procedure=first.procedure,
+        occurrence_count=sum(e.occurrence_count for e in entries),
+        missing_docs=tuple(dict.fromkeys(doc for e in entries for doc in e.missing_docs)),
+        resolved_by=tuple(dict.fromkeys(fix for e in entries for fix in e.resolved_by)),
+        last_seen=max((e.last_seen for e in entries if e.last_seen), default=None),
+        decay_weight=sum(e.decay_weight for e in entries)
+    )
+
+
+class PatternIndex:
+    """Denial patterns keyed by normalized (insurance, denial code, procedure)."""
+
+    def __init__(self, signal_path: Path, check_interval: float = 1.0, max_age: float = 300.0):
+        self.signal_path = signal_path
+        self.check_interval = check_interval  # How often to look at the signal file
+        self.max_age = max_age  # Full reload at least this often, as a safety net
+        self._lock = threading.Lock()
+        self._rows: Dict[int, PatternEntry] = {}
+        self._ids_by_key: Dict[PatternKey, Set[int]] = {}
+        self._by_key: Dict[PatternKey, PatternEntry] = {}
+        # (insurance, denial_code) -> keys, for lookups without a procedure
+        self._by_code: Dict[Tuple[str, str], Set[PatternKey]] = {}
+        # Fuzzy search: (canonical denial code, canonical insurer) -> keys, and the
+        # canonical procedure of each key
+        self._fuzzy: Dict[Tuple[str, str], Set[PatternKey]] = {}
+        self._procedures: Dict[PatternKey, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._next_check = 0.0
+        self._seen_signal: Optional[int] = None
+        self.generation = 0  # Incremented on every full load, for indexes derived from this one
+        self.stats = {
+            "loads": 0, "lookups": 0, "hits": 0, "fuzzy_searches": 0, "write_through": 0, "last_load_ms": 0.0
+        }
+
+    # Loading and invalidation
+
+    def _signal(self) -> Optional[int]:
+        try:
+            return os.stat(self.signal_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self, db: Optional[Session] = None):
+        """(Re)build the index from the database."""
+        start = time.perf_counter()
+        signal = self._signal()
+        local = db is None
+        db = db or SessionLocal()
+        try:
+            rows = db.query(
+                DenialPattern.id, DenialPattern.insurance, DenialPattern.denial_code, DenialPattern.procedure,
+                DenialPattern.occurrence_count, DenialPattern.missing_docs, DenialPattern.resolved_by,
+                DenialPattern.last_seen, DenialPattern.decay_weight
+            ).all()
+        finally:
+            if local:
+                db.close()
+
+        entries = {row.id: _entry_from_row(row) for row in rows}
+        with self._lock:
+            self._rows = entries
+            self._ids_by_key = {}
+            self._by_code = {}
+            self._fuzzy = {}
+            self._procedures = {}
+            for entry in entries.values():
+                key = pattern_key(entry.insurance, entry.denial_code, entry.procedure)
+                self._ids_by_key.setdefault(key, set()).add(entry.id)
+                self._add_key(key, entry)
+            self._by_key = {
+                key: _merge([entries[i] for i in ids]) for key, ids in self._ids_by_key.items()
+            }
+            self._loaded_at = time.time()
+            self._seen_signal = signal
+            self.generation += 1
+            self.stats["loads"] += 1
+            self.stats["last_load_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        logger.info(f"Pattern index loaded: {len(entries)} patterns in {self.stats['last_load_ms']}ms")
+
+    def invalidate(self):
+        """Drop the index; the next lookup reloads it."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_fresh(self, db: Optional[Session]):
+        now = time.time()
+        if self._loaded_at is None or now - self._loaded_at > self.max_age:
+            self.load(db)
+            return
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        if self._signal() != self._seen_signal:
+            logger.info("Pattern index changed in another process, reloading")
+            self.load(db)
+
+    def refresh(self, db: Optional[Session] = None):
+        """Load the index, or reload it if it is stale or another process changed patterns."""
+        self._ensure_fresh(db)
+
+    def _notify_other_processes(self):
+        """Touch the signal file so other workers reload on their next check."""
+        before = self._signal()
+        try:
+            self.signal_path.parent.mkdir(parents=True, exist_ok=True)
+            self.signal_path.touch()
+        except OSError as e:
+            logger.warning(f"Could not signal pattern index change: {e}")
+            return
+        # Our own write needs no reload, unless someone else wrote since we last looked
+        if before == self._seen_signal:
+            self._seen_signal = self._signal()
+
+    # Write-through
+
+    def apply(self, rows: Iterable):
+        """Insert or replace patterns (rows with DenialPattern's columns) after they were committed."""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._lock:
+            if self._loaded_at is not None:
+                for row in rows:
+                    entry = _entry_from_row(row)
+                    old = self._rows.get(entry.id)
+                    key = pattern_key(entry.insurance, entry.denial_code, entry.procedure)
+                    if old is not None:
+                        old_key = pattern_key(old.insurance, old.denial_code, old.procedure)
+                        if old_key != key:
+                            self._drop(old.id, old_key)
+                    self._rows[entry.id] = entry
+                    self._ids_by_key.setdefault(key, set()).add(entry.id)
+                    self._add_key(key, entry)
+                    self._by_key[key] = _merge([self._rows[i] for i in self._ids_by_key[key]])
+                self.stats["write_through"] += len(rows)
+        self._notify_other_processes()
+
+    def remove(self, pattern_ids: Iterable[int]):
+        """Forget patterns deleted from the database."""
+        with self._lock:
+            for pattern_id in pattern_ids:
+                old = self._rows.get(pattern_id)
+                if old is not None:
+                    self._drop(pattern_id, pattern_key(old.insurance, old.denial_code, old.procedure))
+        self._notify_other_processes()
+
+    def _add_key(self, key: PatternKey, entry: PatternEntry):
+        self._by_code.setdefault(key[:2], set()).add(key)
+        if key in self._procedures:
+            return
+        insurer = canonical_insurer(entry.insurance)
+        self._fuzzy.setdefault((canonical_denial_code(entry.denial_code), insurer), set()).add(key)
+        self._procedures[key] = canonical_procedure(entry.procedure)
+
+    def _drop(self, pattern_id: int, key: PatternKey):
+        self._rows.pop(pattern_id, None)
+        ids = self._ids_by_key.get(key, set())
+        ids.discard(pattern_id)
+        if ids:
+            self._by_key[key] = _merge([self._rows[i] for i in ids])
+            return
+        self._ids_by_key.pop(key, None)
+        self._by_key.pop(key, None)
+        keys = self._by_code.get(key[:2], set())
+        keys.discard(key)
+        if not keys:
+            self._by_code.pop(key[:2], None)
+        if self._procedures.pop(key, None) is not None:
+            fuzzy_key = (canonical_denial_code(key[1]), canonical_insurer(key[0]))
+            keys = self._fuzzy.get(fuzzy_key, set())
+            keys.discard(key)
+            if not keys:
+                self._fuzzy.pop(fuzzy_key, None)
+
+    # Lookups
+
+    def lookup(
+        self,
+        insurance: str,
+        denial_code: str,
+        procedure: Optional[str] = None,
+        db: Optional[Session] = None
+    ) -> Optional[PatternEntry]:
+        """
+        Find the pattern for an insurer and denial code, narrowed to the procedure
+        when one is given (otherwise the one with the highest decayed score).
+        """
+        self._ensure_fresh(db)
+        self.stats["lookups"] += 1
+        if procedure:
+            entry = self._by_key.get(pattern_key(insurance, denial_code, procedure))
+        else:
+            keys = self._by_code.get(pattern_key(insurance, denial_code, None)[:2], ())
+            entries = [self._by_key[key] for key in list(keys) if key in self._by_key]
+            entry = min(entries, key=lambda e: (-e.decay_weight, e.id)) if entries else None
+        if entry is not None:
+            self.stats["hits"] += 1
+        return entry
+
+    def get(self, pattern_id: int) -> Optional[PatternEntry]:
+        """The (merged) pattern a row id belongs to, if indexed."""
+        row = self._rows.get(pattern_id)
+        if row is None:
+            return None
+        return self._by_key.get(pattern_key(row.insurance, row.denial_code, row.procedure))
+
+    def search(
+        self,
+        insurance: str,
+        denial_code: str,
+        procedure: Optional[str] = None,
+        limit: int = 5,
+        min_score: float = 0.6,
+        db: Optional[Session] = None
+    ) -> List[PatternMatch]:
+        """
+        Rank patterns for the same denial code and payer whose procedure resembles
+        the query. Payers must match after alias normalization ("BlueCross PPO"
+        finds "BlueCross BlueShield"); names are never compared by similarity, since
+        similar names are often different payers ("Medicare" and "Medicaid").
+        Procedures are compared by trigram similarity ("Abdominal CT" finds "CT Abdomen").
+
+        Returns:
+            Up to limit matches scoring at least min_score, best first (equal
+            scores by decayed occurrence score)
+        """
+        self._ensure_fresh(db)
+        self.stats["fuzzy_searches"] += 1
+        code = canonical_denial_code(denial_code)
+        wanted_procedure = canonical_procedure(procedure) if procedure else None
+
+        matches = []
+        for key in tuple(self._fuzzy.get((code, canonical_insurer(insurance)), ())):
+            entry = self._by_key.get(key)
+            if entry is None:
+                continue
+            if wanted_procedure is None:
+                procedure_score, score = None, 1.0
+            else:
+                procedure_score = score = similarity(wanted_procedure, self._procedures.get(key, ""))
+            if score >= min_score:
+                matches.append(PatternMatch(entry, score, procedure_score))
+        matches.sort(key=lambda m: (-m.score, -m.entry.decay_weight, m.entry.id))
+        return matches[:limit]
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def metrics(self) -> dict:
+        return {**self.stats, "patterns": len(self._by_key), "loaded": self._loaded_at is not None}
+
+
+# Global pattern index instance
+pattern_index = PatternIndex(
+    settings.PATTERN_INDEX_SIGNAL_FILE,
+    settings.PATTERN_INDEX_CHECK_INTERVAL,
+    settings.PATTERN_INDEX_MAX_AGE
+)
@@ -0,0 +1,189 @@
+"""
+Write-behind queue for denial pattern learning.
+
+Appeal workflows queue pattern observations here instead of writing them on the
+request path. A background thread collects them for up to PATTERN_FLUSH_INTERVAL
+seconds (or PATTERN_FLUSH_BATCH_SIZE observations) and writes each batch in one
+transaction with its own session. stop() drains the queue on shutdown; an atexit
+hook does the same for scripts that never call it.
+"""
+from collections import deque
+from typing import Deque, List, Optional
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from config import settings
+from database import SessionLocal
+from utils.memory_graph import pattern_values, write_denial_patterns
+
+logger = logging.getLogger(__name__)
+
+# Attempts per batch before its observations are dropped
+MAX_ATTEMPTS = 3
+
+
+class PatternWriter:
+    """Background writer that batches denial pattern upserts."""
+
+    def __init__(self, flush_interval: float = 1.0, batch_size: int = 200, max_queue: int = 10000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._retry: Deque[tuple] = deque()  # (attempts, batch) that failed to write
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0  # Submitted but not yet written or dropped
+        self.stats = {
+            "enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "failed_batches": 0,
+            "last_batch_size": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0
+        }
+
+    def start(self):
+        """Start the writer thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="pattern-writer", daemon=True)
+            self._thread.start()
+        logger.info(f"Pattern writer started (flush every {self.flush_interval}s, batches of {self.batch_size})")
+
+    def submit(
+        self,
+        insurance: str,
+        procedure: str,
+        cpt_code: str,
+        denial_code: str,
+        missing_docs: list,
+        resolved_by: list,
+        denial_reason: str = None
+    ):
+        """
+        Queue one pattern observation (same arguments as record_denial_pattern).
+        Blocks only when the queue is full, which applies backpressure rather than
+        losing observations.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        values = pattern_values(insurance, procedure, cpt_code, denial_code, missing_docs, resolved_by, denial_reason)
+        with self._lock:
+            self._pending += 1
+            self.stats["enqueued"] += 1
+        self._queue.put(values)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty() and not self._retry):
+            batch = self._collect()
+            if batch:
+                self._flush(batch, attempts=1)
+            if self._retry:
+                attempts, failed = self._retry.popleft()
+                self._flush(failed, attempts)
+
+    def _collect(self) -> List[dict]:
+        """Block for the first observation, then gather more until the interval or batch size is reached."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Whatever is already queued goes in this batch, up to its size
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[dict], attempts: int):
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            written = write_denial_patterns(db, batch)
+        except Exception as e:
+            logger.error(f"Pattern batch of {len(batch)} failed (attempt {attempts}/{MAX_ATTEMPTS}): {e}")
+            with self._lock:
+                self.stats["failed_batches"] += 1
+            if attempts < MAX_ATTEMPTS:
+                self._retry.append((attempts + 1, batch))
+                if not self._stopping.is_set():
+                    time.sleep(self.flush_interval)
+                return
+            self._done(len(batch), dropped=True)
+            return
+        finally:
+            db.close()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["last_batch_size"] = len(batch)
+            self.stats["last_flush_ms"] = round(elapsed_ms, 3)
+            self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 3)
+            self.stats["total_flush_ms"] += elapsed_ms
+        logger.info(f"Flushed {len(batch)} pattern observations ({written} patterns) in {elapsed_ms:.1f}ms")
+        self._done(len(batch), dropped=False)
+
+    def _done(self, count: int, dropped: bool):
+        with self._idle:
+            self._pending -= count
+            self.stats["dropped" if dropped else "written"] += count
+            self._idle.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything submitted so far has been written (or dropped).
+
+        Returns:
+            True if the queue drained within the timeout
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout)
+
+    def stop(self, timeout: float = 30.0):
+        """Write out everything queued, then stop the writer thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping.set()
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Pattern writer did not drain within {timeout}s; {self._pending} observations unwritten")
+        else:
+            logger.info("Pattern writer stopped, queue drained")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            pending = self._pending
+        total_ms = stats.pop("total_flush_ms")
+        stats["avg_flush_ms"] = round(total_ms / stats["batches"], 3) if stats["batches"] else 0.0
+        return {
+            **stats,
+            "queue_depth": self._queue.qsize(),
+            "pending": pending,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "flush_interval_seconds": self.flush_interval,
+        }
+
+
+# Global pattern writer instance
+pattern_writer = PatternWriter(
+    settings.PATTERN_FLUSH_INTERVAL,
+    settings.PATTERN_FLUSH_BATCH_SIZE,
+    settings.PATTERN_QUEUE_MAX
+)
+atexit.register(pattern_writer.stop)
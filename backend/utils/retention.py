@@ -0,0 +1,409 @@
+"""
+Retention and garbage collection for uploads and generated appeals.
+
+A background sweeper periodically deletes documents (files and UploadedDocument /
+ExtractedData rows) and generated appeal PDFs (files and GeneratedAppeal rows)
+older than their category's retention period, in batches of RETENTION_BATCH_SIZE.
+Files and blobs with no row left referencing them are collected too, as are
+abandoned chunked uploads, and blobs and appeal PDFs older than
+ARCHIVE_AFTER_DAYS are compressed in place (once: formats that are compressed
+already are skipped, which leaves only BMP uploads, and files that don't shrink
+are recorded in archive_skips).
+Every operation is idempotent, so several API workers may sweep. Cold denial
+patterns are archived on their own schedule (utils/pattern_archiver.py).
+"""
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import shutil
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from database import SessionLocal, UploadedDocument, ExtractedData, GeneratedAppeal, ArchiveSkip
+from utils.chunked_uploads import chunked_uploads
+from utils.upload_manifest import upload_manifest
+from utils.upload_storage import ALLOWED_EXTENSIONS, safe_category_name
+from utils.blob_store import blob_store
+from utils.compression import (
+    ARCHIVE_SUFFIXES, INCOMPRESSIBLE_EXTENSIONS, archive_path, compress_file, original_path
+)
+
+logger = logging.getLogger(__name__)
+
+APPEAL_CATEGORY = "Appeal"  # Folder of generated appeal PDFs (routes/appeal.py)
+
+# Stored formats that file archiving can shrink. Of the allowed upload types only BMP
+# is stored uncompressed, and appeal PDFs never qualify.
+ARCHIVABLE_UPLOAD_EXTENSIONS = frozenset(ALLOWED_EXTENSIONS) - INCOMPRESSIBLE_EXTENSIONS
+ARCHIVABLE_APPEAL_EXTENSIONS = frozenset({".pdf"}) - INCOMPRESSIBLE_EXTENSIONS
+
+
+def parse_retention_days(spec: str) -> Dict[str, int]:
+    """
+    Parse a "Category=days,Category=days" setting.
+
+    Returns:
+        Dictionary of category -> retention in days (0 keeps forever)
+    """
+    days = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        category, _, value = item.partition("=")
+        try:
+            days[safe_category_name(category.strip())] = int(value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid retention setting: {item!r}")
+    return days
+
+
+@dataclass
+class SweepResult:
+    """What one sweep (or clear) removed."""
+    files_deleted: int = 0
+    rows_deleted: int = 0
+    bytes_reclaimed: int = 0
+    chunked_uploads_purged: int = 0
+    files_archived: int = 0
+    archive_bytes_saved: int = 0
+
+    def add(self, other: "SweepResult"):
+        self.files_deleted += other.files_deleted
+        self.rows_deleted += other.rows_deleted
+        self.bytes_reclaimed += other.bytes_reclaimed
+        self.chunked_uploads_purged += other.chunked_uploads_purged
+        self.files_archived += other.files_archived
+        self.archive_bytes_saved += other.archive_bytes_saved
+
+
+@dataclass
+class RetentionMetrics:
+    """Cumulative sweeper metrics since the process started."""
+    runs: int = 0
+    last_run_at: Optional[str] = None
+    last_duration_seconds: float = 0.0
+    last_result: dict = field(default_factory=dict)
+    last_error: Optional[str] = None
+    totals: SweepResult = field(default_factory=SweepResult)
+
+
+def _unlink(path: Path, result: "SweepResult"):
+    """Delete a file and its archived copy, if present, and count them in result."""
+    path = original_path(path)
+    for candidate in [path] + [path.with_name(path.name + suffix) for suffix in ARCHIVE_SUFFIXES]:
+        try:
+            size = candidate.stat().st_size
+            candidate.unlink()
+        except FileNotFoundError:
+            continue
+        result.files_deleted += 1
+        result.bytes_reclaimed += size
+
+
+class RetentionSweeper:
+    """Deletes expired uploads and appeals together with their rows."""
+
+    def __init__(self, upload_folder: Path, retention_days: Dict[str, int], default_days: int, batch_size: int):
+        self.upload_folder = upload_folder
+        self.retention_days = retention_days
+        self.default_days = default_days
+        self.batch_size = batch_size
+        self.metrics = RetentionMetrics()
+        self._task: Optional[asyncio.Task] = None
+
+    def days_for(self, category: str) -> int:
+        return self.retention_days.get(category, self.default_days)
+
+    def _categories(self) -> List[str]:
+        categories = set(self.retention_days)
+        if self.upload_folder.exists():
+            categories.update(p.name for p in self.upload_folder.iterdir() if p.is_dir() and not p.name.startswith("."))
+        return sorted(categories)
+
+    def _delete_documents(self, db, rows) -> SweepResult:
+        """Delete one batch of (id, file_path) document rows and their files."""
+        result = SweepResult()
+        ids = [row.id for row in rows]
+        db.query(ExtractedData).filter(ExtractedData.document_id.in_(ids)).delete(synchronize_session=False)
+        result.rows_deleted += db.query(UploadedDocument).filter(
+            UploadedDocument.id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+        # Rows go first: a crash in between leaves orphan files, which later sweeps collect.
+        # Blobs shared with other documents stay until their last row is gone.
+        for path in blob_store.release(db, [row.file_path for row in rows]):
+            _unlink(path, result)
+        return result
+
+    def _delete_appeals(self, db, rows) -> SweepResult:
+        """Delete one batch of (id, pdf_path) appeal rows and their PDFs."""
+        result = SweepResult()
+        result.rows_deleted += db.query(GeneratedAppeal).filter(
+            GeneratedAppeal.id.in_([row.id for row in rows])
+        ).delete(synchronize_session=False)
+        db.commit()
+        for row in rows:
+            if row.pdf_path:
+                _unlink(Path(row.pdf_path), result)
+        return result
+
+    def _expire_documents(self, db, category: str, cutoff: datetime) -> SweepResult:
+        result = SweepResult()
+        while True:
+            # Served by ix_uploaded_documents_category_uploaded; pending OCR is left alone
+            rows = db.query(UploadedDocument.id, UploadedDocument.file_path).filter(
+                UploadedDocument.category == category,
+                UploadedDocument.upload_timestamp < cutoff,
+                UploadedDocument.ocr_status.notin_(("queued", "processing")) | UploadedDocument.ocr_status.is_(None)
+            ).order_by(UploadedDocument.id).limit(self.batch_size).all()
+            if not rows:
+                return result
+            result.add(self._delete_documents(db, rows))
+
+    def _expire_appeals(self, db, cutoff: datetime) -> SweepResult:
+        result = SweepResult()
+        while True:
+            rows = db.query(GeneratedAppeal.id, GeneratedAppeal.pdf_path).filter(
+                GeneratedAppeal.generated_at < cutoff
+            ).order_by(GeneratedAppeal.id).limit(self.batch_size).all()
+            if not rows:
+                return result
+            result.add(self._delete_appeals(db, rows))
+
+    def _collect_orphan_files(self, db, directory: Path, max_age_seconds: float) -> SweepResult:
+        """Delete files older than max_age_seconds that no document or appeal row references."""
+        result = SweepResult()
+        if not directory.exists():
+            return result
+        cutoff_ts = time.time() - max_age_seconds
+        candidates = [
+            entry.path for entry in os.scandir(directory)
+            if entry.is_file() and entry.stat().st_mtime < cutoff_ts
+        ]
+        for start in range(0, len(candidates), self.batch_size):
+            # Archived files are referenced under their original name
+            batch = [str(original_path(Path(path))) for path in candidates[start:start + self.batch_size]]
+            referenced = {row.file_path for row in db.query(UploadedDocument.file_path).filter(
+                UploadedDocument.file_path.in_(batch)
+            )}
+            referenced.update(row.pdf_path for row in db.query(GeneratedAppeal.pdf_path).filter(
+                GeneratedAppeal.pdf_path.in_(batch)
+            ))
+            for path in batch:
+                if path not in referenced:
+                    _unlink(Path(path), result)
+        return result
+
+    def _collect_orphan_blobs(self, db) -> SweepResult:
+        """Delete blobs (and abandoned temp files) that no document references."""
+        result = SweepResult()
+        stale = [str(path) for path in blob_store.iter_stale()]
+        for start in range(0, len(stale), self.batch_size):
+            for path in blob_store.release(db, stale[start:start + self.batch_size]):
+                _unlink(path, result)
+        return result
+
+    def _skipped_files(self, db, directory: Path, files: List[Path]) -> set:
+        """
+        Paths in directory the archiver already tried and kept; rows of files that
+        are gone are dropped.
+        """
+        prefix = f"{directory}{os.sep}"
+        # Range over the primary key: every path that starts with prefix
+        rows = db.query(ArchiveSkip.path).filter(
+            ArchiveSkip.path >= prefix, ArchiveSkip.path < prefix[:-1] + chr(ord(os.sep) + 1)
+        )
+        skipped = {row.path for row in rows if Path(row.path).parent == directory}
+        gone = skipped - {str(path) for path in files}
+        if gone:
+            db.query(ArchiveSkip).filter(ArchiveSkip.path.in_(gone)).delete(synchronize_session=False)
+            db.commit()
+        return skipped - gone
+
+    def _record_skipped(self, db, paths: List[str]):
+        db.add_all(ArchiveSkip(path=path) for path in paths)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker recorded them first
+            db.rollback()
+
+    def _archive_files(self, db, max_age_seconds: float) -> SweepResult:
+        """
+        Compress blobs and appeal PDFs untouched for max_age_seconds, where that saves
+        space. Already-compressed formats are never read, so in practice only BMP
+        uploads are archived; directories that can hold no archivable format are not
+        walked at all. A file that did not compress well is recorded in archive_skips
+        so it is only tried once.
+        """
+        result = SweepResult()
+        cutoff = time.time() - max_age_seconds
+        directories = [self.upload_folder / APPEAL_CATEGORY] if ARCHIVABLE_APPEAL_EXTENSIONS else []
+        if ARCHIVABLE_UPLOAD_EXTENSIONS and blob_store.root.exists():
+            directories += [Path(d) for d, _, _ in os.walk(blob_store.root) if Path(d) != blob_store.tmp_dir]
+        for directory in directories:
+            if not directory.exists():
+                continue
+            files = [Path(entry.path) for entry in os.scandir(directory) if entry.is_file()]
+            candidates = [
+                path for path in files
+                if original_path(path) == path and path.suffix != ".tmp"
+                and path.suffix.lower() not in INCOMPRESSIBLE_EXTENSIONS
+            ]
+            if not files:
+                continue
+            skipped = self._skipped_files(db, directory, files)
+            kept = []
+            for path in candidates:
+                if str(path) in skipped:
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime >= cutoff:
+                    continue
+                if archive_path(path) is not None:
+                    # Re-uploaded after it was archived; the archive already holds it
+                    path.unlink(missing_ok=True)
+                    result.archive_bytes_saved += stat.st_size
+                    continue
+                try:
+                    archived = compress_file(path)
+                except OSError as e:
+                    logger.warning(f"Could not archive {path}: {e}")
+                    continue
+                if archived is None:
+                    kept.append(str(path))
+                else:
+                    result.files_archived += 1
+                    result.archive_bytes_saved += stat.st_size - archived.stat().st_size
+            if kept:
+                self._record_skipped(db, kept)
+        return result
+
+    def sweep_once(self) -> SweepResult:
+        """Run one retention pass over every category (blocking; call from a thread)."""
+        start = time.time()
+        result = SweepResult()
+        now = datetime.utcnow()
+        try:
+            with SessionLocal() as db:
+                for category in self._categories():
+                    days = self.days_for(category)
+                    if days <= 0:
+                        continue
+                    cutoff = now - timedelta(days=days)
+                    result.add(self._expire_documents(db, category, cutoff))
+                    if category == APPEAL_CATEGORY:
+                        result.add(self._expire_appeals(db, cutoff))
+                    result.add(self._collect_orphan_files(db, self.upload_folder / category, days * 86400))
+                result.add(self._collect_orphan_blobs(db))
+                if settings.ARCHIVE_AFTER_DAYS > 0:
+                    result.add(self._archive_files(db, settings.ARCHIVE_AFTER_DAYS * 86400))
+            result.chunked_uploads_purged = chunked_uploads.purge_stale(settings.CHUNKED_UPLOAD_TTL_SECONDS)
+            self.metrics.last_error = None
+        except Exception as e:
+            logger.error(f"Retention sweep failed: {e}")
+            self.metrics.last_error = str(e)
+        finally:
+            upload_manifest.invalidate()
+
+        duration = time.time() - start
+        self.metrics.runs += 1
+        self.metrics.last_run_at = now.isoformat()
+        self.metrics.last_duration_seconds = round(duration, 3)
+        self.metrics.last_result = asdict(result)
+        self.metrics.totals.add(result)
+        logger.info(
+            f"[TIMING] Retention sweep in {duration:.2f}s: {result.rows_deleted} rows, "
+            f"{result.files_deleted} files, {result.bytes_reclaimed} bytes reclaimed"
+        )
+        return result
+
+    def clear(self, category: Optional[str] = None) -> SweepResult:
+        """
+        Delete every document (and, for the Appeal folder or a full clear, every
+        generated appeal) together with the files, in batches.
+
+        Args:
+            category: Upload category to clear, or None for everything
+        """
+        result = SweepResult()
+        with SessionLocal() as db:
+            while True:
+                query = db.query(UploadedDocument.id, UploadedDocument.file_path)
+                if category:
+                    query = query.filter(UploadedDocument.category == category)
+                rows = query.order_by(UploadedDocument.id).limit(self.batch_size).all()
+                if not rows:
+                    break
+                result.add(self._delete_documents(db, rows))
+
+            if category in (None, APPEAL_CATEGORY):
+                while True:
+                    rows = db.query(GeneratedAppeal.id, GeneratedAppeal.pdf_path).order_by(
+                        GeneratedAppeal.id
+                    ).limit(self.batch_size).all()
+                    if not rows:
+                        break
+                    result.add(self._delete_appeals(db, rows))
+
+        # Whatever is left on disk has no rows any more. The blob store and chunked
+        # uploads (.blobs, .chunked) may hold uploads still in progress: released blobs
+        # went with their rows above, and the sweeper collects the rest once stale.
+        target = self.upload_folder / category if category else self.upload_folder
+        if target.exists():
+            for entry in os.scandir(target):
+                if not category and entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    files = [p for p in Path(entry.path).rglob("*") if p.is_file()]
+                    result.files_deleted += len(files)
+                    result.bytes_reclaimed += sum(p.stat().st_size for p in files)
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    _unlink(Path(entry.path), result)
+        upload_manifest.invalidate()
+        return result
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.to_thread(self.sweep_once)
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float):
+        """Start the periodic sweep on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(interval))
+            logger.info(f"Retention sweeper started (every {interval:.0f}s, retention {self.retention_days})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics_dict(self) -> dict:
+        metrics = asdict(self.metrics)
+        metrics["retention_days"] = {category: self.days_for(category) for category in self._categories()}
+        metrics["default_days"] = self.default_days
+        return metrics
+
+
+# Global retention sweeper instance
+retention = RetentionSweeper(
+    settings.UPLOAD_FOLDER,
+    parse_retention_days(settings.RETENTION_CATEGORY_DAYS),
+    settings.RETENTION_DEFAULT_DAYS,
+    settings.RETENTION_BATCH_SIZE
+)
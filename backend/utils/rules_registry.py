@@ -0,0 +1,350 @@
+"""
+In-memory registry of insurance plan rules.
+
+Every plan file in INSURANCE_RULES_DIR is parsed and validated once (at startup or
+on first use) into an InsurancePlan. Lookups by plan id or name and the plan list
+are dictionary reads. At most every RULES_CHECK_INTERVAL seconds the directory is
+stat-ed; when a file was added, removed or its mtime/size changed, the registry is
+rebuilt and swapped in as a whole, so a request never sees half a reload. A file
+that fails to parse or validate (e.g. caught mid-save) keeps its previous version.
+
+Each plan also indexes its procedure rules by CPT code and by canonical procedure
+name, so relevant_rules() can hand the LLM prompts only the rules for the codes a
+claim concerns plus the general plan clauses, instead of the whole plan file.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from config import settings
+from utils.fuzzy_match import TrigramIndex, canonical_procedure
+
+logger = logging.getLogger(__name__)
+
+# File name -> (mtime_ns, size), used to notice edits
+Signature = Dict[str, Tuple[int, int]]
+
+# CPT (5 digits, or 4 digits + F/T/U) and HCPCS level II (letter + 4 digits) codes
+_CPT_CODE = re.compile(r"\b(?:\d{5}|\d{4}[FTU]|[A-V]\d{4})\b")
+# Extracted claim fields that carry CPT codes or name the procedure
+CPT_FIELDS = ("cpt_code",)
+PROCEDURE_FIELDS = ("procedure_name", "procedure", "recommended_procedure")
+# Minimum trigram similarity for a procedure name to select a rule when no CPT code matched
+PROCEDURE_MATCH_MIN_SCORE = 0.6
+
+
+class RulesValidationError(ValueError):
+    """A plan file does not have the expected structure."""
+
+
+def plan_id(name: str) -> str:
+    """Plan id (rule file stem) for a plan name as the frontend sends it ("Aetna PPO" -> "aetna_ppo")."""
+    return name.strip().lower().replace(" ", "_")
+
+
+def cpt_codes_in(value) -> List[str]:
+    """CPT/HCPCS codes mentioned in a field value ("72148-26, 72149" -> ["72148", "72149"])."""
+    return _CPT_CODE.findall(str(value).upper()) if value else []
+
+
+def claim_codes(claim_fields: Iterable[dict]) -> Tuple[List[str], List[str]]:
+    """CPT codes and procedure names found in the extracted fields of a claim's documents."""
+    cpt_codes, procedures = [], []
+    for fields in claim_fields:
+        if not isinstance(fields, dict):
+            continue
+        for name in CPT_FIELDS:
+            cpt_codes.extend(cpt_codes_in(fields.get(name)))
+        for name in PROCEDURE_FIELDS:
+            if isinstance(fields.get(name), str) and fields[name].strip():
+                procedures.append(fields[name])
+    return list(dict.fromkeys(cpt_codes)), list(dict.fromkeys(procedures))
+
+
+@dataclass(frozen=True)
+class ProcedureRule:
+    """Coverage rule for one CPT code."""
+    cpt_code: str
+    procedure: str
+    category: str
+    requirements: Tuple[str, ...]
+    prior_authorization_required: bool
+    notes: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class InsurancePlan:
+    """A parsed and validated plan file."""
+    id: str
+    name: str
+    plan_type: str
+    procedure_rules: Mapping[str, ProcedureRule]
+    denial_codes: Mapping[str, str]
+    notes: Optional[str]
+    rules: dict  # The plan file as parsed, passed to the agents and LLM prompts (treat as read-only)
+    path: Path
+    # CPT code as written in the claim -> procedure_rules key, canonical procedure name -> keys
+    cpt_index: Mapping[str, str]
+    procedure_index: Mapping[str, Tuple[str, ...]]
+    procedure_names: TrigramIndex
+
+    def summary(self) -> dict:
+        return {"id": self.id, "name": self.name, "procedure_count": len(self.procedure_rules)}
+
+    def match(self, cpt_codes: Iterable[str] = (), procedures: Iterable[str] = ()) -> List[str]:
+        """
+        procedure_rules keys that apply to a claim: its CPT codes, or, when none of
+        them has a rule, the rules whose procedure name resembles the claimed one.
+        """
+        keys = [self.cpt_index[code] for code in cpt_codes if code in self.cpt_index]
+        if not keys:
+            for procedure in procedures:
+                for name, _ in self.procedure_names.search(
+                    canonical_procedure(procedure), min_score=PROCEDURE_MATCH_MIN_SCORE, limit=1
+                ):
+                    keys.extend(self.procedure_index[name])
+        return list(dict.fromkeys(keys))
+
+    def slice(self, cpt_codes: Iterable[str] = (), procedures: Iterable[str] = ()) -> dict:
+        """
+        The plan's general clauses (name, plan type, denial codes, notes) with only
+        the procedure rules that apply to the claim. A claim no rule applies to gets
+        the whole plan, so the model can still judge it against every rule.
+        """
+        keys = self.match(cpt_codes, procedures)
+        if not keys:
+            return self.rules
+        all_rules = self.rules.get("procedure_rules", {})
+        return {
+            key: ({code: all_rules[code] for code in keys} if key == "procedure_rules" else value)
+            for key, value in self.rules.items()
+        }
+
+
+def _require(condition: bool, message: str):
+    if not condition:
+        raise RulesValidationError(message)
+
+
+def parse_plan(path: Path, data) -> InsurancePlan:
+    """
+    Validate a plan file's contents.
+
+    Raises:
+        RulesValidationError: if a required field is missing or has the wrong type
+    """
+    _require(isinstance(data, dict), "top level must be an object")
+    name = data.get("insurance", path.stem)
+    _require(isinstance(name, str) and name.strip() != "", "'insurance' must be a non-empty string")
+    procedure_rules = data.get("procedure_rules", {})
+    _require(isinstance(procedure_rules, dict), "'procedure_rules' must be an object keyed by CPT code")
+    denial_codes = data.get("denial_codes", {})
+    _require(isinstance(denial_codes, dict), "'denial_codes' must be an object")
+
+    procedures = {}
+    cpt_index: Dict[str, str] = {}
+    procedure_index: Dict[str, Tuple[str, ...]] = {}
+    for cpt_code, rule in procedure_rules.items():
+        where = f"procedure_rules[{cpt_code!r}]"
+        _require(isinstance(rule, dict), f"{where} must be an object")
+        requirements = rule.get("requirements", [])
+        _require(
+            isinstance(requirements, list) and all(isinstance(r, str) for r in requirements),
+            f"{where}.requirements must be a list of strings"
+        )
+        prior_auth = rule.get("prior_authorization_required", False)
+        _require(isinstance(prior_auth, bool), f"{where}.prior_authorization_required must be true or false")
+        procedures[str(cpt_code)] = ProcedureRule(
+            cpt_code=str(cpt_code),
+            procedure=str(rule.get("procedure", "")),
+            category=str(rule.get("category", "")),
+            requirements=tuple(requirements),
+            prior_authorization_required=prior_auth,
+            notes=rule.get("notes")
+        )
+        # Keys are matched as the claim writes them: upper case, without modifiers or spaces
+        for code in cpt_codes_in(cpt_code) or [str(cpt_code).strip().upper()]:
+            cpt_index.setdefault(code, str(cpt_code))
+        canonical = canonical_procedure(procedures[str(cpt_code)].procedure)
+        if canonical:
+            procedure_index[canonical] = procedure_index.get(canonical, ()) + (str(cpt_code),)
+
+    return InsurancePlan(
+        id=path.stem,
+        name=name,
+        plan_type=str(data.get("plan_type", "")),
+        procedure_rules=MappingProxyType(procedures),
+        denial_codes=MappingProxyType({str(k): str(v) for k, v in denial_codes.items()}),
+        notes=data.get("notes"),
+        rules=data,
+        path=path,
+        cpt_index=MappingProxyType(cpt_index),
+        procedure_index=MappingProxyType(procedure_index),
+        procedure_names=TrigramIndex(procedure_index)
+    )
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Everything a lookup needs, replaced as a unit on reload."""
+    plans: Dict[str, InsurancePlan]  # Plan id and plan_id(display name) -> plan
+    listing: Tuple[dict, ...]
+    signature: Signature
+
+
+class RulesRegistry:
+    """Parsed insurance plans, reloaded when the rule files change."""
+
+    def __init__(self, rules_dir: Path, check_interval: float = 2.0):
+        self.rules_dir = rules_dir
+        self.check_interval = check_interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()  # Serializes reloads; lookups never take it
+        self._next_check = 0.0
+        self.stats = {"loads": 0, "lookups": 0, "misses": 0, "invalid_files": 0, "last_load_ms": 0.0}
+
+    def _signature(self) -> Signature:
+        try:
+            entries = list(os.scandir(self.rules_dir))
+        except FileNotFoundError:
+            return {}
+        return {
+            entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in entries if entry.name.endswith(".json") and entry.is_file()
+        }
+
+    def load(self):
+        """(Re)parse every plan file and swap the new registry in."""
+        with self._lock:
+            self._load_locked(self._signature(), reparse=True)
+
+    def _load_locked(self, signature: Signature, reparse: bool = False):
+        start = time.perf_counter()
+        previous = {plan.path.name: plan for plan in self._snapshot.plans.values()} if self._snapshot else {}
+        # Files whose mtime and size are unchanged keep their parsed plan, unless reparsing all
+        unchanged = self._snapshot.signature if self._snapshot and not reparse else {}
+        by_id: Dict[str, InsurancePlan] = {}
+        for file_name in sorted(signature):
+            path = self.rules_dir / file_name
+            if signature[file_name] == unchanged.get(file_name) and file_name in previous:
+                by_id[path.stem] = previous[file_name]
+                continue
+            try:
+                with open(path, "r") as f:
+                    by_id[path.stem] = parse_plan(path, json.load(f))
+            except (OSError, ValueError) as e:
+                self.stats["invalid_files"] += 1
+                if file_name in previous:
+                    logger.error(f"Invalid insurance rules in {path}, keeping the previous version: {e}")
+                    by_id[path.stem] = previous[file_name]
+                else:
+                    logger.error(f"Invalid insurance rules in {path}, skipped: {e}")
+
+        plans = dict(by_id)
+        for plan in by_id.values():
+            plans.setdefault(plan_id(plan.name), plan)
+        self._snapshot = _Snapshot(
+            plans=plans,
+            listing=tuple(plan.summary() for plan in by_id.values()),
+            signature=signature
+        )
+        self._next_check = time.monotonic() + self.check_interval
+        self.stats["loads"] += 1
+        self.stats["last_load_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        logger.info(f"Insurance rules loaded: {len(by_id)} plans from {self.rules_dir} "
+                    f"in {self.stats['last_load_ms']}ms")
+
+    def check(self) -> bool:
+        """
+        Reload now if a rule file was added, removed or modified.
+
+        Returns:
+            True if the registry was (re)loaded
+        """
+        with self._lock:
+            signature = self._signature()
+            if self._snapshot is not None and signature == self._snapshot.signature:
+                self._next_check = time.monotonic() + self.check_interval
+                return False
+            if self._snapshot is not None:
+                logger.info("Insurance rule files changed, reloading")
+            self._load_locked(signature)
+            return True
+
+    def _current(self) -> _Snapshot:
+        if self._snapshot is None or time.monotonic() >= self._next_check:
+            self.check()
+        return self._snapshot
+
+    def get(self, name: Optional[str]) -> Optional[InsurancePlan]:
+        """Plan by id ("aetna_ppo") or name ("Aetna PPO"), or None if there is no such plan."""
+        if not name or not name.strip():
+            return None
+        self.stats["lookups"] += 1
+        plan = self._current().plans.get(plan_id(name))
+        if plan is None:
+            self.stats["misses"] += 1
+        return plan
+
+    def rules_for(self, name: Optional[str]) -> Optional[dict]:
+        """The parsed rules of a plan, as the agents and LLM prompts take them."""
+        plan = self.get(name)
+        return plan.rules if plan else None
+
+    def plans(self) -> List[dict]:
+        """Id, name and procedure count of every plan."""
+        return list(self._current().listing)
+
+    def metrics(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            **self.stats,
+            "plans": len(snapshot.listing) if snapshot else 0,
+            "rules_dir": str(self.rules_dir),
+        }
+
+
+# Global rules registry instance
+rules_registry = RulesRegistry(settings.INSURANCE_RULES_DIR, settings.RULES_CHECK_INTERVAL)
+
+
+def plan_for_rules(rules: Optional[dict]) -> Optional[InsurancePlan]:
+    """
+    The indexed plan for a rules dict: the registry's own plan when the dict came
+    from it, otherwise one parsed on the fly (None if the dict is not a valid plan).
+    """
+    if not rules:
+        return None
+    name = rules.get("insurance")
+    plan = rules_registry.get(name) if isinstance(name, str) else None
+    if plan is not None and plan.rules is rules:
+        return plan
+    try:
+        return parse_plan(Path("inline.json"), rules)
+    except RulesValidationError:
+        return None
+
+
+def relevant_rules(rules: Optional[dict], claim_fields: Iterable[dict]) -> Optional[dict]:
+    """
+    The slice of a plan's rules that an LLM prompt about this claim needs.
+
+    Args:
+        rules: Plan rules as loaded by the registry (other dicts are indexed on the fly)
+        claim_fields: Extracted fields of each of the claim's documents
+
+    Returns:
+        The general plan clauses with only the procedure rules for the claim's CPT
+        codes (or procedure names), or the rules unchanged if nothing matched
+    """
+    plan = plan_for_rules(rules)
+    if plan is None:
+        return rules
+    return plan.slice(*claim_codes(claim_fields))
@@ -0,0 +1,330 @@
+"""
+Similar-case retrieval over past denials.
+
+Each DenialPattern gets a local embedding of its denial reason, procedure, denial
+code and missing documents: word and character-trigram features hashed into a
+fixed number of dimensions (no model download, no network), L2-normalized and
+stored in DenialPattern.embedding. SimilarCaseIndex keeps all vectors in one NumPy
+matrix, so "top-k similar past denials" is a single matrix-vector product. After
+the startup load, patterns written or archived by other processes are applied as
+deltas when the pattern index reloads.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, DenialPattern
+from utils.fuzzy_match import canonical_denial_code, canonical_procedure
+from utils.pattern_index import SYNC_OVERLAP, pattern_index
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Common words in denial letters that say nothing about the case
+STOPWORDS = frozenset({
+    "the", "a", "an", "of", "to", "and", "or", "is", "was", "be", "been", "not", "for", "in", "on",
+    "by", "with", "this", "that", "are", "as", "at", "according", "requested", "service", "services",
+    "procedure", "claim", "denied", "denial", "patient", "please",
+})
+
+_EMBEDDING_COLUMNS = (
+    DenialPattern.id, DenialPattern.embedding, DenialPattern.denial_reason,
+    DenialPattern.procedure, DenialPattern.denial_code, DenialPattern.missing_docs
+)
+
+# Relative weight of each feature group
+CODE_WEIGHT = 2.0
+PROCEDURE_WEIGHT = 1.5
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.5
+
+
+def _hash(feature: str, dim: int) -> Tuple[int, float]:
+    """Stable (across processes) bucket and sign for a feature."""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+def _text_features(text: str) -> Dict[str, float]:
+    features: Dict[str, float] = {}
+    for word in _WORD.findall(text.casefold()):
+        if word in STOPWORDS:
+            continue
+        features[f"w:{word}"] = features.get(f"w:{word}", 0.0) + WORD_WEIGHT
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            gram = f"t:{padded[i:i + 3]}"
+            features[gram] = features.get(gram, 0.0) + TRIGRAM_WEIGHT
+    return features
+
+
+def embed_case(
+    denial_reason: Optional[str],
+    procedure: Optional[str],
+    denial_code: Optional[str] = None,
+    missing_docs: Iterable[str] = (),
+    dim: Optional[int] = None
+) -> np.ndarray:
+    """
+    Hashed bag-of-n-grams vector for a denial case (float32, unit length, or all
+    zeros when there is nothing to embed).
+    """
+    dim = dim or settings.SIMILAR_CASE_DIM
+    features = _text_features(" ".join([denial_reason or "", " ".join(missing_docs or ())]))
+    if procedure and procedure != "Unknown":
+        for word in canonical_procedure(procedure).split():
+            features[f"p:{word}"] = features.get(f"p:{word}", 0.0) + PROCEDURE_WEIGHT
+    if denial_code and denial_code != "Unknown":
+        features[f"c:{canonical_denial_code(denial_code)}"] = CODE_WEIGHT
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, weight in features.items():
+        bucket, sign = _hash(feature, dim)
+        # Sublinear weighting so long letters don't drown out the procedure and code
+        vector[bucket] += sign * np.log1p(weight)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_pattern(row) -> np.ndarray:
+    """Embedding of a stored pattern (a DenialPattern or row with its columns)."""
+    return embed_case(row.denial_reason, row.procedure, row.denial_code, row.missing_docs or ())
+
+
+def store_embeddings(db: Session, vectors: Dict[int, np.ndarray]):
+    """Write pattern embeddings in the caller's transaction (not committed here)."""
+    if not vectors:
+        return
+    stmt = update(DenialPattern).where(DenialPattern.id == bindparam("pattern_id")).values(
+        embedding=bindparam("vector")
+    )
+    db.connection().execute(stmt, [
+        {"pattern_id": pattern_id, "vector": vector.tobytes()} for pattern_id, vector in vectors.items()
+    ])
+
+
+class SimilarCaseIndex:
+    """Incremental in-memory nearest-neighbour index over pattern embeddings."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}  # pattern id -> matrix row
+        self._size = 0
+        self._sync_lock = threading.Lock()
+        self._generation: Optional[int] = None  # pattern_index generation we last caught up with
+        self._synced_at: Optional[datetime] = None
+        self.stats = {"loads": 0, "syncs": 0, "searches": 0, "backfilled": 0, "last_search_ms": 0.0}
+
+    def _vectors(self, rows) -> Tuple[Dict[int, np.ndarray], Dict[int, np.ndarray]]:
+        """Stored vectors of the rows, and freshly computed ones for rows without a usable embedding."""
+        vectors, missing = {}, {}
+        for row in rows:
+            stored = np.frombuffer(row.embedding, dtype=np.float32) if row.embedding else None
+            if stored is None or stored.shape[0] != self.dim:
+                missing[row.id] = embed_pattern(row)
+            else:
+                vectors[row.id] = stored
+        return vectors, missing
+
+    def load(self, db: Optional[Session] = None):
+        """Build the index from stored embeddings, computing any that are missing."""
+        generation = pattern_index.generation
+        synced_at = datetime.utcnow()
+        local = db is None
+        db = db or SessionLocal()
+        try:
+            vectors, missing = self._vectors(db.query(*_EMBEDDING_COLUMNS).all())
+            if missing:
+                # Patterns stored before embeddings existed (or with another dimension)
+                store_embeddings(db, missing)
+                db.commit()
+                vectors.update(missing)
+                logger.info(f"Backfilled embeddings for {len(missing)} denial patterns")
+        finally:
+            if local:
+                db.close()
+
+        self.build(vectors, generation)
+        self._synced_at = synced_at
+        self.stats["backfilled"] += len(missing)
+
+    def build(self, vectors: Dict[int, np.ndarray], generation: int = 0):
+        """Replace the index contents with the given pattern vectors."""
+        with self._lock:
+            capacity = max(len(vectors) * 2, 1024)
+            self._matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            self._ids = np.zeros(capacity, dtype=np.int64)
+            self._rows = {}
+            self._size = 0
+            self._add_locked(vectors.items())
+            self._generation = generation
+            self.stats["loads"] += 1
+
+    def add(self, vectors: Dict[int, np.ndarray]):
+        """Insert or replace vectors for patterns that were just written."""
+        with self._lock:
+            if self._generation is not None:
+                self._add_locked(vectors.items())
+
+    def _add_locked(self, items):
+        for pattern_id, vector in items:
+            row = self._rows.get(pattern_id)
+            if row is None:
+                if self._size == len(self._matrix):
+                    self._grow()
+                row = self._size
+                self._rows[pattern_id] = row
+                self._ids[row] = pattern_id
+                self._size += 1
+            self._matrix[row] = vector
+
+    def _grow(self):
+        capacity = max(len(self._matrix) * 2, 1024)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._ids = matrix, ids
+
+    def remove(self, pattern_ids: Iterable[int]):
+        """Drop patterns (the last row is moved into the freed slot)."""
+        with self._lock:
+            self._remove_locked(pattern_ids)
+
+    def _remove_locked(self, pattern_ids: Iterable[int]):
+        for pattern_id in pattern_ids:
+            row = self._rows.pop(pattern_id, None)
+            if row is None:
+                continue
+            last = self._size - 1
+            if row != last:
+                moved = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._size = last
+
+    def search(self, vector: np.ndarray, k: int = 5, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """Top-k (pattern id, cosine similarity) for a query embedding, best first."""
+        start = time.perf_counter()
+        with self._lock:
+            size = self._size
+            if size == 0 or not vector.any():
+                return []
+            scores = self._matrix[:size] @ vector
+            ids = self._ids[:size]
+            k = min(k, size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+        self.stats["searches"] += 1
+        self.stats["last_search_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return results
+
+    def sync(self, db: Optional[Session] = None):
+        """
+        Apply patterns written or archived by other processes since the last load or sync.
+
+        Only patterns seen since then are re-read (plus the list of ids, to drop the
+        ones that are gone), so the matrix is never rebuilt on the request path. A
+        sync already running in another thread is not repeated.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            generation = pattern_index.generation
+            synced_at = datetime.utcnow()
+            local = db is None
+            db = db or SessionLocal()
+            try:
+                rows = db.query(*_EMBEDDING_COLUMNS).filter(
+                    DenialPattern.last_seen >= self._synced_at - SYNC_OVERLAP
+                ).all()
+                current = {pattern_id for (pattern_id,) in db.query(DenialPattern.id)}
+            finally:
+                if local:
+                    db.close()
+            vectors, missing = self._vectors(rows)
+            vectors.update(missing)
+            with self._lock:
+                self._remove_locked([pattern_id for pattern_id in self._rows if pattern_id not in current])
+                self._add_locked(vectors.items())
+                self._generation = generation
+                self._synced_at = synced_at
+                self.stats["syncs"] += 1
+        finally:
+            self._sync_lock.release()
+
+    def ensure_fresh(self, db: Optional[Session] = None):
+        """Catch up when the pattern index reloaded (e.g. another process wrote patterns)."""
+        pattern_index.refresh(db)
+        if self._generation is None or self._synced_at is None:
+            self.load(db)
+        elif self._generation != pattern_index.generation:
+            self.sync(db)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def metrics(self) -> dict:
+        return {**self.stats, "cases": self._size, "dim": self.dim}
+
+
+# Global similar-case index instance
+similar_cases = SimilarCaseIndex(settings.SIMILAR_CASE_DIM)
+
+
+def find_similar_cases(
+    db: Session,
+    denial_reason: Optional[str],
+    procedure: Optional[str],
+    denial_code: Optional[str] = None,
+    k: Optional[int] = None,
+    exclude: Optional[Tuple[str, str, str]] = None
+) -> List[dict]:
+    """
+    Past denials most similar to the given case, for agent context.
+
+    Args:
+        db: Database session (used to load the indexes on first use)
+        denial_reason: Denial reason text from the letter
+        procedure: Denied procedure
+        denial_code: Denial code, if known
+        k: Number of neighbours (defaults to SIMILAR_CASES_K)
+        exclude: (insurance, denial_code, procedure) of the exact pattern already
+            being used, so it isn't repeated as a neighbour
+
+    Returns:
+        List of past cases with their similarity score, best first
+    """
+    similar_cases.ensure_fresh(db)
+    k = k or settings.SIMILAR_CASES_K
+    query = embed_case(denial_reason, procedure, denial_code)
+    cases = []
+    for pattern_id, score in similar_cases.search(query, k + 1, settings.SIMILAR_CASE_MIN_SCORE):
+        entry = pattern_index.get(pattern_id)
+        if entry is None or (entry.insurance, entry.denial_code, entry.procedure) == exclude:
+            continue
+        cases.append({
+            "insurance": entry.insurance,
+            "denial_code": entry.denial_code,
+            "procedure": entry.procedure,
+            "occurrence_count": entry.occurrence_count,
+            "resolved_by": list(entry.resolved_by),
+            "missing_docs": list(entry.missing_docs),
+            "similarity": round(score, 3)
+        })
+    return cases[:k]
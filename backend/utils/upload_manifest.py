@@ -0,0 +1,72 @@
+"""
+Cached manifest of files present in the upload directories.
+Answers "does this stored file still exist?" without walking the upload tree:
+each directory listing is cached and only re-read when the directory's mtime changes.
+"""
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Set, Tuple
+import os
+import threading
+
+from utils.compression import ARCHIVE_SUFFIXES
+
+
+class UploadManifest:
+    """Per-directory cache of file names, invalidated by directory mtime."""
+
+    def __init__(self):
+        self._dirs: Dict[str, Tuple[int, FrozenSet[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _names(self, directory: str) -> FrozenSet[str]:
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._dirs.pop(directory, None)
+            return frozenset()
+
+        cached = self._dirs.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with os.scandir(directory) as entries:
+            names = frozenset(entry.name for entry in entries if entry.is_file())
+        with self._lock:
+            self._dirs[directory] = (mtime, names)
+        return names
+
+    def existing(self, file_paths: Iterable[str]) -> Set[str]:
+        """
+        Return the subset of file paths that exist on disk, plain or archived.
+        Each distinct directory is checked with a single stat call.
+        """
+        by_dir: Dict[str, list] = {}
+        for file_path in file_paths:
+            path = Path(file_path)
+            by_dir.setdefault(str(path.parent), []).append((file_path, path.name))
+
+        found = set()
+        for directory, entries in by_dir.items():
+            names = self._names(directory)
+            found.update(
+                file_path for file_path, name in entries
+                if name in names or any(name + suffix in names for suffix in ARCHIVE_SUFFIXES)
+            )
+        return found
+
+    def exists(self, file_path: str) -> bool:
+        return bool(self.existing([file_path]))
+
+    def forget(self, directory: str):
+        """Drop one cached directory, e.g. right after writing into it."""
+        with self._lock:
+            self._dirs.pop(str(directory), None)
+
+    def invalidate(self):
+        with self._lock:
+            self._dirs.clear()
+
+
+# Global manifest instance
+upload_manifest = UploadManifest()
@@ -0,0 +1,164 @@
+"""
+Streaming upload storage.
+Writes uploaded files to disk in chunks with async I/O, hashing and counting bytes
+on the fly and aborting as soon as a file exceeds the size limit.
+
+The multipart body is parsed (and spooled) before a route sees its files, so
+UploadSizeLimitMiddleware bounds the whole request while it streams in.
+"""
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from pathlib import Path
+from typing import NamedTuple
+import hashlib
+import logging
+
+import aiofiles
+import aiofiles.os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+ALLOWED_EXTENSIONS = ['.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
+
+
+def safe_category_name(category: str) -> str:
+    """Sanitize an upload category to prevent traversal ('general' if nothing is left)."""
+    return "".join([c for c in (category or "") if c.isalnum()]) or "general"
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+    def __init__(self, filename: str, max_size: int):
+        super().__init__(f"File '{filename}' exceeds the maximum size of {max_size // (1024 * 1024)}MB")
+        self.filename = filename
+        self.max_size = max_size
+
+
+class UnsupportedFileTypeError(Exception):
+    """Raised when an upload's extension is not in ALLOWED_EXTENSIONS."""
+
+    def __init__(self, filename: str):
+        super().__init__(f"Unsupported file type: {filename}")
+        self.filename = filename
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware rejecting upload requests larger than max_size with 413.
+
+    The declared Content-Length is checked before the body is read, and the body is
+    counted as it arrives, so chunked requests (which have no Content-Length) and
+    understated lengths are stopped as soon as they cross the limit instead of
+    after the multipart parser has spooled them.
+    """
+
+    def __init__(self, app, max_size: int, path_prefix: str = "/api/upload", methods=("POST",)):
+        self.app = app
+        self.max_size = max_size
+        self.path_prefix = path_prefix
+        self.methods = methods
+
+    def _message(self) -> str:
+        return f"Upload exceeds the maximum request size of {self.max_size // (1024 * 1024)}MB"
+
+    def _too_large(self) -> JSONResponse:
+        return JSONResponse(status_code=413, content={"detail": self._message()})
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in self.methods
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_size:
+            await self._too_large()(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    # Raised inside the body parser; FastAPI turns it into the 413 response
+                    raise HTTPException(status_code=413, detail=self._message())
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._too_large()(scope, receive, send)
+
+
+class StoredFile(NamedTuple):
+    """Result of streaming an upload to disk."""
+    path: Path
+    size: int  # Bytes written
+    sha256: str  # Hex digest of the content
+
+
+async def stream_upload_to_disk(
+    upload: UploadFile,
+    destination: Path,
+    max_size: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> StoredFile:
+    """
+    Stream an uploaded file to disk without blocking the event loop.
+
+    Args:
+        upload: Incoming FastAPI upload
+        destination: File path to write
+        max_size: Maximum allowed size in bytes
+        chunk_size: Bytes read and written per step
+
+    Returns:
+        StoredFile with the path, byte count and SHA-256 digest
+
+    Raises:
+        FileTooLargeError: If the upload is larger than max_size (the partial file is removed)
+    """
+    # Reject early when the client declared the size
+    if upload.size is not None and upload.size > max_size:
+        raise FileTooLargeError(upload.filename, max_size)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(destination, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(upload.filename, max_size)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        # Never leave partial files behind (size limit, client disconnect, cancellation)
+        if await aiofiles.os.path.exists(destination):
+            await aiofiles.os.remove(destination)
+        raise
+
+    logger.info(f"Stored {destination.name}: {size} bytes, sha256={digest.hexdigest()[:12]}...")
+    return StoredFile(destination, size, digest.hexdigest())